@@ -0,0 +1,145 @@
+"""Compare the heap scheduler against a task per job.
+
+Measures the memory held by pending jobs and how late jobs fire while
+many other jobs are pending.
+
+    python -m benchmarks.scheduler --jobs 100000
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import tracemalloc
+import warnings
+from collections import abc
+from datetime import datetime, timedelta
+from functools import partial
+
+from pzsd_bot.ext.scheduler import Scheduler
+
+
+class TaskPerJobScheduler:
+    """The previous scheduler, one sleeping task per job."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.tasks: dict[str, asyncio.Task] = {}
+
+    async def _run_later(self, delay: float, coroutine: abc.Coroutine) -> None:
+        await asyncio.sleep(delay)
+        await coroutine
+
+    def _task_done_callback(self, task_id: str, done_task: asyncio.Task) -> None:
+        if self.tasks.get(task_id) is done_task:
+            del self.tasks[task_id]
+
+    def schedule(
+        self, run_at: datetime, task_id: str, coroutine: abc.Coroutine
+    ) -> None:
+        delay = (run_at - datetime.now(run_at.tzinfo)).total_seconds()
+        if delay > 0:
+            coroutine = self._run_later(delay, coroutine)
+
+        task = asyncio.create_task(coroutine, name=f"{self.name}_{task_id}")
+        task.add_done_callback(partial(self._task_done_callback, task_id))
+        self.tasks[task_id] = task
+
+    def cancel_all(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+
+async def job(
+    target: float, lateness: list[float], samples: int, done: asyncio.Event
+) -> None:
+    lateness.append(time.time() - target)
+    if len(lateness) == samples:
+        done.set()
+
+
+async def noop() -> None:
+    pass
+
+
+async def measure_memory(scheduler_cls: type, jobs: int, use_factory: bool) -> int:
+    scheduler = scheduler_cls("bench")
+    run_at = datetime.now() + timedelta(days=1)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(jobs):
+        coroutine = noop if use_factory else noop()
+        scheduler.schedule(run_at + timedelta(seconds=i), str(i), coroutine)
+
+    # let task per job schedulers reach their sleep
+    await asyncio.sleep(0)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    scheduler.cancel_all()
+    await asyncio.sleep(0)
+
+    return after - before
+
+
+async def measure_jitter(
+    scheduler_cls: type, jobs: int, samples: int, spread: float
+) -> list[float]:
+    scheduler = scheduler_cls("bench")
+    run_at = datetime.now() + timedelta(days=1)
+    for i in range(jobs):
+        scheduler.schedule(run_at + timedelta(seconds=i), f"idle_{i}", noop())
+
+    lateness = []
+    done = asyncio.Event()
+    start = time.time() + 0.1
+    for i in range(samples):
+        target = start + spread * i / samples
+        scheduler.schedule(
+            datetime.fromtimestamp(target),
+            f"sample_{i}",
+            job(target, lateness, samples, done),
+        )
+
+    await done.wait()
+    scheduler.cancel_all()
+    await asyncio.sleep(0)
+
+    return lateness
+
+
+async def main(jobs: int, samples: int, spread: float) -> None:
+    logging.disable(logging.CRITICAL)
+    # canceled jobs that never started are expected
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    for name, scheduler_cls, use_factory in (
+        ("task per job", TaskPerJobScheduler, False),
+        ("heap", Scheduler, False),
+        ("heap (factory)", Scheduler, True),
+    ):
+        memory = await measure_memory(scheduler_cls, jobs, use_factory)
+        lateness = await measure_jitter(scheduler_cls, jobs, samples, spread)
+        lateness_ms = sorted(late * 1000 for late in lateness)
+
+        print(f"{name}:")
+        print(f"  memory: {memory / 1024 / 1024:.1f} MiB ({memory / jobs:.0f} B/job)")
+        median = statistics.median(lateness_ms)
+        p99 = lateness_ms[int(len(lateness_ms) * 0.99)]
+        print(
+            f"  lateness: median {median:.2f}ms, p99 {p99:.2f}ms,"
+            f" max {lateness_ms[-1]:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=2.0)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.jobs, args.samples, args.spread))
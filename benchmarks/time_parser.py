@@ -0,0 +1,92 @@
+"""Compare the reminder time parser against regex and pendulum parsing.
+
+Times every expression in the test corpus, plus near misses that make
+the old duration regex backtrack, with and without the parse cache.
+
+    python -m benchmarks.time_parser
+"""
+
+import argparse
+import json
+import re
+import timeit
+from collections import abc
+from pathlib import Path
+
+import pendulum
+
+from pzsd_bot.ext.time_parser import parse_datetime, parse_duration, parse_expression
+
+CORPUS_PATH = Path(__file__).parent.parent / "tests/data/time_expressions.json"
+
+LEGACY_DURATION_PATTERN = re.compile(
+    r"((?P<years>\d+?) ?(years|year|Y|y) ?)?"
+    r"((?P<months>\d+?) ?(months|month|m) ?)?"
+    r"((?P<weeks>\d+?) ?(weeks|week|W|w) ?)?"
+    r"((?P<days>\d+?) ?(days|day|D|d) ?)?"
+    r"((?P<hours>\d+?) ?(hours|hour|hrs?|H|h) ?)?"
+    r"((?P<minutes>\d+?) ?(minutes|minute|min|M) ?)?"
+    r"((?P<seconds>\d+?) ?(seconds|second|secs?|S|s))?"
+)
+
+NEAR_MISSES = [
+    "1" * 200 + "x",
+    "1 y 1 m 1 w 1 d 1 h 1 M " * 8 + "1 x",
+    "12 " * 100 + "days",
+]
+
+
+def legacy_parse_duration(text: str) -> pendulum.Duration | None:
+    if m := LEGACY_DURATION_PATTERN.fullmatch(text):
+        duration = {
+            unit: int(amount) for unit, amount in m.groupdict(default=0).items()
+        }
+        return pendulum.duration(**duration)
+
+
+def legacy_parse_datetime(text: str, timezone: str) -> pendulum.DateTime | None:
+    try:
+        return pendulum.parse(text, strict=False, tz=timezone)
+    except (pendulum.exceptions.ParserError, ValueError):
+        return None
+
+
+def uncached_parse_duration(text: str) -> pendulum.Duration | None:
+    return parse_duration.__wrapped__(text)
+
+
+def uncached_parse_datetime(text: str, timezone: str) -> pendulum.DateTime | None:
+    parse_expression.cache_clear()
+    return parse_datetime(text, timezone)
+
+
+def run(name: str, func: abc.Callable, texts: list[tuple], number: int) -> None:
+    elapsed = timeit.timeit(lambda: [func(*args) for args in texts], number=number)
+    per_call = elapsed / (number * len(texts)) * 1_000_000
+    print(f"  {name:<10} {per_call:>8.2f}us/call")
+
+
+def main(number: int) -> None:
+    corpus = json.loads(CORPUS_PATH.read_text())
+    timezone = corpus["timezone"]
+
+    relative = [(text,) for text in [*corpus["relative"], *NEAR_MISSES]]
+    absolute = [(text, timezone) for text in corpus["absolute"]]
+
+    print(f"relative ({len(relative)} expressions):")
+    run("legacy", legacy_parse_duration, relative, number)
+    run("uncached", uncached_parse_duration, relative, number)
+    run("cached", parse_duration, relative, number)
+
+    print(f"absolute ({len(absolute)} expressions):")
+    run("legacy", legacy_parse_datetime, absolute, number)
+    run("uncached", uncached_parse_datetime, absolute, number)
+    run("cached", parse_datetime, absolute, number)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    main(args.number)
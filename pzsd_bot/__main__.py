@@ -2,24 +2,60 @@ import asyncio
 import logging
 
 import pycord.multicog
-from discord import Intents
+from discord import Emoji, Guild, Intents
 
 from pzsd_bot.client import Client
 from pzsd_bot.db import engine
+from pzsd_bot.ext.emoji_registry import EmojiRegistry
 from pzsd_bot.settings import Bot
 
 logger = logging.getLogger(__name__)
 
 bot = pycord.multicog.Bot(intents=Intents.all())
 bot.client = Client()
+bot.emoji_registry = EmojiRegistry()
 
 
 @bot.event
 async def on_ready():
     await bot.client.start()
+    bot.emoji_registry.load(bot.emojis)
     logger.info("Logged in as %s", bot.user)
 
 
+@bot.event
+async def on_guild_emojis_update(
+    guild: Guild, before: list[Emoji], after: list[Emoji]
+) -> None:
+    removed_ids = bot.emoji_registry.update_guild(guild, after)
+    logger.info(
+        "Emojis updated in %s (%s removed), %s custom emojis available",
+        guild.name,
+        len(removed_ids),
+        len(bot.emoji_registry),
+    )
+
+
+@bot.event
+async def on_guild_join(guild: Guild) -> None:
+    bot.emoji_registry.update_guild(guild, guild.emojis)
+    logger.info(
+        "Joined %s, %s custom emojis available", guild.name, len(bot.emoji_registry)
+    )
+
+
+@bot.event
+async def on_guild_remove(guild: Guild) -> None:
+    # the bot can't use a guild's emojis once it's left
+    removed_ids = bot.emoji_registry.update_guild(guild, [])
+    logger.info(
+        "Left %s (%s emojis removed), %s custom emojis available",
+        guild.name,
+        len(removed_ids),
+        len(bot.emoji_registry),
+    )
+
+
 async def run_bot():
     try:
         async with bot:
@@ -1,10 +1,14 @@
+import asyncio
 import logging
+from datetime import datetime
 
 import pendulum
 from discord import ApplicationContext, Bot, default_permissions
 from discord.ext.commands import Cog, slash_command
 from pycord.multicog import subcommand
 
+from pzsd_bot.ext.cron import parse_cron
+from pzsd_bot.ext.job_store import JobStore
 from pzsd_bot.ext.scheduler import Scheduler
 from pzsd_bot.settings import AOCSettings, Channels, Guilds, Roles
 
@@ -14,9 +18,22 @@ logger = logging.getLogger(__name__)
 class AdventOfCode(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.scheduler = Scheduler(__class__.__name__)
+        self.scheduler = Scheduler(__class__.__name__, store=JobStore())
+        self.scheduler.register("aoc_thread", self.post_aoc_thread)
         self.event_active = False
 
+        asyncio.create_task(self.load_jobs())
+
+    async def load_jobs(self) -> None:
+        # the event is still active if any thread posts are left
+        recovered = await self.scheduler.recover()
+        self.event_active = bool(recovered)
+        if self.event_active:
+            self.start_leaderboard_prefetch()
+
+    def cog_unload(self) -> None:
+        self.scheduler.cancel_all()
+
     @subcommand(group="aoc", independent=True)
     @slash_command(description="Set aoc event to active.")
     @default_permissions(administrator=True)
@@ -30,6 +47,7 @@ class AdventOfCode(Cog):
 
         await self.schedule_aoc_thread_posts()
         self.event_active = True
+        self.start_leaderboard_prefetch()
 
         await ctx.respond("Event activated", ephemeral=True)
 
@@ -44,11 +62,45 @@ class AdventOfCode(Cog):
             await ctx.respond("aoc event is already inactive!")
             return
 
-        self.scheduler.cancel_all()
+        await self.scheduler.remove_persisted()
         self.event_active = False
 
         await ctx.respond("Event deactivated", ephemeral=True)
 
+    @subcommand(group="aoc", independent=True)
+    @slash_command(description="Archive the leaderboards of every past year.")
+    @default_permissions(administrator=True)
+    async def backfill_archive(self, ctx: ApplicationContext) -> None:
+        logger.info("/aoc backfill_archive invoked by %s", ctx.author.name)
+
+        leaderboards_cog = self.bot.get_cog("AOCLeaderboards")
+        if leaderboards_cog is None:
+            logger.warning("AOCLeaderboards cog isn't loaded, can't backfill")
+            await ctx.respond("Leaderboards are unavailable.", ephemeral=True)
+            return
+
+        if leaderboards_cog.backfill_lock.locked():
+            logger.info("Archive is already being backfilled, doing nothing")
+            await ctx.respond("Archive is already being backfilled!", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+        archived, failed = await leaderboards_cog.backfill_archive()
+
+        message = f"Archived {len(archived)} leaderboards."
+        if failed:
+            message += f" Failed to fetch {', '.join(map(str, failed))}."
+        await ctx.followup.send(message, ephemeral=True)
+
+    def start_leaderboard_prefetch(self) -> None:
+        # keeps the leaderboard cached until the event is deactivated
+        leaderboards_cog = self.bot.get_cog("AOCLeaderboards")
+        if leaderboards_cog is None:
+            logger.warning("AOCLeaderboards cog isn't loaded, not prefetching")
+            return
+
+        leaderboards_cog.schedule_prefetch()
+
     async def schedule_aoc_thread_posts(self) -> None:
         logger.info("Scheduling AoC thread posts")
 
@@ -61,14 +113,21 @@ class AdventOfCode(Cog):
             tz="America/New_York",
         )
 
-        for offset in range(AOCSettings.days_in_event):
-            dt = event_start.add(days=offset)
-            if dt.is_future():
-                self.scheduler.schedule(
-                    run_at=dt,
-                    task_id=f"aoc_thread_day_{dt.day}_{dt.year}",
-                    coroutine=self.create_aoc_thread(dt.day),
-                )
+        event_end = event_start.add(days=AOCSettings.days_in_event - 1)
+
+        # a thread at midnight ET every day of the event
+        await self.scheduler.schedule_persisted_recurring(
+            job_id=f"aoc_threads_{current_year}",
+            handler="aoc_thread",
+            cron=parse_cron(
+                f"0 0 {event_start.day}-{event_end.day} {event_start.month} *",
+                "America/New_York",
+            ),
+            run_until=event_end,
+        )
+
+    async def post_aoc_thread(self, run_at: datetime) -> None:
+        await self.create_aoc_thread(run_at.day)
 
     async def create_aoc_thread(self, day: int) -> None:
         logger.info("Creating aoc thread for day %s", day)
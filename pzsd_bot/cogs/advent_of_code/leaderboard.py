@@ -1,18 +1,29 @@
+import asyncio
 import logging
-from typing import TypedDict
+from datetime import datetime
+from functools import partial
+from typing import NamedTuple, TypedDict
 
 import pendulum
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession
 from discord import ApplicationContext, Bot, Embed
 from discord.commands import SlashCommandGroup, option
 from discord.ext.commands import Cog
+from sqlalchemy import select
 
 from pzsd_bot.client import retry_middleware
-from pzsd_bot.settings import AOCSettings, Colors
+from pzsd_bot.db import Session, insert_or_ignore
+from pzsd_bot.ext.scheduler import Scheduler
+from pzsd_bot.model import aoc_leaderboard
+from pzsd_bot.settings import AOCSettings, Channels, Colors
 
 logger = logging.getLogger(__name__)
 
 AOC_GENESIS = 2015
+# the least time allowed between requests for the same leaderboard
+MIN_FETCH_INTERVAL_MINUTES = 15
+# stars listed in a single announcement, the rest are just counted
+MAX_ANNOUNCED_STARS = 20
 
 
 class CompletionDay(TypedDict):
@@ -37,9 +48,104 @@ class LeaderboardResponse(TypedDict):
     members: dict[str, LeaderboardMembers]
 
 
+class MemberScore(NamedTuple):
+    # in this order so members sort by score, then stars
+    local_score: int
+    stars: int
+    name: str
+
+
+class StarCompletion(NamedTuple):
+    member_id: int
+    # 1 or 2, for the day's first or second star
+    star: int
+    get_star_ts: int
+
+
+# the stars earned on each day of the event, in the order they were earned
+DayIndex = dict[int, tuple[StarCompletion, ...]]
+
+
+class NewStar(NamedTuple):
+    name: str
+    day: int
+    star: int
+    get_star_ts: int
+
+
 class CachedLeaderboard(TypedDict):
+    # when the leaderboard was last confirmed to be up to date
     last_fetched: pendulum.DateTime
-    leaderboard: LeaderboardResponse
+    # only what the leaderboard embed shows is kept, the full response
+    # is mostly per star timestamps that aren't needed for it
+    members: tuple[MemberScore, ...]
+    # validators for conditional requests
+    etag: str | None
+    last_modified: str | None
+
+
+def project_members(leaderboard: LeaderboardResponse) -> tuple[MemberScore, ...]:
+    return tuple(
+        MemberScore(
+            member["local_score"], member["stars"], member["name"] or str(member["id"])
+        )
+        for member in leaderboard["members"].values()
+    )
+
+
+def index_days(leaderboard: LeaderboardResponse) -> DayIndex:
+    completions: dict[int, list[StarCompletion]] = {}
+    for member in leaderboard["members"].values():
+        for day, stars in member["completion_day_level"].items():
+            for star, completion in stars.items():
+                completions.setdefault(int(day), []).append(
+                    StarCompletion(member["id"], int(star), completion["get_star_ts"])
+                )
+
+    return {
+        day: tuple(sorted(stars, key=lambda star: star.get_star_ts))
+        for day, stars in sorted(completions.items())
+    }
+
+
+class StarTracker:
+    """Finds the stars members earned since the last leaderboard it saw.
+
+    The stars each member had are kept as a set of (day, star). A member
+    whose star count hasn't changed is skipped without looking at their
+    stars, so only members who earned stars are diffed.
+    """
+
+    def __init__(self):
+        self.stars: dict[int, frozenset[tuple[int, int]]] = {}
+
+    def update(self, leaderboard: LeaderboardResponse) -> list[NewStar]:
+        """Record the leaderboard's stars, returning the new ones in the
+        order they were earned. Everyone is new to the first leaderboard
+        seen, so it only primes the tracker."""
+        new_stars = []
+        for member in leaderboard["members"].values():
+            known = self.stars.get(member["id"])
+            if known is not None and len(known) == member["stars"]:
+                continue
+
+            earned = {
+                (int(day), int(star)): completion["get_star_ts"]
+                for day, stars in member["completion_day_level"].items()
+                for star, completion in stars.items()
+            }
+            self.stars[member["id"]] = frozenset(earned)
+
+            # stars of members who just joined weren't necessarily
+            # earned since the last leaderboard, so they're skipped
+            if known is None:
+                continue
+
+            name = member["name"] or str(member["id"])
+            for day, star in earned.keys() - known:
+                new_stars.append(NewStar(name, day, star, earned[day, star]))
+
+        return sorted(new_stars, key=lambda star: star.get_star_ts)
 
 
 class AOCLeaderboards(Cog):
@@ -48,12 +154,336 @@ class AOCLeaderboards(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
         self.cached_leaderboards: dict[int, CachedLeaderboard] = {}
+        # per day indexes are only kept for years a feature asked for
+        self.indexed_years: set[int] = set()
+        self.day_indexes: dict[int, DayIndex] = {}
+        # years served from the archive, which are never refetched
+        self.archived_years: set[int] = set()
+        self.backfill_lock = asyncio.Lock()
+        # stars on the current year's leaderboard, to announce new ones
+        self.star_tracker = StarTracker()
+        self.announcements: set[asyncio.Task] = set()
+        # fetches in flight, shared by everyone waiting on the same year
+        self.fetches: dict[int, asyncio.Task[CachedLeaderboard | None]] = {}
+        # when each leaderboard was last requested, whether it worked or not
+        self.last_attempts: dict[int, pendulum.DateTime] = {}
+        self.scheduler = Scheduler(__class__.__name__)
+
+    def cog_unload(self) -> None:
+        self.scheduler.cancel_all()
+        for task in [*self.fetches.values(), *self.announcements]:
+            task.cancel()
+
+    @staticmethod
+    def cache_ttl() -> pendulum.Duration:
+        return pendulum.duration(
+            minutes=max(
+                AOCSettings.leaderboard_cache_ttl_minutes, MIN_FETCH_INTERVAL_MINUTES
+            )
+        )
+
+    @staticmethod
+    def leaderboard_url(year: int) -> str:
+        return (
+            f"{AOCSettings.base_url}/{year}/{AOCSettings.private_leaderboard_path}.json"
+            f"?view_key={AOCSettings.private_leaderboard_key}"
+        )
+
+    @staticmethod
+    def is_finished(year: int) -> bool:
+        return year < pendulum.today().year
+
+    def is_stale(self, year: int) -> bool:
+        if year in self.archived_years:
+            return False
+
+        last_fetched = self.cached_leaderboards[year]["last_fetched"]
+        return last_fetched <= pendulum.now() - self.cache_ttl()
+
+    def can_fetch(self, year: int) -> bool:
+        """Whether a leaderboard can be fetched without requesting it more
+        often than the TTL allows.
+
+        Failed fetches count too, otherwise while adventofcode.com is down
+        every view of a stale leaderboard would request it again.
+        """
+        if year in self.fetches:
+            # joining the fetch in flight doesn't make another request
+            return True
+
+        last_attempt = self.last_attempts.get(year)
+        return last_attempt is None or last_attempt <= pendulum.now() - self.cache_ttl()
+
+    def enable_day_index(self, year: int) -> None:
+        """Keep a per day index of the stars earned in a year, in
+        `day_indexes`, from the next time its leaderboard is fetched."""
+        self.indexed_years.add(year)
+
+    def cache_leaderboard(
+        self,
+        year: int,
+        leaderboard: LeaderboardResponse,
+        fetched_at: pendulum.DateTime,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> CachedLeaderboard:
+        self.cached_leaderboards[year] = {
+            "members": project_members(leaderboard),
+            "last_fetched": fetched_at,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        if year in self.indexed_years:
+            self.day_indexes[year] = index_days(leaderboard)
+
+        return self.cached_leaderboards[year]
+
+    async def load_archived(self, year: int) -> CachedLeaderboard | None:
+        async with Session.begin() as session:
+            result = await session.execute(
+                select(
+                    aoc_leaderboard.c.leaderboard, aoc_leaderboard.c.fetched_at
+                ).where(aoc_leaderboard.c.year == year)
+            )
+            row = result.one_or_none()
+
+        if row is None:
+            return None
+
+        logger.info("Loaded %s leaderboard from the archive", year)
+        self.archived_years.add(year)
+        return self.cache_leaderboard(
+            year, row.leaderboard, pendulum.instance(row.fetched_at)
+        )
+
+    async def archive(
+        self, year: int, leaderboard: LeaderboardResponse, fetched_at: datetime
+    ) -> None:
+        async with Session.begin() as session:
+            await session.execute(
+                insert_or_ignore(aoc_leaderboard).values(
+                    year=year, leaderboard=leaderboard, fetched_at=fetched_at
+                )
+            )
+
+        logger.info("Archived %s leaderboard", year)
+        self.archived_years.add(year)
+
+    def start_fetch(self, year: int) -> asyncio.Task[CachedLeaderboard | None]:
+        """Start fetching a leaderboard, or join the fetch already in flight
+        for that year so concurrent callers only make one request."""
+        task = self.fetches.get(year)
+        if task is None:
+            task = asyncio.create_task(self._fetch_leaderboard(year))
+            task.add_done_callback(partial(self._fetch_done_callback, year))
+            self.fetches[year] = task
+
+        return task
+
+    def _fetch_done_callback(
+        self, year: int, task: asyncio.Task[CachedLeaderboard | None]
+    ) -> None:
+        self.fetches.pop(year, None)
+        # background refreshes aren't awaited by anyone, so
+        # their errors would otherwise never be retrieved
+        if not task.cancelled() and (e := task.exception()) is not None:
+            logger.error("Failed to fetch %s leaderboard", year, exc_info=e)
+
+    async def fetch_leaderboard(self, year: int) -> CachedLeaderboard | None:
+        """Fetch a leaderboard into the cache, returning None if it failed.
+
+        Callers fetching the same year at the same time share one request
+        and its result, whether it succeeded or not.
+        """
+        # a caller giving up shouldn't cancel the fetch for everyone else
+        return await asyncio.shield(self.start_fetch(year))
+
+    async def _fetch_leaderboard(self, year: int) -> CachedLeaderboard | None:
+        """Leaderboards of finished years are archived after they're first
+        fetched and loaded from there from then on.
+
+        Otherwise if the leaderboard is already cached the request is
+        conditional, so an unchanged leaderboard isn't downloaded again.
+        """
+        if self.is_finished(year) and (archived := await self.load_archived(year)):
+            return archived
+
+        cached = self.cached_leaderboards.get(year)
+        # the index can only be built from a full response, and so can the
+        # archive of a year that was cached while it was still going
+        needs_index = year in self.indexed_years and year not in self.day_indexes
+        needs_full_response = needs_index or self.is_finished(year)
+        headers = {"User-Agent": AOCSettings.user_agent}
+        if cached is not None and not needs_full_response:
+            if cached["etag"] is not None:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"] is not None:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        fetched_at = pendulum.now()
+        self.last_attempts[year] = fetched_at
+        client: ClientSession = self.bot.client.session
+        try:
+            async with client.get(
+                url=self.leaderboard_url(year),
+                headers=headers,
+                middlewares=(retry_middleware,),
+            ) as resp:
+                if resp.status == 304 and cached is not None:
+                    logger.info("%s leaderboard unchanged since last fetch", year)
+                    cached["last_fetched"] = fetched_at
+                    return cached
+
+                if not resp.ok:
+                    logger.warning(
+                        "Failed to fetch %s leaderboard, status=%s", year, resp.status
+                    )
+                    return None
+
+                leaderboard: LeaderboardResponse = await resp.json()
+                cached = self.cache_leaderboard(
+                    year,
+                    leaderboard,
+                    fetched_at,
+                    resp.headers.get("ETag"),
+                    resp.headers.get("Last-Modified"),
+                )
+        except (ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Failed to fetch %s leaderboard: %s", year, e)
+            return None
+
+        if self.is_finished(year):
+            await self.archive(year, leaderboard, fetched_at)
+        elif year == pendulum.today().year:
+            # a 304 means no new stars, so only full responses are diffed.
+            # it's done separately so everyone waiting on the fetch doesn't
+            # wait on discord too, or fail if the announcement does
+            task = asyncio.create_task(self.announce_new_stars(leaderboard))
+            task.add_done_callback(self._announcement_done_callback)
+            self.announcements.add(task)
+
+        return cached
+
+    @staticmethod
+    def format_new_stars(new_stars: list[NewStar]) -> str:
+        lines = []
+        for new_star in new_stars[:MAX_ANNOUNCED_STARS]:
+            color = "gold" if new_star.star == 2 else "silver"
+            lines.append(
+                f"⭐ **{new_star.name}** got the {color} star for day {new_star.day}"
+            )
+
+        if len(new_stars) > MAX_ANNOUNCED_STARS:
+            lines.append(f"...and {len(new_stars) - MAX_ANNOUNCED_STARS} more!")
+
+        return "\n".join(lines)
+
+    async def announce_new_stars(self, leaderboard: LeaderboardResponse) -> None:
+        new_stars = self.star_tracker.update(leaderboard)
+        if not new_stars:
+            return
+
+        aoc_cog = self.bot.get_cog("AdventOfCode")
+        if aoc_cog is None or not aoc_cog.event_active:
+            logger.info("aoc event isn't active, not announcing new stars")
+            return
+
+        aoc_channel = self.bot.get_channel(Channels.advent_of_code)
+        if aoc_channel is None:
+            logger.error("advent-of-code channel is missing, unable to announce stars")
+            return
+
+        logger.info("Announcing %s new stars", len(new_stars))
+        await aoc_channel.send(self.format_new_stars(new_stars))
+
+    def _announcement_done_callback(self, task: asyncio.Task) -> None:
+        self.announcements.discard(task)
+        if not task.cancelled() and (e := task.exception()) is not None:
+            logger.error("Failed to announce new stars", exc_info=e)
+
+    async def backfill_archive(self) -> tuple[list[int], list[int]]:
+        """Fetch every finished year that isn't archived yet, waiting between
+        each request so adventofcode.com isn't hammered.
+
+        Returns the years that were archived and the years that failed.
+        """
+        async with self.backfill_lock:
+            async with Session.begin() as session:
+                result = await session.execute(select(aoc_leaderboard.c.year))
+                already_archived = set(result.scalars())
+
+            years = [
+                year
+                for year in range(AOC_GENESIS, pendulum.today().year)
+                if year not in already_archived
+            ]
+            logger.info("Backfilling the archive with %s years", len(years))
+
+            archived, failed = [], []
+            for i, year in enumerate(years):
+                if i > 0:
+                    await asyncio.sleep(AOCSettings.archive_backfill_interval_seconds)
+
+                try:
+                    await self.fetch_leaderboard(year)
+                except Exception:
+                    logger.exception("Failed to backfill %s leaderboard", year)
+
+                # a fetch can succeed without the year being archived
+                if year in self.archived_years:
+                    archived.append(year)
+                else:
+                    failed.append(year)
+
+            return archived, failed
+
+    def schedule_prefetch(self, run_at: datetime | None = None) -> None:
+        """Start prefetching the current year's leaderboard, which carries
+        on until the event is deactivated."""
+        self.scheduler.schedule(
+            run_at or pendulum.now(), "prefetch_leaderboard", self.prefetch_leaderboard
+        )
+
+    async def prefetch_leaderboard(self) -> None:
+        """Fetch the current year's leaderboard as soon as it goes stale, so
+        it's always cached while the event is on.
+
+        Fetches made by the leaderboard command count too, so this never
+        adds to how often the leaderboard is requested.
+        """
+        aoc_cog = self.bot.get_cog("AdventOfCode")
+        if aoc_cog is None or not aoc_cog.event_active:
+            logger.info("aoc event isn't active, no longer prefetching leaderboard")
+            return
+
+        # the client's session isn't opened until the bot is ready
+        await self.bot.wait_until_ready()
+        await self.bot.client.start()
+
+        year = pendulum.today().year
+        is_missing = year not in self.cached_leaderboards
+        if (is_missing or self.is_stale(year)) and self.can_fetch(year):
+            logger.info("Prefetching %s leaderboard", year)
+            await self.fetch_leaderboard(year)
+
+        now = pendulum.now()
+        run_at = now + self.cache_ttl()
+        if year in self.cached_leaderboards:
+            goes_stale_at = (
+                self.cached_leaderboards[year]["last_fetched"] + self.cache_ttl()
+            )
+            # if the fetch failed it's tried again a whole TTL later
+            if goes_stale_at > now:
+                run_at = goes_stale_at
+
+        self.schedule_prefetch(run_at)
 
     def make_aoc_leaderboard_embed(
         self,
-        member_scores: list[tuple[int, int, str]],
+        member_scores: tuple[MemberScore, ...],
         year: int,
         last_fetched: pendulum.DateTime,
+        is_refreshing: bool = False,
     ) -> Embed:
         ESC = "\x1b"
         RESET = f"{ESC}[0m"
@@ -92,7 +522,10 @@ class AOCLeaderboards(Cog):
             url=f"{AOCSettings.base_url}/{year}/{AOCSettings.private_leaderboard_path}",
             timestamp=last_fetched,
         )
-        embed.set_footer(text="Last updated")
+        if is_refreshing:
+            embed.set_footer(text="Refreshing, last updated")
+        else:
+            embed.set_footer(text="Last updated")
 
         return embed
 
@@ -116,68 +549,47 @@ class AOCLeaderboards(Cog):
             )
             return
 
-        last_fetched = None
-        if year in self.cached_leaderboards:
-            last_fetched = self.cached_leaderboards[year]["last_fetched"]
+        is_refreshing = False
+        if year not in self.cached_leaderboards:
+            if not self.can_fetch(year):
+                logger.info("Fetching %s leaderboard failed recently", year)
+                await ctx.respond(
+                    "Unable to fetch leaderboard, please try again later."
+                )
+                return
 
-        if last_fetched is None or last_fetched <= pendulum.now().subtract(
-            minutes=AOCSettings.leaderboard_cache_ttl_minutes
-        ):
-            logger.info(
-                "Last fetch >%smin ago. Fetching current leaderboard",
-                AOCSettings.leaderboard_cache_ttl_minutes,
-            )
+            logger.info("No %s leaderboard in cache, fetching it", year)
             await ctx.defer()
             deferred = True
 
-            last_fetched = pendulum.now()
-
-            leaderboard_url = (
-                f"{AOCSettings.base_url}/{year}/{AOCSettings.private_leaderboard_path}.json"
-                f"?view_key={AOCSettings.private_leaderboard_key}"
+            if await self.fetch_leaderboard(year) is None:
+                await ctx.followup.send(
+                    "Unable to fetch leaderboard, please try again later."
+                )
+                return
+        elif self.is_stale(year):
+            # serve the stale leaderboard now rather than making
+            # the user wait, it'll be fresh for the next one
+            logger.info(
+                "Last fetch >%smin ago. Returning stale leaderboard from cache",
+                self.cache_ttl().in_minutes(),
             )
-
-            client: ClientSession = self.bot.client.session
-            async with client.get(
-                url=leaderboard_url, middlewares=(retry_middleware,)
-            ) as resp:
-                if resp.ok:
-                    leaderboard_response = await resp.json()
-                    self.cached_leaderboards[year] = {
-                        "leaderboard": leaderboard_response,
-                        "last_fetched": last_fetched,
-                    }
-                else:
-                    logger.warning("Failed to fetch leaderboard")
-                    if year not in self.cached_leaderboards:
-                        logger.info("No %s leaderboard in cache, doing nothing", year)
-                        await ctx.followup.send(
-                            "Unable to fetch leaderboard, please try again later."
-                        )
-                        return
-                    else:
-                        logger.info(
-                            "Last fetch failed, falling back to leaderboard from cache"
-                        )
+            if self.can_fetch(year):
+                logger.info("Refreshing stale %s leaderboard in the background", year)
+                self.start_fetch(year)
+                is_refreshing = True
+            else:
+                logger.info("Refreshing %s leaderboard failed recently", year)
         else:
             logger.info(
                 "Last fetch <%smin ago. Returning leaderboard from cache",
-                AOCSettings.leaderboard_cache_ttl_minutes,
+                self.cache_ttl().in_minutes(),
             )
 
-        leaderboard = self.cached_leaderboards[year]["leaderboard"]
-
-        member_scores = []
-        for member in leaderboard["members"].values():
-            member_scores.append(
-                (
-                    member["local_score"],
-                    member["stars"],
-                    member["name"] or str(member["id"]),
-                )
-            )
-
-        embed = self.make_aoc_leaderboard_embed(member_scores, year, last_fetched)
+        cached = self.cached_leaderboards[year]
+        embed = self.make_aoc_leaderboard_embed(
+            cached["members"], year, cached["last_fetched"], is_refreshing
+        )
 
         if deferred:
             await ctx.followup.send(embed=embed)
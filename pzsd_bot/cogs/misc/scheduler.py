@@ -0,0 +1,81 @@
+import io
+import logging
+
+from discord import ApplicationContext, Bot, Embed, File, default_permissions
+from discord.commands import option
+from discord.ext.commands import Cog, slash_command
+
+from pzsd_bot.ext.metrics import Histogram
+from pzsd_bot.ext.scheduler import SCHEDULERS, Scheduler, render_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def format_seconds(seconds: float | None) -> str:
+    if seconds is None:
+        return "n/a"
+    if seconds < 1:
+        return f"{seconds * 1e3:.0f}ms"
+    return f"{seconds:.1f}s"
+
+
+def format_histogram(histogram: Histogram) -> str:
+    return "p50 {} / p99 {} / max {}".format(
+        format_seconds(histogram.quantile(0.5)),
+        format_seconds(histogram.quantile(0.99)),
+        format_seconds(histogram.max if histogram.count else None),
+    )
+
+
+class SchedulerStats(Cog):
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+    @staticmethod
+    def make_stats_embed(schedulers: list[Scheduler]) -> Embed:
+        embed = Embed(title="Scheduler Stats")
+
+        for scheduler in schedulers:
+            value = (
+                f"pending: **{len(scheduler)}**, running: **{len(scheduler.tasks)}**, "
+                f"failed: **{scheduler.failures}**\n"
+                f"lateness: {format_histogram(scheduler.lateness)}\n"
+                f"duration: {format_histogram(scheduler.durations)}\n"
+                f"ran {scheduler.durations.count} tasks"
+            )
+            embed.add_field(name=scheduler.name, value=value, inline=False)
+
+        embed.set_footer(text="Lateness is how long after they were due tasks started")
+
+        return embed
+
+    @slash_command(
+        description="Show how many jobs are scheduled and how late they run."
+    )
+    @option(
+        "export",
+        description="Attach metrics in the prometheus text format.",
+        required=False,
+    )
+    @default_permissions(administrator=True)
+    async def scheduler_stats(
+        self, ctx: ApplicationContext, export: bool = False
+    ) -> None:
+        logger.info("%s invoked /scheduler_stats", ctx.author.name)
+
+        schedulers = [scheduler for _, scheduler in sorted(SCHEDULERS.items())]
+        embed = self.make_stats_embed(schedulers)
+
+        if export:
+            buffer = io.BytesIO(render_metrics().encode())
+            await ctx.respond(
+                embed=embed,
+                file=File(buffer, filename="scheduler_metrics.txt"),
+                ephemeral=True,
+            )
+        else:
+            await ctx.respond(embed=embed, ephemeral=True)
+
+
+def setup(bot: Bot) -> None:
+    bot.add_cog(SchedulerStats(bot))
@@ -1,12 +1,11 @@
+import asyncio
 import logging
 import re
-import uuid
 from datetime import datetime, timedelta
 from itertools import batched
 from math import ceil
 from typing import Iterable, Optional, Tuple
 
-import pendulum
 from discord import ApplicationContext, Bot, Embed
 from discord.commands import SlashCommandGroup
 from discord.ext.commands import Cog
@@ -15,9 +14,11 @@ from sqlalchemy.sql.elements import BinaryExpression
 from sqlalchemy.sql.functions import sum as sql_sum
 
 from pzsd_bot.db import Session
+from pzsd_bot.ext.cron import parse_cron
+from pzsd_bot.ext.job_store import JobStore
 from pzsd_bot.ext.pagination import Paginator
 from pzsd_bot.ext.scheduler import Scheduler
-from pzsd_bot.model import ledger, pzsd_user
+from pzsd_bot.model import MisfirePolicy, ledger, pzsd_user
 from pzsd_bot.settings import Channels, Colors
 from pzsd_bot.ui.buttons import get_page_buttons
 
@@ -25,31 +26,34 @@ logger = logging.getLogger(__name__)
 
 LeaderboardField = Tuple[int, str, int]
 
+# fridays at 4pm ET
+WEEKLY_POST_SCHEDULE = parse_cron("0 16 * * fri", "America/New_York")
+
 
 class PointLeaderboard(Cog):
     leaderboard = SlashCommandGroup("leaderboard", "Display point leaderboards.")
 
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.scheduler = Scheduler(__class__.__name__)
-
-        # Schedule the initial weekly lb post
-        # which can in turn schedule the next one
-        self.scheduler.schedule(
-            run_at=self.next_weekly_lb_dt,
-            task_id=f"weekly_leaderboard_post_{uuid.uuid4()}",
-            coroutine=self.weekly(None),
-        )
+        self.scheduler = Scheduler(__class__.__name__, store=JobStore())
+        self.scheduler.register("weekly_leaderboard_post", self.post_weekly_leaderboard)
 
-    @property
-    def next_weekly_lb_dt(self):
-        now = pendulum.now("America/New_York")
-        if now.weekday() == pendulum.FRIDAY and now.hour < 16:
-            friday_at_4pm = now.at(16)
-        else:
-            friday_at_4pm = now.next(pendulum.FRIDAY).at(16)
+        asyncio.create_task(self.load_jobs())
+
+    async def load_jobs(self) -> None:
+        await self.scheduler.recover()
 
-        return friday_at_4pm
+        # does nothing if the job was already recovered
+        await self.scheduler.schedule_persisted_recurring(
+            job_id="weekly_leaderboard_post",
+            handler="weekly_leaderboard_post",
+            cron=WEEKLY_POST_SCHEDULE,
+            # a week old leaderboard isn't worth posting late
+            misfire_policy=MisfirePolicy.skip,
+        )
+
+    async def post_weekly_leaderboard(self, run_at: datetime) -> None:
+        await self.weekly(None)
 
     def cog_unload(self) -> None:
         self.scheduler.cancel_all()
@@ -115,13 +119,6 @@ class PointLeaderboard(Cog):
         else:
             logger.info("`/leaderboard weekly` invoked automatically by scheduler")
 
-            # reschedule task for next friday at 4pm ET
-            self.scheduler.schedule(
-                run_at=self.next_weekly_lb_dt,
-                task_id=f"weekly_leaderboard_post_{uuid.uuid4()}",
-                coroutine=self.weekly(None),
-            )
-
         last_week = datetime.now() - timedelta(days=7)
         leaderboard = await self.fetch_leaderboard(ledger.c.created_at > last_week)
         description = f"Points awarded after <t:{int(last_week.timestamp())}:f>"
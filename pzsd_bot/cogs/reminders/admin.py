@@ -1,4 +1,5 @@
 import logging
+from datetime import datetime
 from typing import List
 
 from discord import (
@@ -11,19 +12,23 @@ from discord import (
 )
 from discord.commands import SlashCommandGroup, option
 from discord.ext.commands import Cog, slash_command
-from discord.ext.pages import Paginator
 from pendulum import duration
-from sqlalchemy import delete, false, select, true, update
+from sqlalchemy import delete, false, literal, select, true, tuple_, update
 from sqlalchemy.engine import Row
 from sqlalchemy.sql.elements import BinaryExpression
+from sqlalchemy.sql.functions import count
 
 from pzsd_bot.db import Session
+from pzsd_bot.ext.pagination import LazyPaginator
 from pzsd_bot.model import pzsd_user, reminder
 from pzsd_bot.settings import Roles
 from pzsd_bot.ui.buttons import get_page_buttons
 
 logger = logging.getLogger(__name__)
 
+# (remind_at, id) of a reminder, the order they're listed in
+ReminderKey = tuple[datetime, int]
+
 # If you're somehow not in one
 # of these timezones, too bad.
 TIMEZONE_CHOICES = [
@@ -61,17 +66,83 @@ class RemindersAdmin(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
 
-    async def fetch_reminders(self, *args: List[BinaryExpression]) -> List[Row]:
+    async def count_reminders(self, *args: List[BinaryExpression]) -> int:
+        async with Session.begin() as session:
+            result = await session.execute(
+                select(count()).select_from(reminder).where(*args)
+            )
+            return result.scalar_one()
+
+    async def fetch_reminders(
+        self,
+        *args: List[BinaryExpression],
+        after: ReminderKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> List[Row]:
+        """Fetch reminders ordered by when they're due.
+
+        Given the key of the last reminder on the previous page as `after`,
+        the next page is found by seeking to it in the index rather than
+        with an offset, which has to skip over every reminder before it.
+        """
+        query = select(reminder).where(*args)
+        if after is not None:
+            remind_at, reminder_id = after
+            query = query.where(
+                tuple_(reminder.c.remind_at, reminder.c.id)
+                > tuple_(literal(remind_at, reminder.c.remind_at.type), reminder_id)
+            )
+
         async with Session.begin() as session:
-            result = await session.execute(select(reminder).where(*args))
+            result = await session.execute(
+                query.order_by(reminder.c.remind_at, reminder.c.id)
+                .offset(offset)
+                .limit(limit)
+            )
             reminders = result.all()
 
         return reminders
 
+    async def make_reminder_paginator(
+        self, *args: List[BinaryExpression]
+    ) -> LazyPaginator | None:
+        reminder_count = await self.count_reminders(*args)
+        if reminder_count == 0:
+            return None
+
+        # key of the last reminder before each chunk of pages
+        # that follows one that's already been loaded
+        cursors: dict[int, ReminderKey | None] = {0: None}
+
+        async def fetch_pages(offset: int, limit: int) -> List[Embed]:
+            if offset in cursors:
+                reminder_rows = await self.fetch_reminders(
+                    *args, after=cursors[offset], limit=limit
+                )
+            else:
+                # jumped ahead of the pages loaded so far, e.g. to the last page
+                reminder_rows = await self.fetch_reminders(
+                    *args, offset=offset, limit=limit
+                )
+
+            if reminder_rows:
+                last = reminder_rows[-1]
+                cursors[offset + len(reminder_rows)] = (last.remind_at, last.id)
+
+            return self.make_reminder_pages(reminder_rows)
+
+        return LazyPaginator(
+            page_count=reminder_count,
+            fetch_pages=fetch_pages,
+            use_default_buttons=False,
+            custom_buttons=get_page_buttons(),
+        )
+
     def make_reminder_pages(self, reminder_rows: List[Row]) -> List[Embed]:
         pages = []
 
-        for reminder_data in sorted(reminder_rows, key=lambda r: r.remind_at):
+        for reminder_data in reminder_rows:
             embed = Embed()
             embed.description = f"### Reminder:\n{reminder_data.reminder_text}"
 
@@ -142,19 +213,11 @@ class RemindersAdmin(Cog):
         logger.info("%s invoked /list_all_reminders", ctx.author.name)
 
         if user is None:
-            reminders = await self.fetch_reminders()
+            paginator = await self.make_reminder_paginator()
         else:
-            reminders = await self.fetch_reminders(reminder.c.owner == user.id)
-
-        pages = self.make_reminder_pages(reminders)
-
-        if pages:
-            paginator = Paginator(
-                pages=pages,
-                use_default_buttons=False,
-                custom_buttons=get_page_buttons(),
-            )
+            paginator = await self.make_reminder_paginator(reminder.c.owner == user.id)
 
+        if paginator is not None:
             await paginator.respond(ctx.interaction, ephemeral=True)
         else:
             await ctx.respond("No reminders found", ephemeral=True)
@@ -163,16 +226,11 @@ class RemindersAdmin(Cog):
     async def list(self, ctx: ApplicationContext) -> None:
         logger.info("%s invoked /reminder list", ctx.author.name)
 
-        reminders = await self.fetch_reminders(reminder.c.owner == ctx.author.id)
-        pages = self.make_reminder_pages(reminders)
-
-        if pages:
-            paginator = Paginator(
-                pages=pages,
-                use_default_buttons=False,
-                custom_buttons=get_page_buttons(),
-            )
+        paginator = await self.make_reminder_paginator(
+            reminder.c.owner == ctx.author.id
+        )
 
+        if paginator is not None:
             await paginator.respond(ctx.interaction, ephemeral=True)
         else:
             await ctx.respond("You don't have any reminders", ephemeral=True)
@@ -1,16 +1,23 @@
 import asyncio
+import enum
 import logging
 import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import partial
 
 import pendulum
-from discord import Bot, Colour, Embed, Message
+from aiohttp import ClientError
+from discord import Bot, Colour, Embed, Forbidden, HTTPException, Message, NotFound
 from discord.ext.commands import Cog
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import case, delete, func, insert, literal, select, update
 from sqlalchemy.engine import Row
 from sqlalchemy.sql.functions import count
 
-from pzsd_bot.db import Session
+from pzsd_bot.db import Session, is_postgres
+from pzsd_bot.ext.channel_resolver import ChannelResolver
 from pzsd_bot.ext.scheduler import Scheduler
+from pzsd_bot.ext.time_parser import parse_datetime, parse_duration
 from pzsd_bot.model import ReminderStatus, pzsd_user, reminder
 from pzsd_bot.settings import Emoji, ReminderSettings
 
@@ -22,129 +29,443 @@ REMINDER_PATTERN = re.compile(
     r"to (?P<reminder>.+)",
     re.IGNORECASE | re.DOTALL,
 )
-DURATION_PATTERN = re.compile(
-    re.compile(
-        r"((?P<years>\d+?) ?(years|year|Y|y) ?)?"
-        r"((?P<months>\d+?) ?(months|month|m) ?)?"
-        r"((?P<weeks>\d+?) ?(weeks|week|W|w) ?)?"
-        r"((?P<days>\d+?) ?(days|day|D|d) ?)?"
-        r"((?P<hours>\d+?) ?(hours|hour|hrs?|H|h) ?)?"
-        r"((?P<minutes>\d+?) ?(minutes|minute|min|M) ?)?"
-        r"((?P<seconds>\d+?) ?(seconds|second|secs?|S|s))?"
-    )
-)
-
 MINIMUM_INTERVAL_FREQUENCY = pendulum.duration(days=1)
 MAXIMUM_INTERVAL_FREQUENCY = pendulum.duration(seconds=2147483647)  # ~68 years
 
+REFILL_PAGE_SIZE = 500
+MAX_EMBEDS_PER_MESSAGE = 10
+
+# errors delivering a reminder that may not happen if tried again
+TRANSIENT_ERRORS = (HTTPException, ClientError, asyncio.TimeoutError)
+
+
+class DeliveryResult(enum.Enum):
+    sent = "sent"
+    failed = "failed"
+    retry = "retry"
+
 
 class Reminders(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
         self.scheduler = Scheduler(__class__.__name__)
+        # reminders due before this have been scheduled
+        self.horizon_end: pendulum.DateTime | None = None
+
+        # due reminders are delivered in batches
+        self.due_reminders: list[Row] = []
+        self.delivery_task: asyncio.Task | None = None
+        self.delivery_attempts: dict[int, int] = {}
+        self.channels = ChannelResolver(
+            bot,
+            ttl=ReminderSettings.channel_cache_ttl,
+            negative_ttl=ReminderSettings.channel_negative_cache_ttl,
+        )
 
         asyncio.create_task(self.load_reminders())
 
     @staticmethod
     def parse_relative_time(time: str) -> pendulum.Duration | None:
-        if m := DURATION_PATTERN.fullmatch(time):
-            duration = {
-                unit: int(amount) for unit, amount in m.groupdict(default=0).items()
-            }
-            return pendulum.duration(**duration)
+        return parse_duration(time)
 
     @staticmethod
     def parse_absolute_time(time: str, timezone: str) -> pendulum.DateTime | None:
-        try:
-            return pendulum.parse(time, strict=False, tz=timezone)
-        except pendulum.exceptions.ParserError:
-            return None
+        return parse_datetime(time, timezone)
+
+    @staticmethod
+    def next_occurrence(
+        remind_at: datetime, interval: int, now: datetime
+    ) -> tuple[datetime, int]:
+        """Get the first occurrence of a recurring reminder after now, along
+        with how many occurrences before the current one were missed.
+
+        Computed directly rather than stepping one interval at a time, so
+        a reminder that fell behind during downtime fires once and skips
+        ahead instead of firing for every occurrence it missed.
+        """
+        step = timedelta(seconds=interval)
+        if now < remind_at:
+            return remind_at + step, 0
+
+        elapsed = (now - remind_at).total_seconds()
+        occurrences_due = int(elapsed // interval) + 1
+        return remind_at + occurrences_due * step, occurrences_due - 1
 
     async def load_reminders(self) -> None:
         logger.info("Loading pending reminders and rescheduling them")
 
-        async with Session.begin() as session:
-            result = await session.execute(
-                select(reminder).where(reminder.c.status == ReminderStatus.pending)
-            )
-            pending_reminders = result.all()
+        self.horizon_end = None
+        await self.refill_reminders()
+
+    async def refill_reminders(self) -> None:
+        """Schedule pending reminders due before the end of the next horizon.
 
-        for pending_reminder in pending_reminders:
+        Only reminders within the horizon are held in memory, so this runs
+        periodically to page in the next window before the current one ends.
+        """
+        window_start = self.horizon_end
+        window_end = pendulum.now("UTC") + pendulum.duration(
+            seconds=ReminderSettings.load_horizon
+        )
+
+        query = select(reminder).where(
+            reminder.c.status == ReminderStatus.pending,
+            reminder.c.remind_at < window_end,
+        )
+        if window_start is not None:
+            query = query.where(reminder.c.remind_at >= window_start)
+
+        # extend the horizon before querying so reminders created
+        # meanwhile are scheduled by on_message rather than missed
+        self.horizon_end = window_end
+
+        scheduled = 0
+        try:
+            async with Session.begin() as session:
+                result = await session.stream(query.order_by(reminder.c.remind_at))
+                async for partition in result.partitions(REFILL_PAGE_SIZE):
+                    for pending_reminder in partition:
+                        self.scheduler.schedule(
+                            run_at=pending_reminder.remind_at,
+                            task_id=f"reminder_{pending_reminder.id}",
+                            coroutine=partial(self.queue_reminder, pending_reminder),
+                        )
+                    scheduled += len(partition)
+        except Exception:
+            logger.exception("Failed to load reminders, retrying next refill")
+            self.horizon_end = window_start
+        else:
+            logger.info(
+                "Scheduled %s reminders due before %s",
+                scheduled,
+                window_end.isoformat(),
+            )
+        finally:
+            # refill halfway through the window so the
+            # next one is loaded well before this one ends
             self.scheduler.schedule(
-                run_at=pending_reminder.remind_at,
-                task_id=f"reminder_{pending_reminder.id}",
-                coroutine=self.send_reminder(pending_reminder),
+                run_at=pendulum.now("UTC").add(
+                    seconds=ReminderSettings.load_horizon / 2
+                ),
+                task_id="reminder_refill",
+                coroutine=self.refill_reminders,
             )
-        logger.info("Scheduled %s reminders", len(pending_reminders))
+
+    def is_within_horizon(self, reminder_data: Row) -> bool:
+        return (
+            self.horizon_end is not None and reminder_data.remind_at < self.horizon_end
+        )
 
     def cog_unload(self) -> None:
         self.scheduler.cancel_all()
+        if self.delivery_task is not None:
+            self.delivery_task.cancel()
 
     async def reschedule_reminder(self, reminder_data: Row) -> None:
+        if not self.is_within_horizon(reminder_data):
+            logger.info(
+                "Recurring reminder (id=%s) is outside the horizon, leaving it to be refilled",
+                reminder_data.id,
+            )
+            return
+
         logger.info("Rescheduling recurring reminder (id=%s)", reminder_data.id)
 
         self.scheduler.schedule(
             run_at=reminder_data.remind_at,
             task_id=f"reminder_{reminder_data.id}",
-            coroutine=self.send_reminder(reminder_data),
+            coroutine=partial(self.queue_reminder, reminder_data),
         )
 
+    async def queue_reminder(self, reminder_data: Row) -> None:
+        """Queue a due reminder to be delivered along with any others that
+        come due within the delivery window."""
+        self.due_reminders.append(reminder_data)
+        if self.delivery_task is None:
+            self.delivery_task = asyncio.create_task(self.deliver_queued_reminders())
+
+    async def deliver_queued_reminders(self) -> None:
+        await asyncio.sleep(ReminderSettings.delivery_window)
+
+        due_reminders, self.due_reminders = self.due_reminders, []
+        self.delivery_task = None
+        try:
+            await self.send_reminders(due_reminders)
+        except Exception:
+            # nothing else awaits this task, so the batch
+            # would otherwise be dropped without a trace
+            logger.exception(
+                "Failed to deliver reminders (ids=%s), will retry",
+                [r.id for r in due_reminders],
+            )
+            for reminder_data in due_reminders:
+                self.schedule_retry(reminder_data)
+
     async def send_reminder(self, reminder_data: Row) -> None:
-        logger.info("Attempting to send reminder (id=%s)", reminder_data.id)
+        await self.send_reminders([reminder_data])
+
+    @staticmethod
+    def make_reminder_embed(reminder_data: Row, missed: int) -> Embed:
+        embed = Embed(
+            description=reminder_data.reminder_text,
+            colour=Colour.blurple(),
+        )
+        if missed and ReminderSettings.summarize_missed:
+            embed.set_footer(
+                text=f"Missed {missed} earlier occurrence{'s' if missed > 1 else ''} while I was offline"
+            )
+
+        return embed
+
+    async def deliver_to_channel(
+        self, channel_id: int, reminders: list[Row], missed: dict[int, int]
+    ) -> dict[int, DeliveryResult]:
+        """Send reminders due in the same channel, grouped into as few
+        messages as possible, returning the result for each reminder."""
+        try:
+            channel = await self.channels.resolve(channel_id)
+        except TRANSIENT_ERRORS as e:
+            logger.warning(
+                "Failed to get channel (id=%s), will retry: %s", channel_id, e
+            )
+            return dict.fromkeys((r.id for r in reminders), DeliveryResult.retry)
 
-        channel = self.bot.get_channel(reminder_data.channel_id)
         if channel is None:
-            # channel may not be cached yet
-            logger.debug("Couldn't find channel in cache, attempting to fetch")
+            logger.warning(
+                "Failed to send reminders (ids=%s), can't find channel (id=%s)",
+                [r.id for r in reminders],
+                channel_id,
+            )
+            return dict.fromkeys((r.id for r in reminders), DeliveryResult.failed)
+
+        if len(reminders) == 1:
+            chunks = [reminders]
+        else:
+            chunks = [
+                reminders[i : i + MAX_EMBEDS_PER_MESSAGE]
+                for i in range(0, len(reminders), MAX_EMBEDS_PER_MESSAGE)
+            ]
+
+        results = {}
+        for chunk in chunks:
             try:
-                channel = await self.bot.fetch_channel(reminder_data.channel_id)
-            except Exception as e:
-                logger.warning(
-                    "Failed to send reminder (id=%s), can't find channel (id=%s) with error: %s",
-                    reminder_data.id,
-                    reminder_data.channel_id,
-                    e,
-                )
-                async with Session.begin() as session:
-                    await session.execute(
-                        update(reminder)
-                        .values(status=ReminderStatus.failed)
-                        .where(reminder.c.id == reminder_data.id)
+                if len(reminders) == 1:
+                    reminder_data = chunk[0]
+                    original_message = channel.get_partial_message(
+                        reminder_data.original_message_id
                     )
+                    embed = self.make_reminder_embed(
+                        reminder_data, missed[reminder_data.id]
+                    )
+                    await original_message.reply("Here's your reminder:", embed=embed)
+                else:
+                    embeds = []
+                    for reminder_data in chunk:
+                        original_message = channel.get_partial_message(
+                            reminder_data.original_message_id
+                        )
+                        embed = self.make_reminder_embed(
+                            reminder_data, missed[reminder_data.id]
+                        )
+                        embed.add_field(
+                            name="",
+                            value=f"<@{reminder_data.owner}> {original_message.jump_url}",
+                        )
+                        embeds.append(embed)
+
+                    mentions = " ".join(dict.fromkeys(f"<@{r.owner}>" for r in chunk))
+                    await channel.send(
+                        f"Here are your reminders {mentions}:", embeds=embeds
+                    )
+            except (NotFound, Forbidden):
+                logger.exception(
+                    "Failed to send reminders (ids=%s) to channel (id=%s)",
+                    [r.id for r in chunk],
+                    channel_id,
+                )
+                self.channels.invalidate(channel_id)
+                result = DeliveryResult.failed
+            except TRANSIENT_ERRORS:
+                logger.exception(
+                    "Failed to send reminders (ids=%s) to channel (id=%s), will retry",
+                    [r.id for r in chunk],
+                    channel_id,
+                )
+                result = DeliveryResult.retry
+            else:
+                logger.info("Reminders sent (ids=%s)", [r.id for r in chunk])
+                result = DeliveryResult.sent
+
+            results.update(dict.fromkeys((r.id for r in chunk), result))
+
+        return results
+
+    def schedule_retry(self, reminder_data: Row) -> bool:
+        """Retry delivering a reminder with exponential backoff,
+        returning False once it's out of attempts."""
+        attempts = self.delivery_attempts.get(reminder_data.id, 0) + 1
+        if attempts >= ReminderSettings.delivery_max_attempts:
+            logger.warning(
+                "Giving up on reminder (id=%s) after %s attempts",
+                reminder_data.id,
+                attempts,
+            )
+            self.delivery_attempts.pop(reminder_data.id, None)
+            return False
 
-                return
-
-        original_message = channel.get_partial_message(
-            reminder_data.original_message_id
+        self.delivery_attempts[reminder_data.id] = attempts
+        delay = ReminderSettings.delivery_retry_delay * 2 ** (attempts - 1)
+        logger.info(
+            "Retrying reminder (id=%s) in %s seconds (attempt %s)",
+            reminder_data.id,
+            delay,
+            attempts + 1,
         )
-        embed = Embed(
-            description=reminder_data.reminder_text,
-            colour=Colour.blurple(),
+        self.scheduler.schedule(
+            run_at=pendulum.now("UTC").add(seconds=delay),
+            task_id=f"reminder_{reminder_data.id}",
+            coroutine=partial(self.queue_reminder, reminder_data),
         )
-        await original_message.reply("Here's your reminder:", embed=embed)
+        return True
 
-        logger.info("Reminder sent (id=%s)", reminder_data.id)
+    async def send_reminders(self, due_reminders: list[Row]) -> None:
+        """Deliver a batch of due reminders, then delete or advance them
+        with one statement each."""
+        logger.info(
+            "Attempting to send reminders (ids=%s)", [r.id for r in due_reminders]
+        )
 
-        if reminder_data.is_recurring:
-            new_remind_at = reminder_data.remind_at + pendulum.duration(
-                seconds=reminder_data.recurrence_interval
+        reminders_by_channel = defaultdict(list)
+        next_remind_at = {}
+        missed = {}
+        for reminder_data in due_reminders:
+            reminders_by_channel[reminder_data.channel_id].append(reminder_data)
+
+            if reminder_data.is_recurring:
+                next_remind_at[reminder_data.id], missed[reminder_data.id] = (
+                    self.next_occurrence(
+                        reminder_data.remind_at,
+                        reminder_data.recurrence_interval,
+                        datetime.now(reminder_data.remind_at.tzinfo),
+                    )
+                )
+            else:
+                missed[reminder_data.id] = 0
+
+        results = {}
+        channel_results = await asyncio.gather(
+            *(
+                self.deliver_to_channel(channel_id, reminders, missed)
+                for channel_id, reminders in reminders_by_channel.items()
+            ),
+            return_exceptions=True,
+        )
+        for (channel_id, reminders), channel_result in zip(
+            reminders_by_channel.items(), channel_results
+        ):
+            # one channel failing unexpectedly shouldn't take the others down
+            if isinstance(channel_result, Exception):
+                logger.error(
+                    "Failed to send reminders (ids=%s) to channel (id=%s), will retry",
+                    [r.id for r in reminders],
+                    channel_id,
+                    exc_info=channel_result,
+                )
+                channel_result = dict.fromkeys(
+                    (r.id for r in reminders), DeliveryResult.retry
+                )
+            results.update(channel_result)
+
+        failed_ids = []
+        sent_ids = []
+        recurring_ids = []
+        for reminder_data in due_reminders:
+            match results[reminder_data.id]:
+                case DeliveryResult.sent:
+                    self.delivery_attempts.pop(reminder_data.id, None)
+                    if reminder_data.id in next_remind_at:
+                        recurring_ids.append(reminder_data.id)
+                    else:
+                        sent_ids.append(reminder_data.id)
+                case DeliveryResult.retry:
+                    if not self.schedule_retry(reminder_data):
+                        failed_ids.append(reminder_data.id)
+                case DeliveryResult.failed:
+                    self.delivery_attempts.pop(reminder_data.id, None)
+                    failed_ids.append(reminder_data.id)
+
+        for reminder_id in recurring_ids:
+            if missed[reminder_id]:
+                logger.info(
+                    "Recurring reminder (id=%s) missed %s occurrences, skipping to %s",
+                    reminder_id,
+                    missed[reminder_id],
+                    next_remind_at[reminder_id],
+                )
+
+        try:
+            rescheduled_reminders = await self.finish_reminders(
+                failed_ids, sent_ids, recurring_ids, next_remind_at
             )
-            async with Session.begin() as session:
+        except Exception:
+            finished_ids = {*failed_ids, *sent_ids, *recurring_ids}
+            logger.exception(
+                "Failed to update delivered reminders (ids=%s), will retry",
+                sorted(finished_ids),
+            )
+            # they're still pending in the db, so they're retried rather
+            # than lost, even though that sends delivered ones again
+            for reminder_data in due_reminders:
+                if reminder_data.id in finished_ids:
+                    self.schedule_retry(reminder_data)
+        else:
+            for reminder_data in rescheduled_reminders:
+                asyncio.create_task(self.reschedule_reminder(reminder_data))
+
+    async def finish_reminders(
+        self,
+        failed_ids: list[int],
+        sent_ids: list[int],
+        recurring_ids: list[int],
+        next_remind_at: dict[int, datetime],
+    ) -> list[Row]:
+        """Mark failed reminders, delete sent ones and advance recurring
+        ones, returning the recurring reminders as they were updated."""
+        rescheduled_reminders = []
+        async with Session.begin() as session:
+            if failed_ids:
+                logger.info("Marking reminders (ids=%s) as failed", failed_ids)
+                await session.execute(
+                    update(reminder)
+                    .values(status=ReminderStatus.failed)
+                    .where(reminder.c.id.in_(failed_ids))
+                )
+
+            if sent_ids:
+                logger.debug("Deleting reminders with ids=%s", sent_ids)
+                await session.execute(
+                    delete(reminder).where(reminder.c.id.in_(sent_ids))
+                )
+
+            if recurring_ids:
+                new_remind_at = case(
+                    {
+                        reminder_id: literal(
+                            next_remind_at[reminder_id], reminder.c.remind_at.type
+                        )
+                        for reminder_id in recurring_ids
+                    },
+                    value=reminder.c.id,
+                )
                 result = await session.execute(
                     update(reminder)
                     .values(remind_at=new_remind_at)
-                    .where(reminder.c.id == reminder_data.id)
+                    .where(reminder.c.id.in_(recurring_ids))
                     .returning(reminder)
                 )
-                reminder_data = result.one()
+                rescheduled_reminders = result.all()
 
-            asyncio.create_task(self.reschedule_reminder(reminder_data))
-        else:
-            logger.debug("Deleting reminder with id=%s", reminder_data.id)
-            async with Session.begin() as session:
-                await session.execute(
-                    delete(reminder).where(reminder.c.id == reminder_data.id)
-                )
+        return rescheduled_reminders
 
     @Cog.listener()
     async def on_message(self, message: Message) -> None:
@@ -220,44 +541,64 @@ class Reminders(Cog):
         else:
             recurrence_interval = None
 
+        values = {
+            "owner": message.author.id,
+            "channel_id": message.channel.id,
+            "original_message_id": message.id,
+            "reminder_text": m["reminder"],
+            "remind_at": remind_at,
+            "is_recurring": is_recurring,
+            "recurrence_interval": recurrence_interval,
+            "status": ReminderStatus.pending,
+        }
+        pending_reminder_count = (
+            select(count())
+            .select_from(reminder)
+            .where(reminder.c.owner == message.author.id)
+            .where(reminder.c.status == ReminderStatus.pending)
+            .scalar_subquery()
+        )
+        # check the cap and insert in one statement
+        # instead of counting in a separate round trip
         async with Session.begin() as session:
+            if is_postgres():
+                # under read committed two concurrent inserts could both see
+                # the count under the cap, so they're serialized per owner.
+                # sqlite only allows one writer at a time anyway
+                await session.execute(
+                    select(func.pg_advisory_xact_lock(message.author.id))
+                )
             result = await session.execute(
-                select(count())
-                .select_from(reminder)
-                .where(reminder.c.owner == message.author.id)
-                .where(reminder.c.status == ReminderStatus.pending)
+                insert(reminder)
+                .from_select(
+                    list(values),
+                    select(
+                        *(
+                            literal(value, reminder.c[column].type)
+                            for column, value in values.items()
+                        )
+                    ).where(pending_reminder_count < ReminderSettings.max_reminders),
+                )
+                .returning(reminder)
             )
-            reminder_count = result.scalar_one()
+            new_reminder = result.one_or_none()
 
-            if reminder_count < ReminderSettings.max_reminders:
-                result = await session.execute(
-                    insert(reminder)
-                    .values(
-                        owner=message.author.id,
-                        channel_id=message.channel.id,
-                        original_message_id=message.id,
-                        reminder_text=m["reminder"],
-                        remind_at=remind_at,
-                        is_recurring=is_recurring,
-                        recurrence_interval=recurrence_interval,
-                    )
-                    .returning(reminder)
-                )
-                new_reminder = result.one()
-            else:
-                logger.info(
-                    "%s tried creating a reminder but it would exceed the max allowed (%s)",
-                    message.author.name,
-                    ReminderSettings.max_reminders,
-                )
-                await message.add_reaction(Emoji.nopers)
-                return
+        if new_reminder is None:
+            logger.info(
+                "%s tried creating a reminder but it would exceed the max allowed (%s)",
+                message.author.name,
+                ReminderSettings.max_reminders,
+            )
+            await message.add_reaction(Emoji.nopers)
+            return
 
-        self.scheduler.schedule(
-            run_at=new_reminder.remind_at,
-            task_id=f"reminder_{new_reminder.id}",
-            coroutine=self.send_reminder(new_reminder),
-        )
+        # reminders past the horizon are picked up by a later refill
+        if self.is_within_horizon(new_reminder):
+            self.scheduler.schedule(
+                run_at=new_reminder.remind_at,
+                task_id=f"reminder_{new_reminder.id}",
+                coroutine=partial(self.queue_reminder, new_reminder),
+            )
         await message.add_reaction(Emoji.check_mark)
         abbreviated_reminder_invocation = (
             m[0][: m[0].find("to") + 2] + "\N{HORIZONTAL ELLIPSIS}"
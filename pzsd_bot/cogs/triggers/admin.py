@@ -1,31 +1,62 @@
+import io
 import logging
+import statistics
 from typing import List
 
-from discord import ApplicationContext, Bot, Embed, Member, OptionChoice
+import emoji
+from discord import (
+    ApplicationContext,
+    Attachment,
+    Bot,
+    Embed,
+    File,
+    Member,
+    OptionChoice,
+)
+from discord.abc import GuildChannel
 from discord.commands import SlashCommandGroup, option
 from discord.ext.commands import Cog
-from discord.ext.pages import Paginator
-from sqlalchemy import delete, false, func, select, true, update
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import Select, delete, false, func, insert, select, true, update
 from sqlalchemy.engine import Row
 from sqlalchemy.sql.elements import BinaryExpression
 from sqlalchemy.sql.functions import count
 
-from pzsd_bot.db import Session
+from pzsd_bot.db import Session, aggregate_list
+from pzsd_bot.ext.notify import notify
+from pzsd_bot.ext.pagination import LazyPaginator
+from pzsd_bot.ext.trigger_index import PatternProfile
+from pzsd_bot.ext.word_index import tokenize
 from pzsd_bot.model import (
     TriggerResponseType,
     trigger_group,
     trigger_pattern,
     trigger_response,
 )
-from pzsd_bot.settings import Roles
+from pzsd_bot.settings import Roles, TriggerSettings
 from pzsd_bot.ui.buttons import get_page_buttons
-from pzsd_bot.ui.triggers.modals import AddTriggerModal, EditTriggerModal
+from pzsd_bot.ui.triggers.modals import (
+    AddTriggerModal,
+    EditTriggerModal,
+    is_valid_emoji,
+    is_valid_regex,
+)
 
 logger = logging.getLogger(__name__)
 
 NORMAL_TRIGGERS_LIMIT = 200
 REGEX_TRIGGERS_LIMIT = 100
 
+# patterns that take this many times longer than the
+# median pattern (and at least SLOW_PATTERN_FLOOR
+# seconds) are flagged by /trigger test
+SLOW_PATTERN_FACTOR = 10
+SLOW_PATTERN_FLOOR = 0.0001
+
+TRIGGER_EXPORT_VERSION = 1
+# stop collecting import errors after this many
+MAX_IMPORT_ERRORS = 10
+
 TRIGGER_COLUMNS = [
     OptionChoice(name="Pattern", value="pattern"),
     OptionChoice(name="Creation time", value="created_at"),
@@ -35,96 +66,164 @@ TRIGGER_COLUMNS = [
 ]
 
 
+class TriggerExport(BaseModel):
+    owner: int
+    is_active: bool = True
+    response_type: TriggerResponseType = TriggerResponseType.standard
+    scope_id: int | None = None
+    is_regex: bool = False
+    is_whole_word: bool = False
+    patterns: List[str] = Field(min_length=1)
+    responses: List[str] = Field(min_length=1)
+
+
+class TriggerFile(BaseModel):
+    version: int
+    triggers: List[TriggerExport]
+
+
 class TriggerAdmin(Cog):
     trigger_cmd = SlashCommandGroup("trigger", "Manage triggers.")
 
     def __init__(self, bot: Bot):
         self.bot = bot
 
-    async def fetch_triggers(
-        self, *args: List[BinaryExpression], sort_col: str = "pattern"
-    ) -> List[Row]:
+    def triggers_query(self, *args: List[BinaryExpression]) -> Select:
+        """Select one row per trigger group with its patterns and responses
+        aggregated into lists.
+
+        Patterns and responses are aggregated separately before being joined
+        to their group, otherwise every pattern would be repeated for every
+        response.
+        """
         TP = trigger_pattern.columns
         TR = trigger_response.columns
         TG = trigger_group.columns
 
+        patterns = (
+            select(
+                TP.group_id,
+                TP.is_regex,
+                TP.is_whole_word,
+                func.min(TP.pattern).label("first_pattern"),
+                aggregate_list(TP.pattern, TP.id).label("patterns"),
+            )
+            .group_by(TP.group_id, TP.is_regex, TP.is_whole_word)
+            .subquery()
+        )
+        responses = (
+            select(
+                TR.group_id,
+                aggregate_list(TR.response, TR.id).label("responses"),
+            )
+            .group_by(TR.group_id)
+            .subquery()
+        )
+
+        return (
+            select(
+                TG.id,
+                TG.is_active,
+                patterns.c.is_regex,
+                patterns.c.is_whole_word,
+                TG.response_type,
+                TG.owner,
+                TG.created_at,
+                TG.updated_at,
+                TG.scope_id,
+                patterns.c.first_pattern,
+                patterns.c.patterns,
+                responses.c.responses,
+            )
+            .join(patterns, patterns.c.group_id == TG.id)
+            .join(responses, responses.c.group_id == TG.id)
+            .where(*args)
+        )
+
+    async def count_triggers(self, *args: List[BinaryExpression]) -> int:
+        async with Session.begin() as session:
+            result = await session.execute(
+                select(count()).select_from(self.triggers_query(*args).subquery())
+            )
+            return result.scalar_one()
+
+    async def fetch_triggers(
+        self,
+        *args: List[BinaryExpression],
+        sort_col: str = "pattern",
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> List[Row]:
+        query = self.triggers_query(*args)
+
         col_map = {
-            "pattern": TP.pattern,
-            "created_at": TG.created_at,
-            "updated_at": TG.updated_at,
-            "id": TG.id,
-            "owner": TG.owner,
+            "pattern": query.selected_columns.first_pattern,
+            "created_at": trigger_group.c.created_at,
+            "updated_at": trigger_group.c.updated_at,
+            "id": trigger_group.c.id,
+            "owner": trigger_group.c.owner,
         }
 
         async with Session.begin() as session:
             result = await session.execute(
-                select(
-                    TG.id,
-                    TG.is_active,
-                    TP.is_regex,
-                    TG.response_type,
-                    TG.owner,
-                    TG.created_at,
-                    TG.updated_at,
-                    TP.pattern,
-                    TR.response,
-                )
-                .join(trigger_group, TP.group_id == TG.id)
-                .join(trigger_response, TG.id == TR.group_id)
-                .where(*args)
-                .order_by(col_map[sort_col])
+                query.order_by(col_map[sort_col], trigger_group.c.id)
+                .offset(offset)
+                .limit(limit)
             )
             trigger_rows = result.all()
 
         return trigger_rows
 
     def make_trigger_pages(self, trigger_rows: List[Row]) -> List[Embed]:
-        triggers = {}
-        for trigger in trigger_rows:
-            if trigger.id not in triggers:
-                triggers[trigger.id] = {
-                    "trigger_id": trigger.id,
-                    "is_regex": trigger.is_regex,
-                    "is_active": trigger.is_active,
-                    "response_type": trigger.response_type.value,
-                    "owner": f"<@{trigger.owner}>",
-                    "created_at": f"<t:{int(trigger.created_at.timestamp())}:f>",
-                    "updated_at": f"<t:{int(trigger.updated_at.timestamp())}:f>",
-                    "pattern": [trigger.pattern],
-                    "response": [trigger.response],
-                }
-            else:
-                triggers[trigger.id]["pattern"].append(trigger.pattern)
-                triggers[trigger.id]["response"].append(trigger.response)
-
         pages = []
-        for trigger in triggers.values():
+        for trigger in trigger_rows:
             embed = Embed(title="All Triggers")
-            patterns = ",".join(dict.fromkeys(trigger["pattern"]))
+            patterns = ",".join(trigger.patterns)
 
-            responses = list(dict.fromkeys(trigger["response"]))
             embed.description = f"# {patterns}\n### Responses:\n"
-            for response in responses:
+            for response in trigger.responses:
                 embed.description += f"* {response}\n"
 
             value = (
                 "Trigger ID: {}\nowner: {}\nresponse_type: {}"
-                "\nis_active: {}\nis_regex: {}\ncreated_at: {}"
-                "\nupdated_at: {}"
+                "\nscope: {}\nis_active: {}\nis_regex: {}\nis_whole_word: {}"
+                "\ncreated_at: {}\nupdated_at: {}"
             ).format(
-                trigger["trigger_id"],
-                trigger["owner"],
-                trigger["response_type"],
-                trigger["is_active"],
-                trigger["is_regex"],
-                trigger["created_at"],
-                trigger["updated_at"],
+                trigger.id,
+                f"<@{trigger.owner}>",
+                trigger.response_type.value,
+                f"<#{trigger.scope_id}>" if trigger.scope_id else "global",
+                trigger.is_active,
+                trigger.is_regex,
+                trigger.is_whole_word,
+                f"<t:{int(trigger.created_at.timestamp())}:f>",
+                f"<t:{int(trigger.updated_at.timestamp())}:f>",
             )
             embed.add_field(name="Metadata:", value=value)
             pages.append(embed)
 
         return pages
 
+    async def make_trigger_paginator(
+        self, *args: List[BinaryExpression], sort_col: str
+    ) -> LazyPaginator | None:
+        trigger_count = await self.count_triggers(*args)
+        if trigger_count == 0:
+            return None
+
+        async def fetch_pages(offset: int, limit: int) -> List[Embed]:
+            trigger_rows = await self.fetch_triggers(
+                *args, sort_col=sort_col, offset=offset, limit=limit
+            )
+            return self.make_trigger_pages(trigger_rows)
+
+        return LazyPaginator(
+            page_count=trigger_count,
+            fetch_pages=fetch_pages,
+            use_default_buttons=False,
+            custom_buttons=get_page_buttons(),
+        )
+
     @trigger_cmd.command(description="Add a trigger.")
     @option(
         "is_regex",
@@ -138,16 +237,43 @@ class TriggerAdmin(Cog):
         default="Standard",
         choices=["Standard", "Reply", "Reaction"],
     )
+    @option(
+        "is_whole_word",
+        description="If pattern should only match whole words or phrases.",
+        default=False,
+        choices=[True, False],
+    )
+    @option(
+        "scope",
+        GuildChannel,
+        description="Only trigger in this channel or category.",
+        required=False,
+    )
     async def add(
-        self, ctx: ApplicationContext, is_regex: bool, response_type: str
+        self,
+        ctx: ApplicationContext,
+        is_regex: bool,
+        response_type: str,
+        is_whole_word: bool,
+        scope: GuildChannel,
     ) -> None:
         logger.info(
-            "%s invoked /trigger add with is_regex=%s, response_type=%s",
+            "%s invoked /trigger add with is_regex=%s, response_type=%s, is_whole_word=%s, scope=%s",
             ctx.author.name,
             is_regex,
             response_type,
+            is_whole_word,
+            getattr(scope, "name", None),
         )
 
+        if is_regex and is_whole_word:
+            logger.info("Trigger can't be both regex and whole word, doing nothing")
+            await ctx.respond(
+                "A trigger can't be both a regex and whole word trigger.",
+                ephemeral=True,
+            )
+            return
+
         match response_type:
             case "Standard":
                 response_type = TriggerResponseType.standard
@@ -183,7 +309,9 @@ class TriggerAdmin(Cog):
         modal = AddTriggerModal(
             title="New trigger",
             is_regex=is_regex,
+            is_whole_word=is_whole_word,
             response_type=response_type,
+            scope_id=getattr(scope, "id", None),
             bot=self.bot,
         )
         await ctx.send_modal(modal)
@@ -201,18 +329,10 @@ class TriggerAdmin(Cog):
             "%s invoked /trigger list with sort_by=%s", ctx.author.name, sort_by
         )
 
-        trigger_rows = await self.fetch_triggers(
+        paginator = await self.make_trigger_paginator(
             trigger_group.c.owner == ctx.author.id, sort_col=sort_by
         )
-
-        pages = self.make_trigger_pages(trigger_rows)
-        if pages:
-            paginator = Paginator(
-                pages=pages,
-                use_default_buttons=False,
-                custom_buttons=get_page_buttons(),
-            )
-
+        if paginator is not None:
             await paginator.respond(ctx.interaction, ephemeral=True)
         else:
             await ctx.respond("You don't have any triggers", ephemeral=True)
@@ -239,24 +359,261 @@ class TriggerAdmin(Cog):
         )
 
         if user is not None:
-            trigger_rows = await self.fetch_triggers(
+            paginator = await self.make_trigger_paginator(
                 trigger_group.c.owner == user.id, sort_col=sort_by
             )
         else:
-            trigger_rows = await self.fetch_triggers(sort_col=sort_by)
-
-        pages = self.make_trigger_pages(trigger_rows)
-        if pages:
-            paginator = Paginator(
-                pages=pages,
-                use_default_buttons=False,
-                custom_buttons=get_page_buttons(),
-            )
+            paginator = await self.make_trigger_paginator(sort_col=sort_by)
 
+        if paginator is not None:
             await paginator.respond(ctx.interaction, ephemeral=True)
         else:
             await ctx.respond("No triggers exist", ephemeral=True)
 
+    def make_profile_embed(self, text: str, profiles: List[PatternProfile]) -> Embed:
+        elapsed = sorted(profile.elapsed for profile in profiles)
+        median = statistics.median(elapsed) if elapsed else 0
+
+        embed = Embed(title="Trigger Test")
+
+        matches = []
+        for profile in profiles:
+            if profile.span is None:
+                continue
+
+            group_id, pattern, response_type = profile.key
+            start, end = profile.span
+            matches.append(
+                f"* id={group_id} ({profile.kind}, {response_type.value}) `{pattern}` "
+                f"matched `{text[start:end]}` at {start}-{end} "
+                f"in {profile.elapsed * 1e6:.1f}µs"
+            )
+        embed.add_field(
+            name="Matches:",
+            value="\n".join(matches)[:1024] or "Nothing matched",
+            inline=False,
+        )
+
+        slow_patterns = []
+        for profile in sorted(profiles, key=lambda p: p.elapsed, reverse=True):
+            if (
+                profile.elapsed < SLOW_PATTERN_FLOOR
+                or profile.elapsed < median * SLOW_PATTERN_FACTOR
+            ):
+                break
+
+            group_id, pattern, _ = profile.key
+            slow_pattern = (
+                f"* id={group_id} ({profile.kind}) `{pattern}` took "
+                f"{profile.elapsed * 1e6:.1f}µs"
+            )
+            # the median is 0 when most patterns were too quick for the clock
+            if median > 0:
+                slow_pattern += f" ({profile.elapsed / median:.0f}x median)"
+            slow_patterns.append(slow_pattern)
+        if slow_patterns:
+            embed.add_field(
+                name="Slow patterns:",
+                value="\n".join(slow_patterns)[:1024],
+                inline=False,
+            )
+
+        embed.set_footer(
+            text=f"Evaluated {len(profiles)} patterns in {sum(elapsed) * 1e3:.2f}ms "
+            f"(median {median * 1e6:.1f}µs)"
+        )
+
+        return embed
+
+    @trigger_cmd.command(description="Test which triggers match some text.")
+    @option("text", description="Text to test triggers against.")
+    async def test(self, ctx: ApplicationContext, text: str) -> None:
+        logger.info("%s invoked /trigger test with text='%s'", ctx.author.name, text)
+
+        triggers_cog = self.bot.get_cog("Triggers")
+        if triggers_cog is None:
+            logger.warning("Can't find Triggers cog, unable to test triggers")
+            await ctx.respond("Triggers aren't loaded right now.", ephemeral=True)
+            return
+
+        profiles = triggers_cog.profile(text, ctx.channel)
+        embed = self.make_profile_embed(text, profiles)
+
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    async def export_triggers(self) -> io.BytesIO:
+        """Write every trigger group to a json file, streaming rows from the
+        db rather than loading them all at once."""
+        buffer = io.BytesIO()
+        buffer.write(f'{{"version": {TRIGGER_EXPORT_VERSION}, "triggers": [\n'.encode())
+
+        async with Session() as session:
+            result = await session.stream(
+                self.triggers_query().order_by(trigger_group.c.id)
+            )
+            first = True
+            async for row in result:
+                trigger = TriggerExport(
+                    owner=row.owner,
+                    is_active=row.is_active,
+                    response_type=row.response_type,
+                    scope_id=row.scope_id,
+                    is_regex=row.is_regex,
+                    is_whole_word=row.is_whole_word,
+                    patterns=row.patterns,
+                    responses=row.responses,
+                )
+                if not first:
+                    buffer.write(b",\n")
+                buffer.write(trigger.model_dump_json().encode())
+                first = False
+
+        buffer.write(b"\n]}\n")
+        buffer.seek(0)
+
+        return buffer
+
+    def validate_import(self, triggers: List[TriggerExport]) -> List[str]:
+        """Check and normalize every imported trigger the same way the trigger
+        modals do, returning a description of each problem found."""
+        errors = []
+        for i, trigger in enumerate(triggers):
+            if len(errors) >= MAX_IMPORT_ERRORS:
+                break
+
+            if trigger.is_regex and trigger.is_whole_word:
+                errors.append(f"Trigger {i} can't be both regex and whole word")
+
+            for pattern in trigger.patterns:
+                if trigger.is_regex and not is_valid_regex(pattern):
+                    errors.append(f"Trigger {i} has invalid regex `{pattern}`")
+                elif trigger.is_whole_word and not tokenize(pattern):
+                    errors.append(f"Trigger {i} has whole word pattern without words")
+
+            if trigger.response_type is TriggerResponseType.reaction:
+                trigger.responses = [
+                    emoji.emojize(response.strip(), language="alias")
+                    for response in trigger.responses
+                ]
+                for response in trigger.responses:
+                    if not is_valid_emoji(self.bot, response):
+                        errors.append(f"Trigger {i} has invalid reaction `{response}`")
+
+            if not trigger.is_regex:
+                trigger.patterns = [pattern.lower() for pattern in trigger.patterns]
+
+        return errors[:MAX_IMPORT_ERRORS]
+
+    async def import_triggers(self, triggers: List[TriggerExport]) -> List[int]:
+        """Insert all triggers in a single transaction, using one multi-row
+        insert per table."""
+        async with Session.begin() as session:
+            result = await session.execute(
+                insert(trigger_group).returning(
+                    trigger_group.c.id, sort_by_parameter_order=True
+                ),
+                [
+                    {
+                        "owner": trigger.owner,
+                        "is_active": trigger.is_active,
+                        "response_type": trigger.response_type,
+                        "scope_id": trigger.scope_id,
+                    }
+                    for trigger in triggers
+                ],
+            )
+            group_ids = result.scalars().all()
+
+            await session.execute(
+                insert(trigger_pattern),
+                [
+                    {
+                        "pattern": pattern,
+                        "group_id": group_id,
+                        "is_regex": trigger.is_regex,
+                        "is_whole_word": trigger.is_whole_word,
+                    }
+                    for group_id, trigger in zip(group_ids, triggers)
+                    for pattern in dict.fromkeys(trigger.patterns)
+                ],
+            )
+            await session.execute(
+                insert(trigger_response),
+                [
+                    {"response": response, "group_id": group_id}
+                    for group_id, trigger in zip(group_ids, triggers)
+                    for response in trigger.responses
+                ],
+            )
+            await notify(session, TriggerSettings.notify_channel, {"action": "reload"})
+
+        return group_ids
+
+    @trigger_cmd.command(description="Export all triggers to a json file.")
+    async def export(self, ctx: ApplicationContext) -> None:
+        logger.info("%s invoked /trigger export", ctx.author.name)
+
+        if ctx.author.get_role(Roles.admin) is None:
+            logger.info("%s isn't an admin, doing nothing", ctx.author.name)
+            await ctx.respond("Only admins can export triggers.", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+        buffer = await self.export_triggers()
+        await ctx.followup.send(
+            file=File(buffer, filename="triggers.json"), ephemeral=True
+        )
+
+    @trigger_cmd.command(name="import", description="Import triggers from a json file.")
+    @option("file", Attachment, description="File created by /trigger export.")
+    async def import_(self, ctx: ApplicationContext, file: Attachment) -> None:
+        logger.info(
+            "%s invoked /trigger import with file='%s'", ctx.author.name, file.filename
+        )
+
+        if ctx.author.get_role(Roles.admin) is None:
+            logger.info("%s isn't an admin, doing nothing", ctx.author.name)
+            await ctx.respond("Only admins can import triggers.", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+
+        try:
+            trigger_file = TriggerFile.model_validate_json(await file.read())
+        except ValidationError as e:
+            logger.info("Import file is malformed: %s", e)
+            await ctx.followup.send(
+                f"Invalid trigger file, nothing was imported.\n```{str(e)[:1800]}```",
+                ephemeral=True,
+            )
+            return
+
+        errors = self.validate_import(trigger_file.triggers)
+        if errors:
+            logger.info("Import file has %s invalid triggers", len(errors))
+            await ctx.followup.send(
+                "Invalid triggers, nothing was imported:\n"
+                + "\n".join(f"* {error}" for error in errors),
+                ephemeral=True,
+            )
+            return
+
+        if not trigger_file.triggers:
+            await ctx.followup.send("No triggers to import.", ephemeral=True)
+            return
+
+        group_ids = await self.import_triggers(trigger_file.triggers)
+        logger.info("Imported %s triggers", len(group_ids))
+
+        # rebuild the cache once rather than per trigger
+        triggers_cog = self.bot.get_cog("Triggers")
+        if triggers_cog:
+            await triggers_cog.load_triggers()
+        else:
+            logger.warning("Can't find Triggers cog, imported triggers not loaded")
+
+        await ctx.followup.send(f"Imported {len(group_ids)} triggers", ephemeral=True)
+
     @trigger_cmd.command(description="Edit trigger.")
     @option("trigger_id", description="ID of the trigger to edit.")
     async def edit(self, ctx: ApplicationContext, trigger_id: int) -> None:
@@ -270,6 +627,7 @@ class TriggerAdmin(Cog):
                     trigger_pattern.c.pattern,
                     trigger_response.c.response,
                     trigger_pattern.c.is_regex,
+                    trigger_pattern.c.is_whole_word,
                     trigger_group.c.response_type,
                 )
                 .join(
@@ -296,6 +654,7 @@ class TriggerAdmin(Cog):
         patterns = [t.pattern for t in trigger]
         responses = [t.response for t in trigger]
         is_regex = trigger[0].is_regex
+        is_whole_word = trigger[0].is_whole_word
         response_type = trigger[0].response_type
 
         modal = EditTriggerModal(
@@ -303,12 +662,74 @@ class TriggerAdmin(Cog):
             patterns=patterns,
             responses=responses,
             is_regex=is_regex,
+            is_whole_word=is_whole_word,
             response_type=response_type,
             group_id=trigger_id,
             bot=self.bot,
         )
         await ctx.send_modal(modal)
 
+    @trigger_cmd.command(description="Limit trigger to a channel or category.")
+    @option("trigger_id", description="ID of the trigger to scope.")
+    @option(
+        "scope",
+        GuildChannel,
+        description="Channel or category to limit trigger to, omit to make it global.",
+        required=False,
+    )
+    async def scope(
+        self, ctx: ApplicationContext, trigger_id: int, scope: GuildChannel
+    ) -> None:
+        logger.info(
+            "%s invoked /trigger scope with id=%s scope=%s",
+            ctx.author.name,
+            trigger_id,
+            getattr(scope, "name", None),
+        )
+
+        is_admin = true() if ctx.author.get_role(Roles.admin) is not None else false()
+        scope_id = getattr(scope, "id", None)
+
+        async with Session.begin() as session:
+            result = await session.execute(
+                update(trigger_group)
+                .where(trigger_group.c.id == trigger_id)
+                .where(is_admin | (trigger_group.c.owner == ctx.author.id))
+                .values(scope_id=scope_id, updated_at=func.now())
+            )
+            if result.rowcount > 0:
+                await notify(
+                    session,
+                    TriggerSettings.notify_channel,
+                    {"action": "upsert", "group_id": trigger_id},
+                )
+
+        if result.rowcount > 0:
+            logger.info("Set scope of trigger with id=%s to %s", trigger_id, scope_id)
+
+            triggers_cog = self.bot.get_cog("Triggers")
+            if triggers_cog:
+                await triggers_cog.reload_group(trigger_id)
+            else:
+                logger.warning(
+                    "Can't find Triggers cog, failed to update trigger with id=%s",
+                    trigger_id,
+                )
+
+            scope_str = scope.mention if scope is not None else "global"
+            await ctx.respond(
+                f"Set scope of trigger with id={trigger_id} to {scope_str}",
+                ephemeral=True,
+            )
+        else:
+            logger.info(
+                "Trigger didn't exist or user didn't have permission to scope it"
+            )
+            await ctx.respond(
+                f"Failed to scope trigger with id={trigger_id} (Doesn't exist or you don't have permission)",
+                ephemeral=True,
+            )
+
     @trigger_cmd.command(description="Delete trigger.")
     @option("trigger_id", description="ID of the trigger to delete.")
     async def delete(self, ctx: ApplicationContext, trigger_id: int) -> None:
@@ -320,9 +741,11 @@ class TriggerAdmin(Cog):
 
         async with Session.begin() as session:
             trigger_result = await session.execute(
-                select(trigger_pattern.c.pattern, trigger_pattern.c.is_regex).where(
-                    trigger_pattern.c.group_id == trigger_id
-                )
+                select(
+                    trigger_pattern.c.pattern,
+                    trigger_pattern.c.is_regex,
+                    trigger_pattern.c.is_whole_word,
+                ).where(trigger_pattern.c.group_id == trigger_id)
             )
             trigger = trigger_result.all()
 
@@ -332,6 +755,12 @@ class TriggerAdmin(Cog):
                 .where(is_admin | (trigger_group.c.owner == ctx.author.id))
                 .returning(trigger_group.c.response_type)
             )
+            if response_type is not None:
+                await notify(
+                    session,
+                    TriggerSettings.notify_channel,
+                    {"action": "delete", "group_id": trigger_id},
+                )
 
         if response_type is not None:
             logger.info("Deleted trigger with id=%s", trigger_id)
@@ -346,6 +775,7 @@ class TriggerAdmin(Cog):
                 "trigger_removed",
                 patterns=patterns,
                 is_regex=t.is_regex,
+                is_whole_word=t.is_whole_word,
                 response_type=response_type,
                 group_id=trigger_id,
             )
@@ -377,11 +807,19 @@ class TriggerAdmin(Cog):
                 .values(is_active=False, updated_at=func.now())
                 .returning(trigger_group.c.response_type)
             )
+            if response_type is not None:
+                await notify(
+                    session,
+                    TriggerSettings.notify_channel,
+                    {"action": "delete", "group_id": trigger_id},
+                )
 
             trigger_result = await session.execute(
-                select(trigger_pattern.c.pattern, trigger_pattern.c.is_regex).where(
-                    trigger_pattern.c.group_id == trigger_id
-                )
+                select(
+                    trigger_pattern.c.pattern,
+                    trigger_pattern.c.is_regex,
+                    trigger_pattern.c.is_whole_word,
+                ).where(trigger_pattern.c.group_id == trigger_id)
             )
             trigger = trigger_result.all()
 
@@ -398,6 +836,7 @@ class TriggerAdmin(Cog):
                 "trigger_removed",
                 patterns=patterns,
                 is_regex=t.is_regex,
+                is_whole_word=t.is_whole_word,
                 response_type=response_type,
                 group_id=trigger_id,
             )
@@ -422,19 +861,28 @@ class TriggerAdmin(Cog):
         is_admin = true() if ctx.author.get_role(Roles.admin) is not None else false()
 
         async with Session.begin() as session:
-            response_type = await session.scalar(
+            result = await session.execute(
                 update(trigger_group)
                 .where(trigger_group.c.id == trigger_id)
                 .where(is_admin | (trigger_group.c.owner == ctx.author.id))
                 .values(is_active=True, updated_at=func.now())
-                .returning(trigger_group.c.response_type)
+                .returning(trigger_group.c.response_type, trigger_group.c.scope_id)
             )
+            enabled_group = result.one_or_none()
+            response_type = enabled_group.response_type if enabled_group else None
+            if response_type is not None:
+                await notify(
+                    session,
+                    TriggerSettings.notify_channel,
+                    {"action": "upsert", "group_id": trigger_id},
+                )
 
             trigger_result = await session.execute(
                 select(
                     trigger_pattern.c.pattern,
                     trigger_response.c.response,
                     trigger_pattern.c.is_regex,
+                    trigger_pattern.c.is_whole_word,
                 )
                 .join(
                     trigger_response,
@@ -460,8 +908,10 @@ class TriggerAdmin(Cog):
                 patterns=patterns,
                 responses=responses,
                 is_regex=t.is_regex,
+                is_whole_word=t.is_whole_word,
                 response_type=response_type,
                 group_id=trigger_id,
+                scope_id=enabled_group.scope_id,
             )
 
             await ctx.respond(f"Enabled trigger with id={trigger_id}", ephemeral=True)
@@ -1,15 +1,19 @@
 import asyncio
 import logging
 import random
-import re
-from collections import defaultdict
-from typing import DefaultDict, List, Tuple
+from typing import Any, Dict, List, Tuple
 
-from discord import Bot, Message
+from discord import Bot, Emoji, Guild, Message
+from discord.abc import Messageable
 from discord.ext.commands import Cog
 from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.sql.elements import BinaryExpression
 
-from pzsd_bot.db import Session
+from pzsd_bot.db import Session, is_postgres
+from pzsd_bot.ext.emoji_registry import EmojiRegistry
+from pzsd_bot.ext.notify import PGListener
+from pzsd_bot.ext.trigger_index import PatternProfile, Scope, TriggerIndex
 from pzsd_bot.model import (
     TriggerResponseType,
     trigger_group,
@@ -20,53 +24,164 @@ from pzsd_bot.settings import TriggerSettings
 
 logger = logging.getLogger(__name__)
 
-CachedTrigger = DefaultDict[Tuple[int, str, TriggerResponseType], List[str]]
-
 
 class Triggers(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
 
-        self.normal_triggers: CachedTrigger = defaultdict(list)
-        self.regex_triggers: CachedTrigger = defaultdict(list)
+        # Triggers are partitioned by scope so a message
+        # is only checked against the global triggers
+        # and those scoped to its channel or category
+        self.indexes: Dict[Scope, TriggerIndex] = {None: TriggerIndex()}
+        self.group_scopes: Dict[int, Scope] = {}
+
+        self.listener = PGListener(
+            TriggerSettings.notify_channel,
+            self.on_trigger_notification,
+            on_reconnect=self.load_triggers,
+        )
 
         asyncio.create_task(self.load_triggers())
+        self.listener_task: asyncio.Task | None = None
+        if is_postgres():
+            # keeps retrying until it connects
+            self.listener_task = asyncio.create_task(self.listener.start())
 
-    async def load_triggers(self) -> None:
-        logger.info("Loading triggers into memory")
+    def cog_unload(self) -> None:
+        if self.listener_task is not None:
+            self.listener_task.cancel()
+        asyncio.create_task(self.listener.close())
+
+    def get_index(self, scope_id: Scope) -> TriggerIndex:
+        if scope_id not in self.indexes:
+            self.indexes[scope_id] = TriggerIndex()
+        return self.indexes[scope_id]
+
+    @staticmethod
+    def get_channel_scopes(channel: Messageable) -> List[Scope]:
+        """Global scope followed by the scopes that apply to the channel,
+        including a thread's parent channel and the channel's category."""
+        scopes = [None, channel.id]
+        for attr in ("parent_id", "category_id"):
+            scope_id = getattr(channel, attr, None)
+            if scope_id is not None and scope_id not in scopes:
+                scopes.append(scope_id)
+
+        return scopes
+
+    def profile(self, content: str, channel: Messageable) -> List[PatternProfile]:
+        """Dry run every trigger that applies in the channel against the content."""
+        profiles = []
+        for scope_id in self.get_channel_scopes(channel):
+            if (index := self.indexes.get(scope_id)) is not None:
+                profiles.extend(index.profile(content))
+
+        return profiles
+
+    async def fetch_trigger_rows(self, *args: List[BinaryExpression]) -> List[Row]:
         tp = trigger_pattern.columns
         tr = trigger_response.columns
         tg = trigger_group.columns
         async with Session.begin() as session:
             result = await session.execute(
                 select(
-                    tp.group_id, tp.pattern, tp.is_regex, tg.response_type, tr.response
+                    tp.group_id,
+                    tp.pattern,
+                    tp.is_regex,
+                    tp.is_whole_word,
+                    tg.response_type,
+                    tg.scope_id,
+                    tr.response,
                 )
                 .join(trigger_group, tp.group_id == tg.id)
                 .join(trigger_response, tg.id == tr.group_id)
                 .where(tg.is_active == True)
+                .where(*args)
             )
-            triggers = result.all()
+            return result.all()
 
+    def cache_triggers(self, triggers: List[Row]) -> Tuple[set, set, set]:
         normal_trigger_groups = set()
         regex_trigger_groups = set()
+        word_trigger_groups = set()
         for trigger in triggers:
             key = trigger.group_id, trigger.pattern, trigger.response_type
+            self.group_scopes[trigger.group_id] = trigger.scope_id
+            self.get_index(trigger.scope_id).add_response(
+                key, trigger.response, trigger.is_regex, trigger.is_whole_word
+            )
+
             if trigger.is_regex:
-                self.regex_triggers[key].append(trigger.response)
                 regex_trigger_groups.add(trigger.group_id)
+            elif trigger.is_whole_word:
+                word_trigger_groups.add(trigger.group_id)
             else:
-                self.normal_triggers[key].append(trigger.response)
                 normal_trigger_groups.add(trigger.group_id)
 
-        total_triggers = len(regex_trigger_groups) + len(normal_trigger_groups)
+        return normal_trigger_groups, regex_trigger_groups, word_trigger_groups
+
+    def remove_group(self, group_id: int) -> None:
+        scope_id = self.group_scopes.pop(group_id, None)
+        if scope_id in self.indexes:
+            self.indexes[scope_id].remove_group(group_id)
+
+    async def load_triggers(self) -> None:
+        logger.info("Loading triggers into memory")
+        triggers = await self.fetch_trigger_rows()
+
+        # swap in the new indexes after fetching so there's
+        # no window where messages are checked against nothing
+        self.indexes = {None: TriggerIndex()}
+        self.group_scopes = {}
+        normal_trigger_groups, regex_trigger_groups, word_trigger_groups = (
+            self.cache_triggers(triggers)
+        )
+
+        total_triggers = (
+            len(regex_trigger_groups)
+            + len(normal_trigger_groups)
+            + len(word_trigger_groups)
+        )
         logger.info(
-            "Loaded %s triggers (%s regex, %s normal)",
+            "Loaded %s triggers (%s regex, %s normal, %s whole word)",
             total_triggers,
             len(regex_trigger_groups),
             len(normal_trigger_groups),
+            len(word_trigger_groups),
+        )
+        for scope_id, index in self.indexes.items():
+            logger.info(
+                "Scope %s has %s patterns (%s regex, %s normal, %s whole word)",
+                scope_id or "global",
+                len(index),
+                len(index.regex_triggers),
+                len(index.normal_triggers),
+                len(index.word_triggers),
+            )
+
+    async def reload_group(self, group_id: int) -> None:
+        triggers = await self.fetch_trigger_rows(trigger_group.c.id == group_id)
+        self.remove_group(group_id)
+        self.cache_triggers(triggers)
+
+    async def on_trigger_notification(self, payload: Dict[str, Any]) -> None:
+        """Apply a trigger change made by another bot process."""
+        logger.info(
+            "Received trigger notification (action=%s, id=%s), updating triggers in memory",
+            payload.get("action"),
+            payload.get("group_id"),
         )
 
+        match payload.get("action"):
+            case "upsert":
+                await self.reload_group(payload["group_id"])
+            case "delete":
+                self.remove_group(payload["group_id"])
+            case "reload":
+                await self.load_triggers()
+            case _:
+                logger.warning("Unknown trigger notification: %s", payload)
+
     @Cog.listener()
     async def on_trigger_added(
         self,
@@ -75,15 +190,16 @@ class Triggers(Cog):
         is_regex: bool,
         response_type: TriggerResponseType,
         group_id: int,
+        is_whole_word: bool = False,
+        scope_id: Scope = None,
     ) -> None:
         logger.info("Trigger was added, updating triggers in memory")
 
+        self.group_scopes[group_id] = scope_id
+        index = self.get_index(scope_id)
         for pattern in patterns:
             key = group_id, pattern, response_type
-            if is_regex:
-                self.regex_triggers[key] = responses
-            else:
-                self.normal_triggers[key] = responses
+            index.add_trigger(key, responses, is_regex, is_whole_word)
 
     @Cog.listener()
     async def on_trigger_removed(
@@ -92,15 +208,14 @@ class Triggers(Cog):
         is_regex: bool,
         response_type: TriggerResponseType,
         group_id: int,
+        is_whole_word: bool = False,
     ) -> None:
         logger.info("Trigger was removed, updating triggers in memory")
 
+        index = self.get_index(self.group_scopes.pop(group_id, None))
         for pattern in patterns:
             key = group_id, pattern, response_type
-            if is_regex:
-                self.regex_triggers.pop(key, None)
-            else:
-                self.normal_triggers.pop(key, None)
+            index.remove_trigger(key, is_regex, is_whole_word)
 
     @Cog.listener()
     async def on_trigger_modified(
@@ -111,22 +226,30 @@ class Triggers(Cog):
         is_regex: bool,
         response_type: TriggerResponseType,
         group_id: int,
+        is_whole_word: bool = False,
     ) -> None:
         logger.info("Trigger was modified, updating triggers in memory")
 
+        index = self.get_index(self.group_scopes.get(group_id))
         for old_pattern in old_patterns:
             old_key = group_id, old_pattern, response_type
-            if is_regex:
-                self.regex_triggers.pop(old_key, None)
-            else:
-                self.normal_triggers.pop(old_key, None)
+            index.remove_trigger(old_key, is_regex, is_whole_word)
 
         for new_pattern in new_patterns:
             new_key = group_id, new_pattern, response_type
-            if is_regex:
-                self.regex_triggers[new_key] = new_responses
-            else:
-                self.normal_triggers[new_key] = new_responses
+            index.add_trigger(new_key, new_responses, is_regex, is_whole_word)
+
+    @staticmethod
+    async def respond(
+        message: Message, response_type: TriggerResponseType, response: str
+    ) -> None:
+        match response_type:
+            case TriggerResponseType.standard:
+                await message.channel.send(response)
+            case TriggerResponseType.reply:
+                await message.reply(response)
+            case TriggerResponseType.reaction:
+                await message.add_reaction(response)
 
     @Cog.listener()
     async def on_message(self, message: Message) -> None:
@@ -141,49 +264,77 @@ class Triggers(Cog):
         ):
             return
 
-        for (
-            group_id,
-            pattern,
-            response_type,
-        ), responses in self.normal_triggers.items():
-            if pattern in message.content.lower():
-                logger.info(
-                    "Pattern match on '%s' (id=%s) in %s's message",
-                    pattern,
-                    group_id,
-                    message.author.name,
-                )
-                match response_type:
-                    case TriggerResponseType.standard:
-                        await message.channel.send(random.choice(responses))
-                    case TriggerResponseType.reply:
-                        await message.reply(random.choice(responses))
-                    case TriggerResponseType.reaction:
-                        await message.add_reaction(random.choice(responses))
-
-        for (
-            group_id,
-            pattern,
-            response_type,
-        ), responses in self.regex_triggers.items():
-            m = re.search(pattern, message.content, re.IGNORECASE)
-            if m:
+        for scope_id in self.get_channel_scopes(message.channel):
+            index = self.indexes.get(scope_id)
+            if index is None:
+                continue
+
+            for trigger_match in index.match(message.content):
+                group_id, pattern, response_type = trigger_match.key
+                start, end = trigger_match.span
                 logger.info(
                     "Pattern match on '%s' (id=%s, matched '%s') in %s's message",
                     pattern,
                     group_id,
-                    m[0],
+                    message.content[start:end],
                     message.author.name,
                 )
-                response = m.expand(random.choice(responses))
-
-                match response_type:
-                    case TriggerResponseType.standard:
-                        await message.channel.send(response)
-                    case TriggerResponseType.reply:
-                        await message.reply(response)
-                    case TriggerResponseType.reaction:
-                        await message.add_reaction(response)
+
+                responses = trigger_match.responses
+                if trigger_match.regex_match is not None:
+                    responses = [
+                        trigger_match.regex_match.expand(response)
+                        for response in responses
+                    ]
+
+                if response_type is TriggerResponseType.reaction:
+                    # skip reactions using emojis that have since
+                    # been deleted instead of letting the api reject them
+                    responses = [
+                        response
+                        for response in responses
+                        if self.bot.emoji_registry.is_valid(response)
+                    ]
+                    if not responses:
+                        logger.warning(
+                            "Trigger (id=%s) has no usable reactions, skipping",
+                            group_id,
+                        )
+                        continue
+
+                await self.respond(message, response_type, random.choice(responses))
+
+    @Cog.listener()
+    async def on_guild_emojis_update(
+        self, guild: Guild, before: List[Emoji], after: List[Emoji]
+    ) -> None:
+        removed_ids = {e.id for e in before} - {e.id for e in after}
+        if not removed_ids:
+            return
+
+        # flag reaction triggers that reference deleted emojis
+        # so their owners can be told to fix them
+        for index in self.indexes.values():
+            for triggers in (
+                index.normal_triggers,
+                index.regex_triggers,
+                index.word_triggers,
+            ):
+                for (group_id, pattern, response_type), responses in list(
+                    triggers.items()
+                ):
+                    if response_type is not TriggerResponseType.reaction:
+                        continue
+
+                    for response in responses:
+                        emoji_id = EmojiRegistry.get_custom_emoji_id(response)
+                        if emoji_id in removed_ids:
+                            logger.warning(
+                                "Trigger on '%s' (id=%s) reacts with deleted emoji %s",
+                                pattern,
+                                group_id,
+                                response,
+                            )
 
 
 def setup(bot: Bot) -> None:
@@ -1,7 +1,36 @@
+from sqlalchemy import JSON, Table, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.elements import ColumnElement
 
 from pzsd_bot.settings import DB_CONNECTION_STR
 
 engine = create_async_engine(DB_CONNECTION_STR)
 Session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+def is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def aggregate_list(column: ColumnElement, order_by: ColumnElement) -> ColumnElement:
+    """Aggregate a column into a list per group.
+
+    Uses array_agg on postgres. sqlite doesn't have arrays, so the values are
+    collected into a json array instead, which is decoded back into a list.
+    """
+    if is_postgres():
+        return func.array_agg(aggregate_order_by(column, order_by))
+
+    return func.json_group_array(column, type_=JSON)
+
+
+def insert_or_ignore(table: Table) -> postgresql.Insert | sqlite.Insert:
+    """Insert that skips rows conflicting with an existing primary key or
+    unique constraint, using the dialect's ON CONFLICT DO NOTHING."""
+    if is_postgres():
+        return postgresql.insert(table).on_conflict_do_nothing()
+
+    return sqlite.insert(table).on_conflict_do_nothing()
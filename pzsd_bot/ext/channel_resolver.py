@@ -0,0 +1,75 @@
+import logging
+import time
+from collections import abc
+
+from discord import Bot, Forbidden, NotFound
+from discord.abc import Messageable
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelResolver:
+    """Looks up channels by ID, caching channels that had to be fetched
+    as well as channels that don't exist or can't be accessed.
+
+    Misses are cached for a shorter time since access can be restored,
+    e.g. if the bot is added back to a channel.
+    """
+
+    # expired entries are pruned once the cache grows past this
+    MAX_SIZE = 1024
+
+    def __init__(
+        self,
+        bot: Bot,
+        ttl: float,
+        negative_ttl: float,
+        clock: abc.Callable[[], float] = time.monotonic,
+    ):
+        self.bot = bot
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._cache: dict[int, tuple[float, Messageable | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def invalidate(self, channel_id: int) -> None:
+        self._cache.pop(channel_id, None)
+
+    def _store(self, channel_id: int, channel: Messageable | None) -> None:
+        now = self.clock()
+        if len(self._cache) >= self.MAX_SIZE:
+            self._cache = {
+                cached_id: entry
+                for cached_id, entry in self._cache.items()
+                if entry[0] > now
+            }
+
+        ttl = self.ttl if channel is not None else self.negative_ttl
+        self._cache[channel_id] = (now + ttl, channel)
+
+    async def resolve(self, channel_id: int) -> Messageable | None:
+        """Get a channel, or None if it doesn't exist or the bot can't access it.
+
+        Any other error fetching the channel is raised, since it may
+        succeed if tried again later.
+        """
+        if (channel := self.bot.get_channel(channel_id)) is not None:
+            return channel
+
+        entry = self._cache.get(channel_id)
+        if entry is not None and entry[0] > self.clock():
+            return entry[1]
+
+        # channel may not be cached by the bot yet
+        logger.debug("Couldn't find channel (id=%s) in cache, fetching", channel_id)
+        try:
+            channel = await self.bot.fetch_channel(channel_id)
+        except (NotFound, Forbidden) as e:
+            logger.warning("Can't access channel (id=%s): %s", channel_id, e)
+            channel = None
+
+        self._store(channel_id, channel)
+        return channel
@@ -0,0 +1,217 @@
+import calendar
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+import pendulum
+
+CACHE_SIZE = 128
+
+MONTH_NAMES = {
+    name: number
+    for number, name in enumerate(
+        (
+            "jan", "feb", "mar", "apr", "may", "jun",
+            "jul", "aug", "sep", "oct", "nov", "dec",
+        ),
+        start=1,
+    )
+}  # fmt: skip
+# cron counts days of the week from sunday, which can be 0 or 7
+WEEKDAY_NAMES = {
+    name: number
+    for number, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))
+}
+
+# (lowest value, highest value, names) of each field in order
+FIELDS = (
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, MONTH_NAMES),
+    (0, 7, WEEKDAY_NAMES),
+)
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# a schedule that can't be satisfied, like "0 0 30 2 *",
+# is given up on after searching this many years ahead
+MAX_YEARS_AHEAD = 8
+
+
+class CronSchedule(NamedTuple):
+    """A parsed cron expression, evaluated in a timezone.
+
+    Values of each field are kept sorted so the next matching value can
+    be found with a binary search instead of stepping minute by minute.
+    """
+
+    expression: str
+    timezone: str
+    minutes: tuple[int, ...]
+    hours: tuple[int, ...]
+    days: tuple[int, ...]
+    months: tuple[int, ...]
+    weekdays: tuple[int, ...]
+    # like cron, if both the day of the month and day of the week
+    # are restricted a day matching either of them is a match
+    any_day: bool
+    any_weekday: bool
+
+    def matches_day(self, year: int, month: int, day: int) -> bool:
+        day_matches = day in self.days
+        # calendar counts days of the week from monday
+        weekday_matches = (calendar.weekday(year, month, day) + 1) % 7 in self.weekdays
+
+        if self.any_day or self.any_weekday:
+            return day_matches and weekday_matches
+        return day_matches or weekday_matches
+
+    def localize(
+        self, year: int, month: int, day: int, hour: int, minute: int
+    ) -> pendulum.DateTime:
+        # a time repeated when DST ends resolves to its first occurrence,
+        # a time skipped when DST starts is pushed forward past the gap
+        dt = pendulum.datetime(year, month, day, hour, minute, tz=self.timezone, fold=0)
+        if (dt.hour, dt.minute) != (hour, minute):
+            dt = pendulum.datetime(
+                year, month, day, hour, minute, tz=self.timezone, fold=1
+            )
+        return dt
+
+    def next_after(self, after: datetime) -> pendulum.DateTime:
+        """Get the first time strictly after `after` matching the schedule.
+
+        Fields are advanced from the largest unit down, jumping straight
+        to the next matching value, so this only takes a few steps no
+        matter how far off the next occurrence is.
+        """
+        local = pendulum.instance(after).in_timezone(self.timezone)
+        year, month, day = local.year, local.month, local.day
+        hour, minute = local.hour, local.minute + 1
+
+        while year <= local.year + MAX_YEARS_AHEAD:
+            if minute > 59:
+                minute = 0
+                hour += 1
+            if hour > 23:
+                hour = 0
+                day += 1
+            if day > calendar.monthrange(year, month)[1]:
+                day = 1
+                month += 1
+            if month > 12:
+                month = 1
+                year += 1
+
+            if month not in self.months:
+                i = bisect_left(self.months, month)
+                if i == len(self.months):
+                    year += 1
+                    i = 0
+                month = self.months[i]
+                day, hour, minute = 1, 0, 0
+                continue
+
+            if not self.matches_day(year, month, day):
+                day += 1
+                hour, minute = 0, 0
+                continue
+
+            if hour not in self.hours:
+                i = bisect_left(self.hours, hour)
+                if i == len(self.hours):
+                    day += 1
+                    hour, minute = 0, 0
+                    continue
+                hour, minute = self.hours[i], 0
+
+            if minute not in self.minutes:
+                i = bisect_left(self.minutes, minute)
+                if i == len(self.minutes):
+                    hour += 1
+                    minute = 0
+                    continue
+                minute = self.minutes[i]
+
+            candidate = self.localize(year, month, day, hour, minute)
+            if candidate > local:
+                return candidate
+            minute += 1
+
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+
+def parse_field(text: str, low: int, high: int, names: dict[str, int]) -> set[int]:
+    def parse_value(value: str) -> int:
+        if value.lower() in names:
+            return names[value.lower()]
+        if not value.isdigit():
+            raise ValueError(f"Invalid cron value: '{value}'")
+        return int(value)
+
+    values = set()
+    for part in text.split(","):
+        range_text, has_step, step_text = part.partition("/")
+        step = parse_value(step_text) if has_step else 1
+
+        if range_text == "*":
+            start, end = low, high
+        else:
+            start_text, has_end, end_text = range_text.partition("-")
+            start = parse_value(start_text)
+            if has_end:
+                end = parse_value(end_text)
+            else:
+                # "5/15" means every 15 starting from 5
+                end = high if has_step else start
+
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Invalid cron field: '{part}'")
+
+        values.update(range(start, end + 1, step))
+
+    return values
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_cron(expression: str, timezone: str = "UTC") -> CronSchedule:
+    """Parse a five field cron expression: minute, hour, day of the
+    month, month and day of the week. Months and days of the week can
+    also be given by their three letter names, e.g. "0 16 * * fri".
+
+    Raises ValueError if the expression is invalid.
+    """
+    fields = MACROS.get(expression.strip().lower(), expression).split()
+    if len(fields) != len(FIELDS):
+        raise ValueError(f"Cron expression must have {len(FIELDS)} fields")
+
+    # raises InvalidTimezone early rather than when the job runs
+    pendulum.timezone(timezone)
+
+    minutes, hours, days, months, weekdays = (
+        parse_field(text, *field) for text, field in zip(fields, FIELDS)
+    )
+    if 7 in weekdays:
+        weekdays = (weekdays - {7}) | {0}
+
+    return CronSchedule(
+        expression=expression,
+        timezone=timezone,
+        minutes=tuple(sorted(minutes)),
+        hours=tuple(sorted(hours)),
+        days=tuple(sorted(days)),
+        months=tuple(sorted(months)),
+        weekdays=tuple(sorted(weekdays)),
+        any_day=fields[2] == "*",
+        any_weekday=fields[4] == "*",
+    )
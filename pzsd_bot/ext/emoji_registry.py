@@ -0,0 +1,66 @@
+import logging
+import re
+from collections import abc
+
+import emoji
+from discord import Emoji, Guild
+
+logger = logging.getLogger(__name__)
+
+CUSTOM_EMOJI_PATTERN = re.compile(r"<a?:\w+:(\d+)>")
+
+
+class EmojiRegistry:
+    """Custom emojis available to the bot, keyed by ID.
+
+    Kept up to date from guild emoji updates so checking whether an emoji
+    can be used doesn't require scanning every emoji the bot can see.
+    """
+
+    def __init__(self) -> None:
+        self.emojis: dict[int, Emoji] = {}
+        self.guild_emojis: dict[int, set[int]] = {}
+
+    def __contains__(self, emoji_id: int) -> bool:
+        return emoji_id in self.emojis
+
+    def __len__(self) -> int:
+        return len(self.emojis)
+
+    def load(self, emojis: abc.Iterable[Emoji]) -> None:
+        self.emojis.clear()
+        self.guild_emojis.clear()
+        for e in emojis:
+            self.add(e)
+
+        logger.info("Loaded %s custom emojis", len(self.emojis))
+
+    def add(self, e: Emoji) -> None:
+        self.emojis[e.id] = e
+        self.guild_emojis.setdefault(e.guild_id, set()).add(e.id)
+
+    def update_guild(self, guild: Guild, emojis: abc.Sequence[Emoji]) -> set[int]:
+        """Replace a guild's emojis, returning the IDs of emojis that were removed."""
+        old_ids = self.guild_emojis.pop(guild.id, set())
+        new_ids = {e.id for e in emojis}
+
+        removed_ids = old_ids - new_ids
+        for emoji_id in removed_ids:
+            self.emojis.pop(emoji_id, None)
+
+        for e in emojis:
+            self.add(e)
+
+        return removed_ids
+
+    @staticmethod
+    def get_custom_emoji_id(emoji_str: str) -> int | None:
+        if m := CUSTOM_EMOJI_PATTERN.search(emoji_str):
+            return int(m[1])
+
+    def is_valid(self, emoji_str: str) -> bool:
+        if emoji.is_emoji(emoji_str):
+            return True
+
+        emoji_id = self.get_custom_emoji_id(emoji_str)
+        return emoji_id is not None and emoji_id in self.emojis
@@ -0,0 +1,122 @@
+from collections import abc
+from datetime import datetime
+from typing import Any
+
+import pendulum
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import Row
+
+from pzsd_bot.db import Session, insert_or_ignore
+from pzsd_bot.ext.cron import CronSchedule
+from pzsd_bot.model import JobStatus, MisfirePolicy, scheduled_job
+
+
+class JobStore:
+    """Persists jobs in the scheduled_job table so they survive restarts.
+
+    Job IDs double as idempotency keys, adding a job that already exists
+    does nothing and a job can only be claimed to run once.
+    """
+
+    async def add(
+        self,
+        scheduler: str,
+        job_id: str,
+        handler: str,
+        run_at: datetime,
+        payload: dict[str, Any] | None = None,
+        misfire_policy: MisfirePolicy = MisfirePolicy.run_once,
+        cron: CronSchedule | None = None,
+        run_until: datetime | None = None,
+    ) -> bool:
+        """Add a job, returning False if one with the same ID already exists.
+
+        Recurring jobs are given their cron schedule, with `run_at`
+        being their first occurrence.
+        """
+        async with Session.begin() as session:
+            result = await session.execute(
+                insert_or_ignore(scheduled_job)
+                .values(
+                    id=job_id,
+                    scheduler=scheduler,
+                    handler=handler,
+                    payload=payload,
+                    run_at=run_at,
+                    misfire_policy=misfire_policy,
+                    status=JobStatus.pending,
+                    cron=cron.expression if cron is not None else None,
+                    timezone=cron.timezone if cron is not None else None,
+                    run_until=run_until,
+                )
+                .returning(scheduled_job.c.id)
+            )
+            return result.scalar_one_or_none() is not None
+
+    async def claim(self, job_id: str) -> bool:
+        """Mark a pending job as run, returning False if it was
+        already run, skipped or removed."""
+        async with Session.begin() as session:
+            result = await session.execute(
+                update(scheduled_job)
+                .values(status=JobStatus.done, last_run_at=pendulum.now("UTC"))
+                .where(scheduled_job.c.id == job_id)
+                .where(scheduled_job.c.status == JobStatus.pending)
+                .returning(scheduled_job.c.id)
+            )
+            return result.scalar_one_or_none() is not None
+
+    async def claim_occurrence(
+        self, job_id: str, run_at: datetime, next_run_at: datetime | None
+    ) -> bool:
+        """Move a recurring job on to its next occurrence, or mark it done
+        if it has none, returning False if the occurrence at `run_at`
+        was already run or the job was removed."""
+        values = {"last_run_at": pendulum.now("UTC")}
+        if next_run_at is not None:
+            values["run_at"] = next_run_at
+        else:
+            values["status"] = JobStatus.done
+
+        async with Session.begin() as session:
+            result = await session.execute(
+                update(scheduled_job)
+                .values(**values)
+                .where(scheduled_job.c.id == job_id)
+                .where(scheduled_job.c.status == JobStatus.pending)
+                .where(scheduled_job.c.run_at <= run_at)
+                .returning(scheduled_job.c.id)
+            )
+            return result.scalar_one_or_none() is not None
+
+    async def skip(self, job_ids: abc.Collection[str]) -> None:
+        async with Session.begin() as session:
+            await session.execute(
+                update(scheduled_job)
+                .values(status=JobStatus.skipped)
+                .where(scheduled_job.c.id.in_(job_ids))
+                .where(scheduled_job.c.status == JobStatus.pending)
+            )
+
+    async def remove(self, scheduler: str, job_id: str | None = None) -> None:
+        """Remove a scheduler's pending job, or all of them if no ID is given."""
+        query = (
+            delete(scheduled_job)
+            .where(scheduled_job.c.scheduler == scheduler)
+            .where(scheduled_job.c.status == JobStatus.pending)
+        )
+        if job_id is not None:
+            query = query.where(scheduled_job.c.id == job_id)
+
+        async with Session.begin() as session:
+            await session.execute(query)
+
+    async def pending(self, scheduler: str) -> list[Row]:
+        async with Session.begin() as session:
+            result = await session.execute(
+                select(scheduled_job)
+                .where(scheduled_job.c.scheduler == scheduler)
+                .where(scheduled_job.c.status == JobStatus.pending)
+                .order_by(scheduled_job.c.run_at)
+            )
+            return result.all()
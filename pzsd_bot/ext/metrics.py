@@ -0,0 +1,63 @@
+import math
+from bisect import bisect_left
+from collections import abc
+
+# in seconds
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)  # fmt: skip
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    """Counts observations into fixed buckets, like a prometheus histogram.
+
+    Recording is a binary search and the memory used doesn't grow with the
+    number of observations, at the cost of quantiles only being known to
+    the nearest bucket.
+    """
+
+    def __init__(self, buckets: abc.Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        # the last count is for observations past the highest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        """Get the upper bound of the bucket the q-quantile falls in,
+        or the largest observation if it's past the highest bucket."""
+        if self.count == 0:
+            return None
+
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= max(rank, 1):
+                return min(bound, self.max)
+
+        return self.max
+
+    def render(self, name: str, labels: dict[str, str]) -> list[str]:
+        """Render samples in the prometheus text format, bucket counts are
+        cumulative. The metric's TYPE line is left to the caller since it's
+        shared by every set of labels."""
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{label_text}}} {self.sum}")
+        lines.append(f"{name}_count{{{label_text}}} {self.count}")
+
+        return lines
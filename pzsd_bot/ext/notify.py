@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import abc
+from typing import Any
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pzsd_bot.db import is_postgres
+from pzsd_bot.settings import DB
+
+# Identifies notifications sent by this process so
+# listeners can skip changes they've already applied
+INSTANCE_ID = uuid.uuid4().hex
+
+NotificationCallback = abc.Callable[[dict[str, Any]], abc.Awaitable[None]]
+
+
+async def notify(session: AsyncSession, channel: str, payload: dict[str, Any]) -> None:
+    """Queue a NOTIFY on the given channel as part of the session's transaction.
+
+    Postgres only delivers the notification once the transaction commits, so
+    listeners never see changes that were rolled back. Does nothing when not
+    running against postgres.
+    """
+    if not is_postgres():
+        return
+
+    payload = {**payload, "origin": INSTANCE_ID}
+    await session.execute(select(func.pg_notify(channel, json.dumps(payload))))
+
+
+class PGListener:
+    """Listens for notifications on a dedicated asyncpg connection.
+
+    LISTEN is bound to a single connection, so it can't go through the pooled
+    sqlalchemy engine. Connecting is retried with exponential backoff, both
+    on startup and if the connection drops. Once a dropped connection is
+    reestablished `on_reconnect` is awaited, since any notifications sent
+    in the meantime were lost.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        callback: NotificationCallback,
+        on_reconnect: abc.Callable[[], abc.Awaitable[None]] | None = None,
+        dsn: str | None = None,
+        reconnect_delay: float = 5,
+        max_reconnect_delay: float = 300,
+    ):
+        self.channel = channel
+        self.callback = callback
+        self.on_reconnect = on_reconnect
+        self.dsn = dsn or DB.dsn
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._logger = logging.getLogger(f"{__name__}.{channel}")
+        self._connection: asyncpg.Connection | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._closed = False
+
+    async def start(self) -> None:
+        """Connect and start listening, retrying until it succeeds or the
+        listener is closed."""
+        self._closed = False
+        delay = self.reconnect_delay
+        while not self._closed:
+            try:
+                await self._connect()
+            except (OSError, asyncpg.PostgresError) as e:
+                self._logger.warning(
+                    "Failed to connect listener, retrying in %s seconds: %s", delay, e
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            else:
+                return
+
+    async def _connect(self) -> None:
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._on_termination)
+        await self._connection.add_listener(self.channel, self._on_notification)
+        self._logger.info("Listening for notifications on '%s'", self.channel)
+
+    async def close(self) -> None:
+        self._closed = True
+
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    async def _on_notification(
+        self, connection: asyncpg.Connection, pid: int, channel: str, payload: str
+    ) -> None:
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            self._logger.warning("Ignoring malformed notification: '%s'", payload)
+            return
+
+        if data.get("origin") == INSTANCE_ID:
+            return
+
+        self._logger.debug("Received notification: %s", data)
+        try:
+            await self.callback(data)
+        except Exception:
+            self._logger.exception("Failed to handle notification: %s", data)
+
+    def _on_termination(self, connection: asyncpg.Connection) -> None:
+        if self._closed:
+            return
+
+        self._logger.warning("Listener connection was terminated, reconnecting")
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        await asyncio.sleep(self.reconnect_delay)
+        if self._closed:
+            return
+
+        await self.start()
+
+        if not self._closed and self.on_reconnect is not None:
+            await self.on_reconnect()
@@ -1,3 +1,6 @@
+from collections import abc
+from typing import Any
+
 import discord
 from discord.ext.pages import Paginator as PycordPaginator
 
@@ -34,3 +37,54 @@ class Paginator(PycordPaginator):
         )
 
         return self.message
+
+
+class LazyPaginator(Paginator):
+    """Paginator that only builds the pages being viewed.
+
+    Rather than rendering every page upfront, pages are fetched in chunks of
+    `chunk_size` the first time one of them is displayed. `fetch_pages` is
+    awaited with the offset and limit of the chunk and should return the
+    pages in that range.
+    """
+
+    def __init__(
+        self,
+        page_count: int,
+        fetch_pages: abc.Callable[[int, int], abc.Awaitable[list[discord.Embed]]],
+        chunk_size: int = 10,
+        **kwargs: dict[str, Any],
+    ) -> None:
+        super().__init__(pages=["Loading..."] * page_count, **kwargs)
+
+        self.fetch_pages = fetch_pages
+        self.chunk_size = chunk_size
+        self.loaded_chunks: set[int] = set()
+
+    async def load_page(self, page_number: int) -> None:
+        chunk = page_number // self.chunk_size
+        if chunk in self.loaded_chunks:
+            return
+
+        offset = chunk * self.chunk_size
+        pages = await self.fetch_pages(offset, self.chunk_size)
+        self.pages[offset : offset + len(pages)] = pages
+        self.loaded_chunks.add(chunk)
+
+    async def goto_page(
+        self, page_number: int = 0, *, interaction: discord.Interaction | None = None
+    ) -> None:
+        await self.load_page(page_number)
+        await super().goto_page(page_number, interaction=interaction)
+
+    async def respond(
+        self, *args: tuple[Any, ...], **kwargs: dict[str, Any]
+    ) -> discord.Message | discord.WebhookMessage:
+        await self.load_page(self.current_page)
+        return await super().respond(*args, **kwargs)
+
+    async def channel_send(
+        self, *args: tuple[Any, ...], **kwargs: dict[str, Any]
+    ) -> discord.Message:
+        await self.load_page(self.current_page)
+        return await super().channel_send(*args, **kwargs)
@@ -1,26 +1,163 @@
 import asyncio
+import heapq
+import itertools
 import logging
+import time
+import weakref
 from collections import abc
-from datetime import datetime
+from datetime import UTC, datetime, tzinfo
 from functools import partial
+from typing import Any
+
+from sqlalchemy.engine import Row
+
+from pzsd_bot.ext.cron import CronSchedule, parse_cron
+from pzsd_bot.ext.job_store import JobStore
+from pzsd_bot.ext.metrics import DURATION_BUCKETS, LATENCY_BUCKETS, Histogram
+from pzsd_bot.model import MisfirePolicy
+from pzsd_bot.settings import SchedulerSettings
+
+CoroutineFactory = abc.Callable[[], abc.Coroutine]
+# called with the time of each occurrence of a recurring job
+RecurringCoroutineFactory = abc.Callable[[datetime], abc.Coroutine]
+JobHandler = abc.Callable[..., abc.Coroutine]
+
+# the latest scheduler with each name, for reporting metrics
+SCHEDULERS: "weakref.WeakValueDictionary[str, Scheduler]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+class _ScheduledJob:
+    __slots__ = (
+        "cancelled",
+        "coroutine",
+        "cron",
+        "run_at",
+        "run_until",
+        "seq",
+        "task_id",
+        "when",
+    )
+
+    def __init__(
+        self,
+        task_id: str,
+        coroutine: abc.Coroutine | CoroutineFactory | RecurringCoroutineFactory,
+        run_at: datetime,
+        cron: CronSchedule | None = None,
+        run_until: datetime | None = None,
+    ):
+        self.when = 0.0
+        self.seq = 0
+        self.task_id = task_id
+        self.coroutine = coroutine
+        self.run_at = run_at
+        self.cron = cron
+        self.run_until = run_until
+        self.cancelled = False
+
+    def __lt__(self, other: "_ScheduledJob") -> bool:
+        return (self.when, self.seq) < (other.when, other.seq)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        # close coroutines that will never be awaited
+        # so they don't warn when garbage collected
+        if asyncio.iscoroutine(self.coroutine):
+            self.coroutine.close()
+        self.coroutine = None
 
 
 class Scheduler:
-    def __init__(self, name: str):
+    """Runs coroutines at a given time.
+
+    Pending jobs are kept in a heap with a single timer armed for the
+    earliest one, so nothing but a small entry is held per job until it's
+    due. A task is only created once a job fires. Jobs can be given as a
+    coroutine or as a function returning one, the latter avoids holding a
+    coroutine frame for jobs that are far off.
+
+    Jobs are ordered by wall clock time and the timer never sleeps longer
+    than `max_sleep` before checking the clock again, so jobs that are
+    months out still run on time if the clock drifts or jumps.
+
+    Recurring jobs follow a cron schedule. A recurring job keeps its entry
+    in the heap, which is moved on to the next occurrence each time the
+    job fires, so only one occurrence is ever computed ahead.
+
+    Given a job store, jobs can also be persisted so they're recovered on
+    startup. Persisted jobs refer to a handler registered by name, called
+    with the job's payload as keyword arguments, plus `run_at` for
+    recurring jobs.
+
+    How late each job starts compared to when it was due, and how long it
+    takes to run, are recorded in histograms.
+    """
+
+    # rebuild the heap once more than this fraction of it is canceled jobs
+    COMPACT_RATIO = 0.5
+    # warn about jobs starting this many seconds late
+    LATE_THRESHOLD = 1.0
+
+    def __init__(
+        self,
+        name: str,
+        store: JobStore | None = None,
+        clock: abc.Callable[[], float] = time.time,
+        max_sleep: float | None = None,
+    ):
         self.name = name
+        self.store = store
+        self.clock = clock
+        self.max_sleep = max_sleep or SchedulerSettings.max_sleep
         self._logger = logging.getLogger(f"{__name__}.{name}")
         self.tasks: dict[str, asyncio.Task] = {}
+        self.handlers: dict[str, JobHandler] = {}
 
-    async def _run_later(
-        self, delay: float, task_id: str, coroutine: abc.Coroutine
-    ) -> None:
-        self._logger.info(
-            "Waiting %s seconds before awaiting task with id=%s", delay, task_id
-        )
-        await asyncio.sleep(delay)
+        self._queue: list[_ScheduledJob] = []
+        self._jobs: dict[str, _ScheduledJob] = {}
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_when: float | None = None
+        self._cancelled_count = 0
+
+        self.lateness = Histogram(LATENCY_BUCKETS)
+        self.durations = Histogram(DURATION_BUCKETS)
+        self.failures = 0
+        SCHEDULERS[name] = self
+
+    def now(self, tz: tzinfo | None = None) -> datetime:
+        """Get the current time according to the scheduler's clock."""
+        return datetime.fromtimestamp(self.clock(), tz)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._jobs or task_id in self.tasks
+
+    async def _run(self, task_id: str, coroutine: abc.Coroutine, due: float) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        # includes any time spent waiting on the event loop
+        # after the job was due, so stalls show up here
+        lateness = max(self.clock() - due, 0)
+        self.lateness.observe(lateness)
+        if lateness > self.LATE_THRESHOLD:
+            self._logger.warning(
+                "Task with id=%s started %.3f seconds late", task_id, lateness
+            )
 
         self._logger.info("Awaiting task with id=%s", task_id)
-        await coroutine
+        try:
+            await coroutine
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.durations.observe(loop.time() - started)
         self._logger.info("Finished task with id=%s", task_id)
 
     def _task_done_callback(self, task_id: str, done_task: asyncio.Task) -> None:
@@ -31,38 +168,434 @@ class Scheduler:
             self._logger.info("Deleting task with id=%s", task_id)
             del self.tasks[task_id]
 
-    def _create_task(self, task_id: str, coroutine: abc.Coroutine) -> None:
-        task = asyncio.create_task(coroutine, name=f"{self.name}_{task_id}")
+    def _create_task(
+        self, task_id: str, coroutine: abc.Coroutine | CoroutineFactory, due: float
+    ) -> None:
+        if not asyncio.iscoroutine(coroutine):
+            coroutine = coroutine()
+
+        task = asyncio.create_task(
+            self._run(task_id, coroutine, due), name=f"{self.name}_{task_id}"
+        )
         task.add_done_callback(partial(self._task_done_callback, task_id))
 
         self.tasks[task_id] = task
-        self._logger.debug("Scheduled task with id=%s", task_id)
+        self._logger.debug("Started task with id=%s", task_id)
+
+    def _arm_timer(self) -> None:
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+            self._cancelled_count -= 1
+
+        if not self._queue:
+            self._disarm_timer()
+            return
+
+        when = self._queue[0].when
+        if self._timer is not None and self._timer_when <= when:
+            return
+
+        self._disarm_timer()
+        # long waits are split up since the loop's monotonic clock can
+        # drift from the wall clock, or stop while the host is suspended
+        delay = min(when - self.clock(), self.max_sleep)
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(max(delay, 0), self._fire_due_jobs)
+        self._timer_when = when
+
+    def _disarm_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        self._timer_when = None
+
+    def _fire_due_jobs(self) -> None:
+        now = self.clock()
+        self._timer = None
+        self._timer_when = None
+
+        while self._queue and self._queue[0].when <= now:
+            job = heapq.heappop(self._queue)
+            if job.cancelled:
+                self._cancelled_count -= 1
+                continue
+
+            del self._jobs[job.task_id]
+            self._fire(job)
+
+        self._arm_timer()
+
+    def _push(self, job: _ScheduledJob) -> None:
+        job.when = job.run_at.timestamp()
+        job.seq = next(self._counter)
+        heapq.heappush(self._queue, job)
+        self._jobs[job.task_id] = job
+
+    def _fire(self, job: _ScheduledJob) -> None:
+        if job.cron is None:
+            self._create_task(job.task_id, job.coroutine, job.when)
+            return
+
+        self._create_task(job.task_id, partial(job.coroutine, job.run_at), job.when)
+
+        # occurrences missed while the job was held up aren't
+        # caught up on, it just moves on to the next one
+        now = self.now(job.run_at.tzinfo)
+        run_at = job.cron.next_after(max(job.run_at, now))
+        if job.run_until is not None and run_at > job.run_until:
+            self._logger.info("Recurring task with id=%s has finished", job.task_id)
+            return
+
+        job.run_at = run_at
+        self._push(job)
+
+    def _discard_job(self, job: _ScheduledJob) -> None:
+        job.cancel()
+        self._cancelled_count += 1
+
+        # canceled jobs are left in the heap to be skipped
+        # when popped, but don't let them pile up forever
+        if self._cancelled_count > len(self._queue) * self.COMPACT_RATIO:
+            self._queue = [job for job in self._queue if not job.cancelled]
+            heapq.heapify(self._queue)
+            self._cancelled_count = 0
 
     def schedule(
-        self, run_at: datetime, task_id: str, coroutine: abc.Coroutine
+        self,
+        run_at: datetime,
+        task_id: str,
+        coroutine: abc.Coroutine | CoroutineFactory,
     ) -> None:
-        now = datetime.now(run_at.tzinfo)
-        delay = (run_at - now).total_seconds()
-        if delay > 0:
-            coroutine = self._run_later(delay, task_id, coroutine)
+        """Schedule a job to run at `run_at`, replacing any pending job
+        with the same id."""
+        if (existing_job := self._jobs.pop(task_id, None)) is not None:
+            self._logger.debug("Replacing pending task with id=%s", task_id)
+            self._discard_job(existing_job)
+
+        self._enqueue(_ScheduledJob(task_id, coroutine, run_at))
+
+    def schedule_recurring(
+        self,
+        task_id: str,
+        cron: CronSchedule | str,
+        coroutine: RecurringCoroutineFactory,
+        run_at: datetime | None = None,
+        run_until: datetime | None = None,
+    ) -> None:
+        """Schedule a job to run at every occurrence of a cron schedule,
+        replacing any pending job with the same id.
+
+        `coroutine` is called with the time of each occurrence. The job
+        starts from `run_at` if given, otherwise its next occurrence, and
+        stops once there are no occurrences left before `run_until`.
+        """
+        if isinstance(cron, str):
+            cron = parse_cron(cron)
+
+        if (existing_job := self._jobs.pop(task_id, None)) is not None:
+            self._logger.debug("Replacing pending task with id=%s", task_id)
+            self._discard_job(existing_job)
+
+        if run_at is None:
+            run_at = cron.next_after(self.now(UTC))
+        if run_until is not None and run_at > run_until:
+            self._logger.info("Recurring task with id=%s has finished", task_id)
+            self._arm_timer()
+            return
+
+        self._enqueue(_ScheduledJob(task_id, coroutine, run_at, cron, run_until))
+
+    def _enqueue(self, job: _ScheduledJob) -> None:
+        now = self.clock()
+        delay = job.run_at.timestamp() - now
+        if delay <= 0:
+            # jobs that are already due count as due now
+            job.when = now
+            self._fire(job)
+        else:
+            self._push(job)
+            self._logger.debug(
+                "Scheduled task with id=%s to run in %s seconds", job.task_id, delay
+            )
 
-        self._create_task(task_id, coroutine)
+        self._arm_timer()
 
     def cancel(self, task_id: str) -> None:
         self._logger.info("Canceling task with id=%s", task_id)
 
-        try:
-            task = self.tasks.pop(task_id)
-        except KeyError:
+        job = self._jobs.pop(task_id, None)
+        task = self.tasks.pop(task_id, None)
+        if job is None and task is None:
             self._logger.warning(
                 "Failed to cancel task, no task found with id=%s", task_id
             )
-        else:
+            return
+
+        if job is not None:
+            self._discard_job(job)
+            self._arm_timer()
+        if task is not None:
             task.cancel()
-            self._logger.info("Canceled task with id=%s", task_id)
+
+        self._logger.info("Canceled task with id=%s", task_id)
 
     def cancel_all(self) -> None:
         self._logger.info("Canceling all tasks")
 
-        for task_id in self.tasks.copy():
-            self.cancel(task_id)
+        for job in self._jobs.values():
+            job.cancel()
+        for task in self.tasks.values():
+            task.cancel()
+
+        self._jobs.clear()
+        self.tasks.clear()
+        self._queue.clear()
+        self._cancelled_count = 0
+        self._disarm_timer()
+
+    def register(self, name: str, handler: JobHandler) -> None:
+        """Register a handler persisted jobs can refer to."""
+        self.handlers[name] = handler
+
+    def _require_store(self) -> JobStore:
+        if self.store is None:
+            raise RuntimeError(f"Scheduler '{self.name}' has no job store")
+        return self.store
+
+    async def _run_persisted(
+        self, job_id: str, handler: str, payload: dict[str, Any] | None
+    ) -> None:
+        # claiming the job before running it means it
+        # runs at most once, even across restarts
+        if not await self._require_store().claim(job_id):
+            self._logger.info("Persisted task with id=%s was already run", job_id)
+            return
+
+        await self.handlers[handler](**(payload or {}))
+
+    def _schedule_persisted(
+        self,
+        run_at: datetime,
+        job_id: str,
+        handler: str,
+        payload: dict[str, Any] | None,
+    ) -> None:
+        self.schedule(
+            run_at=run_at,
+            task_id=job_id,
+            coroutine=partial(self._run_persisted, job_id, handler, payload),
+        )
+
+    async def _run_persisted_occurrence(
+        self,
+        job_id: str,
+        handler: str,
+        payload: dict[str, Any] | None,
+        cron: CronSchedule,
+        run_until: datetime | None,
+        run_at: datetime,
+    ) -> None:
+        next_run_at = cron.next_after(max(run_at, self.now(run_at.tzinfo)))
+        if run_until is not None and next_run_at > run_until:
+            next_run_at = None
+
+        if not await self._require_store().claim_occurrence(
+            job_id, run_at, next_run_at
+        ):
+            self._logger.info(
+                "Persisted task with id=%s was already run at %s", job_id, run_at
+            )
+            return
+
+        await self.handlers[handler](run_at=run_at, **(payload or {}))
+
+    def _schedule_persisted_recurring(
+        self,
+        run_at: datetime,
+        job_id: str,
+        handler: str,
+        payload: dict[str, Any] | None,
+        cron: CronSchedule,
+        run_until: datetime | None,
+    ) -> None:
+        self.schedule_recurring(
+            task_id=job_id,
+            cron=cron,
+            coroutine=partial(
+                self._run_persisted_occurrence,
+                job_id,
+                handler,
+                payload,
+                cron,
+                run_until,
+            ),
+            run_at=run_at,
+            run_until=run_until,
+        )
+
+    async def schedule_persisted(
+        self,
+        run_at: datetime,
+        job_id: str,
+        handler: str,
+        payload: dict[str, Any] | None = None,
+        misfire_policy: MisfirePolicy = MisfirePolicy.run_once,
+    ) -> bool:
+        """Persist and schedule a job, returning False if a job with the
+        same ID already exists, in which case nothing is scheduled."""
+        if handler not in self.handlers:
+            raise ValueError(f"No handler registered with name '{handler}'")
+
+        added = await self._require_store().add(
+            self.name, job_id, handler, run_at, payload, misfire_policy
+        )
+        if not added:
+            self._logger.info("Persisted task with id=%s already exists", job_id)
+            return False
+
+        self._schedule_persisted(run_at, job_id, handler, payload)
+        return True
+
+    async def schedule_persisted_recurring(
+        self,
+        job_id: str,
+        handler: str,
+        cron: CronSchedule | str,
+        payload: dict[str, Any] | None = None,
+        misfire_policy: MisfirePolicy = MisfirePolicy.run_once,
+        run_until: datetime | None = None,
+    ) -> bool:
+        """Persist and schedule a recurring job, returning False if a job
+        with the same ID already exists or it has no occurrences left, in
+        which case nothing is scheduled."""
+        if handler not in self.handlers:
+            raise ValueError(f"No handler registered with name '{handler}'")
+        if isinstance(cron, str):
+            cron = parse_cron(cron)
+
+        run_at = cron.next_after(self.now(UTC))
+        if run_until is not None and run_at > run_until:
+            self._logger.info("Recurring task with id=%s has finished", job_id)
+            return False
+
+        added = await self._require_store().add(
+            self.name,
+            job_id,
+            handler,
+            run_at,
+            payload,
+            misfire_policy,
+            cron,
+            run_until,
+        )
+        if not added:
+            self._logger.info("Persisted task with id=%s already exists", job_id)
+            return False
+
+        self._schedule_persisted_recurring(
+            run_at, job_id, handler, payload, cron, run_until
+        )
+        return True
+
+    async def recover(self) -> list[Row]:
+        """Schedule this scheduler's pending persisted jobs.
+
+        Jobs that were due while the bot was down either run right away or
+        are skipped, depending on their misfire policy. A recurring job
+        runs its missed occurrences at most once in total. Returns the
+        jobs that were scheduled.
+        """
+        recovered = []
+        skipped_ids = []
+        run_times = {}
+        for job in await self._require_store().pending(self.name):
+            if job.handler not in self.handlers:
+                self._logger.warning(
+                    "Can't recover task with id=%s, no handler named '%s'",
+                    job.id,
+                    job.handler,
+                )
+                continue
+
+            run_at = job.run_at
+            is_misfire = run_at <= self.now(run_at.tzinfo)
+            if is_misfire and job.misfire_policy is MisfirePolicy.skip:
+                if job.cron is not None:
+                    # missed occurrences are only skipped in memory, the
+                    # next one is claimed by comparing against run_at
+                    cron = parse_cron(job.cron, job.timezone)
+                    run_at = cron.next_after(self.now(UTC))
+                if job.cron is None or (
+                    job.run_until is not None and run_at > job.run_until
+                ):
+                    skipped_ids.append(job.id)
+                    continue
+
+            recovered.append(job)
+            run_times[job.id] = run_at
+
+        if skipped_ids:
+            self._logger.info("Skipping missed tasks with ids=%s", skipped_ids)
+            await self._require_store().skip(skipped_ids)
+
+        for job in recovered:
+            if job.cron is None:
+                self._schedule_persisted(
+                    run_times[job.id], job.id, job.handler, job.payload
+                )
+            else:
+                self._schedule_persisted_recurring(
+                    run_times[job.id],
+                    job.id,
+                    job.handler,
+                    job.payload,
+                    parse_cron(job.cron, job.timezone),
+                    job.run_until,
+                )
+
+        self._logger.info("Recovered %s persisted tasks", len(recovered))
+        return recovered
+
+    async def remove_persisted(self, job_id: str | None = None) -> None:
+        """Cancel and remove a persisted job, or all of this
+        scheduler's persisted jobs if no ID is given."""
+        await self._require_store().remove(self.name, job_id)
+        if job_id is None:
+            self.cancel_all()
+        elif job_id in self:
+            self.cancel(job_id)
+
+
+def render_metrics() -> str:
+    """Render every scheduler's metrics in the prometheus text format."""
+    schedulers = sorted(SCHEDULERS.items())
+
+    lines = ["# TYPE scheduler_pending_jobs gauge"]
+    for name, scheduler in schedulers:
+        lines.append(f'scheduler_pending_jobs{{scheduler="{name}"}} {len(scheduler)}')
+
+    lines.append("# TYPE scheduler_running_tasks gauge")
+    for name, scheduler in schedulers:
+        lines.append(
+            f'scheduler_running_tasks{{scheduler="{name}"}} {len(scheduler.tasks)}'
+        )
+
+    lines.append("# TYPE scheduler_task_failures_total counter")
+    for name, scheduler in schedulers:
+        lines.append(
+            f'scheduler_task_failures_total{{scheduler="{name}"}} {scheduler.failures}'
+        )
+
+    lines.append("# TYPE scheduler_lateness_seconds histogram")
+    for name, scheduler in schedulers:
+        lines += scheduler.lateness.render(
+            "scheduler_lateness_seconds", {"scheduler": name}
+        )
+
+    lines.append("# TYPE scheduler_task_duration_seconds histogram")
+    for name, scheduler in schedulers:
+        lines += scheduler.durations.render(
+            "scheduler_task_duration_seconds", {"scheduler": name}
+        )
+
+    return "\n".join(lines) + "\n"
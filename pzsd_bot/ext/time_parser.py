@@ -0,0 +1,352 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+import pendulum
+
+CACHE_SIZE = 1024
+
+# Units for relative times, in the order they must appear. Single letters
+# are case sensitive, "m" is months and "M" is minutes.
+DURATION_UNITS = {
+    "years": ("years", "year", "Y", "y"),
+    "months": ("months", "month", "m"),
+    "weeks": ("weeks", "week", "W", "w"),
+    "days": ("days", "day", "D", "d"),
+    "hours": ("hours", "hour", "hrs", "hr", "H", "h"),
+    "minutes": ("minutes", "minute", "min", "M"),
+    "seconds": ("seconds", "second", "secs", "sec", "S", "s"),
+}
+UNIT_RANKS = {
+    name: (rank, unit)
+    for rank, (unit, names) in enumerate(DURATION_UNITS.items())
+    for name in names
+}
+# longest names first so the alternation matches greedily
+UNIT_PATTERN = re.compile("|".join(sorted(UNIT_RANKS, key=len, reverse=True)))
+DIGIT_PATTERN = re.compile(r"\d+")
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<space>\s+)|(?P<number>\d+)|(?P<word>[^\W\d_]+)|(?P<sep>[^\w\s]|_)"
+)
+
+MONTHS = {
+    name: number
+    for number, names in enumerate(
+        (
+            ("january", "jan"),
+            ("february", "feb"),
+            ("march", "mar"),
+            ("april", "apr"),
+            ("may",),
+            ("june", "jun"),
+            ("july", "jul"),
+            ("august", "aug"),
+            ("september", "sep", "sept"),
+            ("october", "oct"),
+            ("november", "nov"),
+            ("december", "dec"),
+        ),
+        start=1,
+    )
+    for name in names
+}
+WEEKDAYS = {
+    name: number
+    for number, names in enumerate(
+        (
+            ("monday", "mon"),
+            ("tuesday", "tue", "tues"),
+            ("wednesday", "wed"),
+            ("thursday", "thu", "thur", "thurs"),
+            ("friday", "fri"),
+            ("saturday", "sat"),
+            ("sunday", "sun"),
+        )
+    )
+    for name in names
+}
+FILLER_WORDS = {"at", "on", "the", "of"}
+ORDINAL_SUFFIXES = {"st", "nd", "rd", "th"}
+MERIDIEMS = {"am": 0, "pm": 12}
+
+
+class TimeExpression(NamedTuple):
+    """The fields given in an absolute time, anything missing
+    is filled in relative to the current date when resolved."""
+
+    year: int | None = None
+    month: int | None = None
+    day: int | None = None
+    weekday: int | None = None
+    hour: int | None = None
+    minute: int | None = None
+    second: int | None = None
+    utc_offset: int | None = None  # in seconds
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_duration(text: str) -> pendulum.Duration | None:
+    """Parse a relative time like "1 day 6h" or "2weeks".
+
+    Each amount is followed by a unit, optionally separated by a single
+    space, with units given largest to smallest and at most once each.
+    """
+    amounts = {}
+    last_rank = -1
+    pos = 0
+    while pos < len(text):
+        if (m := DIGIT_PATTERN.match(text, pos)) is None:
+            return None
+        amount = int(m[0])
+        pos = m.end()
+
+        if text.startswith(" ", pos):
+            pos += 1
+
+        if (m := UNIT_PATTERN.match(text, pos)) is None:
+            return None
+        rank, unit = UNIT_RANKS[m[0]]
+        if rank <= last_rank:
+            return None
+        amounts[unit] = amount
+        last_rank = rank
+        pos = m.end()
+
+        if unit != "seconds" and text.startswith(" ", pos):
+            pos += 1
+
+    if not amounts:
+        return None
+
+    return pendulum.duration(**amounts)
+
+
+def tokenize(text: str) -> list[tuple[str, str]] | None:
+    """Split text into number, word and separator tokens,
+    or None if it contains anything else."""
+    text = text.lower().replace("a.m.", "am").replace("p.m.", "pm")
+
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        m = TOKEN_PATTERN.match(text, pos)
+        if m is None:
+            return None
+        if m.lastgroup != "space":
+            tokens.append((m.lastgroup, m[0]))
+        pos = m.end()
+
+    return tokens
+
+
+class _ExpressionParser:
+    def __init__(self, tokens: list[tuple[str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+        self.fields = {}
+
+    def peek(self, offset: int = 0) -> tuple[str | None, str | None]:
+        if self.pos + offset < len(self.tokens):
+            return self.tokens[self.pos + offset]
+        return None, None
+
+    def set(self, **fields: int) -> bool:
+        if any(name in self.fields for name in fields):
+            return False
+        self.fields.update(fields)
+        return True
+
+    def parse(self) -> TimeExpression | None:
+        while self.pos < len(self.tokens):
+            kind, value = self.peek()
+            match kind:
+                case "number":
+                    ok = self.parse_number()
+                case "word":
+                    ok = self.parse_word(value)
+                case _:
+                    ok = self.parse_sep(value)
+
+            if not ok:
+                return None
+
+        if not self.fields.keys() - {"utc_offset"}:
+            return None
+
+        return TimeExpression(**self.fields)
+
+    def parse_word(self, word: str) -> bool:
+        self.pos += 1
+        if word in FILLER_WORDS:
+            return True
+        if word in MONTHS:
+            return self.set(month=MONTHS[word])
+        if word in WEEKDAYS:
+            return self.set(weekday=WEEKDAYS[word])
+        if word == "noon":
+            return self.set(hour=12, minute=0, second=0)
+        if word == "midnight":
+            return self.set(hour=0, minute=0, second=0)
+        if word == "t":
+            # iso 8601 date and time separator
+            return "day" in self.fields and "hour" not in self.fields
+        if word == "z":
+            return "hour" in self.fields and self.set(utc_offset=0)
+        return False
+
+    def parse_sep(self, sep: str) -> bool:
+        self.pos += 1
+        if sep == ",":
+            return True
+        if sep in "+-" and "hour" in self.fields:
+            return self.parse_utc_offset(-1 if sep == "-" else 1)
+        return False
+
+    def parse_utc_offset(self, sign: int) -> bool:
+        kind, value = self.peek()
+        if kind != "number" or len(value) not in (2, 4):
+            return False
+        self.pos += 1
+
+        hours, minutes = int(value[:2]), int(value[2:] or 0)
+        if len(value) == 2 and self.peek() == ("sep", ":"):
+            kind, value = self.peek(1)
+            if kind != "number" or len(value) != 2:
+                return False
+            minutes = int(value)
+            self.pos += 2
+
+        if hours > 23 or minutes > 59:
+            return False
+        return self.set(utc_offset=sign * (hours * 3600 + minutes * 60))
+
+    def parse_number(self) -> bool:
+        _, value = self.peek()
+        next_kind, next_value = self.peek(1)
+
+        if next_kind == "sep" and next_value in "-/" and self.peek(2)[0] == "number":
+            return self.parse_date(next_value)
+        if next_kind == "sep" and next_value == ":" and self.peek(2)[0] == "number":
+            return self.parse_time()
+
+        self.pos += 1
+        if next_kind == "word" and next_value in MERIDIEMS:
+            self.pos += 1
+            return self.set_hour(int(value), 0, 0, next_value)
+        if next_kind == "word" and next_value in ORDINAL_SUFFIXES:
+            self.pos += 1
+            return self.set(day=int(value))
+        if len(value) == 4:
+            return self.set(year=int(value))
+        if "month" in self.fields or (next_kind == "word" and next_value in MONTHS):
+            return self.set(day=int(value))
+        return False
+
+    def parse_date(self, sep: str) -> bool:
+        parts = [self.peek()[1]]
+        self.pos += 1
+        while self.peek() == ("sep", sep) and self.peek(1)[0] == "number":
+            parts.append(self.peek(1)[1])
+            self.pos += 2
+        if len(parts) > 3:
+            return False
+
+        if len(parts[0]) == 4:
+            if len(parts) != 3:
+                return False
+            year, month, day = parts
+        else:
+            month, day, year = parts if len(parts) == 3 else (*parts, None)
+
+        fields = {"month": int(month), "day": int(day)}
+        if year is not None:
+            # two digit years are this century
+            fields["year"] = int(year) + (2000 if len(year) == 2 else 0)
+            if len(year) not in (2, 4):
+                return False
+
+        return self.set(**fields)
+
+    def parse_time(self) -> bool:
+        parts = [self.peek()[1]]
+        self.pos += 1
+        while self.peek() == ("sep", ":") and self.peek(1)[0] == "number":
+            parts.append(self.peek(1)[1])
+            self.pos += 2
+        if len(parts) > 3 or any(len(part) > 2 for part in parts[1:]):
+            return False
+
+        hour, minute, second = (int(part) for part in (*parts, "0")[:3])
+
+        kind, value = self.peek()
+        if kind == "word" and value in MERIDIEMS:
+            self.pos += 1
+            return self.set_hour(hour, minute, second, value)
+
+        return self.set(hour=hour, minute=minute, second=second)
+
+    def set_hour(self, hour: int, minute: int, second: int, meridiem: str) -> bool:
+        if not 1 <= hour <= 12:
+            return False
+        return self.set(
+            hour=hour % 12 + MERIDIEMS[meridiem], minute=minute, second=second
+        )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_expression(text: str) -> TimeExpression | None:
+    """Parse an absolute time like "March 5th at 5pm" or "2025-03-05 17:30"
+    into its fields without resolving it to a date."""
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+
+    return _ExpressionParser(tokens).parse()
+
+
+def resolve_expression(
+    expression: TimeExpression,
+    timezone: str,
+    now: pendulum.DateTime | None = None,
+) -> pendulum.DateTime | None:
+    if expression.utc_offset is not None:
+        tz = pendulum.fixed_timezone(expression.utc_offset)
+    else:
+        tz = pendulum.timezone(timezone)
+
+    today = (now or pendulum.now(tz)).in_timezone(tz).date()
+    if expression.weekday is not None and expression.day is None:
+        # next occurrence of the weekday, including today
+        today = today.add(days=(expression.weekday - today.weekday()) % 7)
+
+    try:
+        # fields given as 0 are kept so they're rejected as out of range
+        return pendulum.datetime(
+            today.year if expression.year is None else expression.year,
+            today.month if expression.month is None else expression.month,
+            today.day if expression.day is None else expression.day,
+            expression.hour or 0,
+            expression.minute or 0,
+            expression.second or 0,
+            tz=tz,
+        )
+    except (ValueError, OverflowError):
+        # a huge number overflows rather than being out of range
+        return None
+
+
+def parse_datetime(
+    text: str, timezone: str, now: pendulum.DateTime | None = None
+) -> pendulum.DateTime | None:
+    """Parse an absolute time in the given timezone.
+
+    Parsing is cached by text alone since fields left out, like the date
+    in "5pm", depend on when the reminder is made and are filled in on
+    every call.
+    """
+    expression = parse_expression(text)
+    if expression is None:
+        return None
+
+    return resolve_expression(expression, timezone, now)
@@ -0,0 +1,146 @@
+import re
+import time
+from collections import abc, defaultdict
+from typing import Any, DefaultDict, List, NamedTuple, Tuple
+
+from pzsd_bot.ext.word_index import WordIndex
+from pzsd_bot.model import TriggerResponseType
+
+TriggerKey = Tuple[int, str, TriggerResponseType]
+CachedTrigger = DefaultDict[TriggerKey, List[str]]
+# discord channel or category ID, None for global triggers
+Scope = int | None
+
+
+class TriggerMatch(NamedTuple):
+    key: TriggerKey
+    responses: List[str]
+    span: Tuple[int, int]
+    regex_match: re.Match | None = None
+
+
+class PatternProfile(NamedTuple):
+    key: TriggerKey
+    kind: str
+    elapsed: float  # in seconds
+    span: Tuple[int, int] | None
+
+
+class TriggerIndex:
+    """Cached triggers for a single scope."""
+
+    def __init__(self) -> None:
+        self.normal_triggers: CachedTrigger = defaultdict(list)
+        self.regex_triggers: CachedTrigger = defaultdict(list)
+        self.word_triggers: CachedTrigger = defaultdict(list)
+        self.word_index: WordIndex[TriggerKey] = WordIndex()
+
+    def __len__(self) -> int:
+        return (
+            len(self.normal_triggers)
+            + len(self.regex_triggers)
+            + len(self.word_triggers)
+        )
+
+    def get_cache(self, is_regex: bool, is_whole_word: bool) -> CachedTrigger:
+        if is_regex:
+            return self.regex_triggers
+        elif is_whole_word:
+            return self.word_triggers
+        else:
+            return self.normal_triggers
+
+    def add_trigger(
+        self, key: TriggerKey, responses: List[str], is_regex: bool, is_whole_word: bool
+    ) -> None:
+        self.get_cache(is_regex, is_whole_word)[key] = responses
+        if is_whole_word and not is_regex:
+            self.word_index.add(key[1], key)
+
+    def add_response(
+        self, key: TriggerKey, response: str, is_regex: bool, is_whole_word: bool
+    ) -> None:
+        self.get_cache(is_regex, is_whole_word)[key].append(response)
+        if is_whole_word and not is_regex:
+            self.word_index.add(key[1], key)
+
+    def remove_trigger(
+        self, key: TriggerKey, is_regex: bool, is_whole_word: bool
+    ) -> None:
+        self.get_cache(is_regex, is_whole_word).pop(key, None)
+        if is_whole_word and not is_regex:
+            self.word_index.remove(key[1], key)
+
+    def remove_group(self, group_id: int) -> None:
+        for triggers in (self.normal_triggers, self.regex_triggers):
+            for key in [key for key in triggers if key[0] == group_id]:
+                del triggers[key]
+
+        for key in [key for key in self.word_triggers if key[0] == group_id]:
+            del self.word_triggers[key]
+            self.word_index.remove(key[1], key)
+
+    @staticmethod
+    def match_normal(pattern: str, lowered: str) -> Tuple[int, int] | None:
+        if (start := lowered.find(pattern)) != -1:
+            return start, start + len(pattern)
+
+    @staticmethod
+    def match_regex(pattern: str, content: str) -> re.Match | None:
+        return re.search(pattern, content, re.IGNORECASE)
+
+    def match(self, content: str) -> abc.Iterator[TriggerMatch]:
+        lowered = content.lower()
+        for key, responses in list(self.normal_triggers.items()):
+            if span := self.match_normal(key[1], lowered):
+                yield TriggerMatch(key, responses, span)
+
+        for key, span in list(self.word_index.search(content)):
+            yield TriggerMatch(key, self.word_triggers[key], span)
+
+        for key, responses in list(self.regex_triggers.items()):
+            if m := self.match_regex(key[1], content):
+                yield TriggerMatch(key, responses, m.span(), m)
+
+    def profile(self, content: str, repeat: int = 3) -> List[PatternProfile]:
+        """Evaluate every pattern against the content individually, timing
+        each one with the same matching used for real messages.
+
+        Whole word patterns are matched with a single probe of the word index
+        rather than one pattern at a time, so the probe's time is split evenly
+        between them.
+        """
+
+        def timed(func: abc.Callable[..., Any], *args: str) -> Tuple[Any, float]:
+            elapsed = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = func(*args)
+                elapsed.append(time.perf_counter() - start)
+            return result, min(elapsed)
+
+        profiles = []
+        lowered = content.lower()
+        for key in list(self.normal_triggers):
+            span, elapsed = timed(self.match_normal, key[1], lowered)
+            profiles.append(PatternProfile(key, "normal", elapsed, span))
+
+        if self.word_index:
+            word_matches, elapsed = timed(lambda: dict(self.word_index.search(content)))
+            for key in list(self.word_triggers):
+                profiles.append(
+                    PatternProfile(
+                        key,
+                        "whole word",
+                        elapsed / len(self.word_triggers),
+                        word_matches.get(key),
+                    )
+                )
+
+        for key in list(self.regex_triggers):
+            m, elapsed = timed(self.match_regex, key[1], content)
+            profiles.append(
+                PatternProfile(key, "regex", elapsed, m.span() if m else None)
+            )
+
+        return profiles
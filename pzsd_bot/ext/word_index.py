@@ -0,0 +1,71 @@
+import re
+from collections import Counter, abc, defaultdict
+from typing import Generic, TypeVar
+
+WORD_PATTERN = re.compile(r"[\w']+")
+
+T = TypeVar("T")
+
+
+def tokenize(text: str) -> list[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+class WordIndex(Generic[T]):
+    """Hash index for matching whole words and phrases.
+
+    Phrases are stored by their tuple of tokens. A message is tokenized once
+    and each of its n-grams is looked up for every distinct phrase length in
+    the index, so matching scales with the length of the message rather than
+    the number of phrases indexed.
+    """
+
+    def __init__(self) -> None:
+        self.phrases: defaultdict[tuple[str, ...], set[T]] = defaultdict(set)
+        self.lengths: Counter[int] = Counter()
+
+    def __len__(self) -> int:
+        return sum(self.lengths.values())
+
+    def add(self, phrase: str, key: T) -> None:
+        tokens = tuple(tokenize(phrase))
+        if not tokens or key in self.phrases[tokens]:
+            return
+
+        self.phrases[tokens].add(key)
+        self.lengths[len(tokens)] += 1
+
+    def remove(self, phrase: str, key: T) -> None:
+        tokens = tuple(tokenize(phrase))
+        keys = self.phrases.get(tokens)
+        if keys is None or key not in keys:
+            return
+
+        keys.remove(key)
+        if not keys:
+            del self.phrases[tokens]
+
+        self.lengths[len(tokens)] -= 1
+        if not self.lengths[len(tokens)]:
+            del self.lengths[len(tokens)]
+
+    def clear(self) -> None:
+        self.phrases.clear()
+        self.lengths.clear()
+
+    def search(self, text: str) -> abc.Iterator[tuple[T, tuple[int, int]]]:
+        """Yield each key with a phrase in the text along with the span
+        of its first occurrence."""
+        matches = list(WORD_PATTERN.finditer(text.lower()))
+        tokens = [m[0] for m in matches]
+
+        seen = set()
+        for i in range(len(tokens)):
+            for n in self.lengths:
+                if i + n > len(tokens):
+                    continue
+
+                for key in self.phrases.get(tuple(tokens[i : i + n]), ()):
+                    if key not in seen:
+                        seen.add(key)
+                        yield key, (matches[i].start(), matches[i + n - 1].end())
@@ -1,12 +1,14 @@
 import enum
 
 from sqlalchemy import (
+    JSON,
     BigInteger,
     Boolean,
     Column,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     Table,
@@ -22,6 +24,17 @@ class ReminderStatus(enum.Enum):
     failed = "failed"
 
 
+class JobStatus(enum.Enum):
+    pending = "pending"
+    done = "done"
+    skipped = "skipped"
+
+
+class MisfirePolicy(enum.Enum):
+    run_once = "run_once"
+    skip = "skip"
+
+
 class TriggerResponseType(enum.Enum):
     standard = "standard"
     reply = "reply"
@@ -76,6 +89,7 @@ trigger_group = Table(
     ),
     Column("created_at", DateTime, server_default=func.now(), nullable=False),
     Column("updated_at", DateTime, server_default=func.now(), nullable=False),
+    Column("scope_id", BigInteger, nullable=True),  # discord channel or category ID
 )
 
 trigger_pattern = Table(
@@ -90,6 +104,7 @@ trigger_pattern = Table(
         nullable=False,
     ),
     Column("is_regex", Boolean, nullable=False),
+    Column("is_whole_word", Boolean, nullable=False, server_default=text("false")),
 )
 
 trigger_response = Table(
@@ -123,4 +138,43 @@ reminder = Table(
         nullable=False,
         default=ReminderStatus.pending,
     ),
+    Index("ix_reminder_status_remind_at", "status", "remind_at"),
+    Index("ix_reminder_owner_status", "owner", "status"),
+    # keyset pagination of reminder listings
+    Index("ix_reminder_remind_at_id", "remind_at", "id"),
+    Index("ix_reminder_owner_remind_at_id", "owner", "remind_at", "id"),
+)
+
+scheduled_job = Table(
+    "scheduled_job",
+    metadata,
+    Column("id", Text, primary_key=True),  # idempotency key
+    Column("scheduler", Text, nullable=False),
+    Column("handler", Text, nullable=False),
+    Column("payload", JSON, nullable=True),
+    Column("run_at", DateTime(timezone=True), nullable=False),
+    Column(
+        "misfire_policy",
+        Enum(MisfirePolicy),
+        nullable=False,
+        default=MisfirePolicy.run_once,
+    ),
+    Column("status", Enum(JobStatus), nullable=False, default=JobStatus.pending),
+    Column("last_run_at", DateTime(timezone=True), nullable=True),
+    # recurring jobs only, run_at is the next occurrence
+    Column("cron", Text, nullable=True),
+    Column("timezone", Text, nullable=True),
+    Column("run_until", DateTime(timezone=True), nullable=True),
+    Column("created_at", DateTime, server_default=func.now(), nullable=False),
+    Index("ix_scheduled_job_scheduler_status", "scheduler", "status"),
+)
+
+# leaderboards of past AoC years, which don't change once the year is over
+aoc_leaderboard = Table(
+    "aoc_leaderboard",
+    metadata,
+    Column("year", Integer, primary_key=True, autoincrement=False),
+    Column("leaderboard", JSON, nullable=False),
+    Column("fetched_at", DateTime(timezone=True), nullable=False),
+    Column("created_at", DateTime, server_default=func.now(), nullable=False),
 )
@@ -73,6 +73,11 @@ class _DB(EnvSettings):
         else:
             raise ValueError(f"Invalid db_engine: '{self.db_engine}'")
 
+    @property
+    def dsn(self) -> str:
+        """Plain postgres DSN for connections made outside of sqlalchemy."""
+        return f"postgresql://{self.pguser}:{self.pgpassword}@{self.pghost}:{self.pgport}/{self.pgdatabase}"
+
 
 DB = _DB()
 
@@ -133,13 +138,35 @@ DiceSettings = _DiceSettings()
 
 class _ReminderSettings(EnvSettings):
     max_reminders: int = 5
+    # only reminders due within this many seconds are kept scheduled
+    load_horizon: int = 60 * 60
+    # note how many occurrences a recurring reminder missed during downtime
+    summarize_missed: bool = True
+    # seconds to wait for other reminders coming due before delivering a batch
+    delivery_window: float = 1.0
+    # failed deliveries are retried with exponential backoff from this many seconds
+    delivery_retry_delay: float = 30
+    delivery_max_attempts: int = 5
+    channel_cache_ttl: int = 5 * 60
+    channel_negative_cache_ttl: int = 60
 
 
 ReminderSettings = _ReminderSettings()
 
 
+class _SchedulerSettings(EnvSettings):
+    # longest a scheduler waits before checking the wall clock again, in
+    # seconds, which bounds how late a job runs if the clock jumps or the
+    # host is suspended
+    max_sleep: float = 60.0
+
+
+SchedulerSettings = _SchedulerSettings()
+
+
 class _TriggerSettings(EnvSettings):
     immunity_leading_char: str = "."
+    notify_channel: str = "trigger_changes"
 
 
 TriggerSettings = _TriggerSettings()
@@ -205,7 +232,13 @@ class _AOCSettings(EnvSettings):
     private_leaderboard_path: str = f"leaderboard/private/view/{private_leaderboard_id}"
     private_leaderboard_key: str
 
+    # adventofcode.com asks that private leaderboards aren't fetched more
+    # than once every 15 minutes, a shorter TTL is rounded up to that
     leaderboard_cache_ttl_minutes: int = 15
+    # identifies the bot to adventofcode.com, as their automation guidelines ask
+    user_agent: str = "github.com/fiskenslakt/pzsd-bot"
+    # time between fetching each year when backfilling the archive
+    archive_backfill_interval_seconds: int = 30
 
     days_in_event: int = 12
     event_start_month: int = 12
@@ -2,42 +2,54 @@ import logging
 import re
 from typing import Any, Dict, List, Tuple
 
-import discord
 import emoji
 from discord import Bot, InputTextStyle, Interaction
 from discord.ui import InputText, Modal
 from sqlalchemy import delete, func, insert, update
 
 from pzsd_bot.db import Session
+from pzsd_bot.ext.notify import notify
+from pzsd_bot.ext.word_index import tokenize
 from pzsd_bot.model import (
     TriggerResponseType,
     trigger_group,
     trigger_pattern,
     trigger_response,
 )
+from pzsd_bot.settings import TriggerSettings
 
 logger = logging.getLogger(__name__)
 
 
+def is_valid_regex(pattern: str) -> bool:
+    try:
+        re.compile(pattern)
+    except re.error:
+        return False
+    else:
+        return True
+
+
+def is_valid_emoji(bot: Bot, emoji_str: str) -> bool:
+    return bot.emoji_registry.is_valid(emoji_str)
+
+
 class _TriggerModalMixin:
     @staticmethod
-    def is_valid_regex(pattern: str) -> bool:
-        try:
-            re.compile(pattern)
-        except re.error:
-            return False
+    def get_pattern_label(is_regex: bool, is_whole_word: bool) -> str:
+        if is_regex:
+            return "Trigger regex pattern"
+        elif is_whole_word:
+            return "Trigger whole word pattern"
         else:
-            return True
+            return "Trigger pattern"
 
-    def is_valid_emoji(self, emoji_str: str) -> bool:
-        if emoji.is_emoji(emoji_str):
-            return True
-
-        if m := re.search(r"<a?:\w+:(\d+)>", emoji_str):
-            emoji_id = int(m[1])
-            return bool(discord.utils.get(self.bot.emojis, id=emoji_id))
+    @staticmethod
+    def is_valid_regex(pattern: str) -> bool:
+        return is_valid_regex(pattern)
 
-        return False
+    def is_valid_emoji(self, emoji_str: str) -> bool:
+        return is_valid_emoji(self.bot, emoji_str)
 
     async def get_input(
         self, interaction: Interaction
@@ -55,6 +67,20 @@ class _TriggerModalMixin:
                     "Invalid regex, failed to add trigger.", ephemeral=True
                 )
                 return
+        elif self.is_whole_word:
+            patterns = [
+                pattern.strip() for pattern in self.children[0].value.lower().split(",")
+            ]
+            if not all(tokenize(pattern) for pattern in patterns):
+                logger.info(
+                    "%s submitted whole word trigger without any words, doing nothing.",
+                    interaction.user.name,
+                )
+                await interaction.respond(
+                    "Whole word patterns must contain at least one word, failed to add trigger.",
+                    ephemeral=True,
+                )
+                return
         else:
             patterns = self.children[0].value.lower().split(",")
 
@@ -88,6 +114,8 @@ class AddTriggerModal(Modal, _TriggerModalMixin):
         is_regex: bool,
         response_type: TriggerResponseType,
         bot: Bot,
+        is_whole_word: bool = False,
+        scope_id: int | None = None,
         **kwargs: Dict[str, Any],
     ) -> None:
         super().__init__(*args, **kwargs)
@@ -95,9 +123,11 @@ class AddTriggerModal(Modal, _TriggerModalMixin):
         self.bot = bot
 
         self.is_regex = is_regex
-        pattern_label = "Trigger {}pattern".format("regex " if is_regex else "")
+        self.is_whole_word = is_whole_word
+        pattern_label = self.get_pattern_label(is_regex, is_whole_word)
 
         self.response_type = response_type
+        self.scope_id = scope_id
 
         self.add_item(InputText(label=pattern_label, style=InputTextStyle.long))
         self.add_item(InputText(label="Response(s)", style=InputTextStyle.long))
@@ -110,7 +140,11 @@ class AddTriggerModal(Modal, _TriggerModalMixin):
         async with Session.begin() as session:
             result = await session.execute(
                 insert(trigger_group)
-                .values(owner=owner, response_type=self.response_type)
+                .values(
+                    owner=owner,
+                    response_type=self.response_type,
+                    scope_id=self.scope_id,
+                )
                 .returning(trigger_group.c.id)
             )
             group_id: int = result.scalar_one()
@@ -122,6 +156,7 @@ class AddTriggerModal(Modal, _TriggerModalMixin):
                         "pattern": pattern,
                         "group_id": group_id,
                         "is_regex": self.is_regex,
+                        "is_whole_word": self.is_whole_word,
                     }
                     for pattern in patterns
                 ],
@@ -136,6 +171,11 @@ class AddTriggerModal(Modal, _TriggerModalMixin):
                     for response in responses
                 ],
             )
+            await notify(
+                session,
+                TriggerSettings.notify_channel,
+                {"action": "upsert", "group_id": group_id},
+            )
         logger.info("Added trigger to db with group_id=%s", group_id)
 
         return group_id
@@ -162,8 +202,10 @@ class AddTriggerModal(Modal, _TriggerModalMixin):
             patterns=patterns,
             responses=responses,
             is_regex=self.is_regex,
+            is_whole_word=self.is_whole_word,
             response_type=self.response_type,
             group_id=group_id,
+            scope_id=self.scope_id,
         )
 
         await interaction.respond("Successfully added trigger", ephemeral=True)
@@ -179,6 +221,7 @@ class EditTriggerModal(Modal, _TriggerModalMixin):
         response_type: TriggerResponseType,
         group_id: int,
         bot: Bot,
+        is_whole_word: bool = False,
         **kwargs: Dict[str, Any],
     ) -> None:
         super().__init__(*args, **kwargs)
@@ -186,7 +229,8 @@ class EditTriggerModal(Modal, _TriggerModalMixin):
         self.bot = bot
 
         self.is_regex = is_regex
-        pattern_label = "Trigger {}pattern".format("regex " if is_regex else "")
+        self.is_whole_word = is_whole_word
+        pattern_label = self.get_pattern_label(is_regex, is_whole_word)
 
         self.response_type = response_type
 
@@ -232,6 +276,7 @@ class EditTriggerModal(Modal, _TriggerModalMixin):
                         "pattern": pattern,
                         "group_id": self.group_id,
                         "is_regex": self.is_regex,
+                        "is_whole_word": self.is_whole_word,
                     }
                     for pattern in new_patterns
                 ],
@@ -252,6 +297,11 @@ class EditTriggerModal(Modal, _TriggerModalMixin):
                 .where(trigger_group.c.id == self.group_id)
                 .values(updated_at=func.now())
             )
+            await notify(
+                session,
+                TriggerSettings.notify_channel,
+                {"action": "upsert", "group_id": self.group_id},
+            )
 
     async def callback(self, interaction: Interaction):
         logger.debug(
@@ -275,6 +325,7 @@ class EditTriggerModal(Modal, _TriggerModalMixin):
             new_patterns=patterns,
             new_responses=responses,
             is_regex=self.is_regex,
+            is_whole_word=self.is_whole_word,
             response_type=self.response_type,
             group_id=self.group_id,
         )
@@ -7,7 +7,14 @@ import pytest_asyncio
 from sqlalchemy import Integer, Text
 
 from pzsd_bot.db import Session, engine
-from pzsd_bot.model import metadata, pzsd_user
+from pzsd_bot.model import (
+    TriggerResponseType,
+    metadata,
+    pzsd_user,
+    trigger_group,
+    trigger_pattern,
+    trigger_response,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -113,6 +120,56 @@ async def seed_users():
         await session.execute(pzsd_user.insert().values(test_users))
 
 
+@pytest_asyncio.fixture(scope="function")
+async def seed_triggers():
+    """Seed the test database with triggers."""
+    async with Session.begin() as session:
+        await session.execute(
+            trigger_group.insert().values(
+                [
+                    {
+                        "id": 1,
+                        "owner": 1,
+                        "response_type": TriggerResponseType.standard,
+                        "is_active": True,
+                    },
+                    {
+                        "id": 2,
+                        "owner": 1,
+                        "response_type": TriggerResponseType.reply,
+                        "is_active": True,
+                    },
+                    {
+                        "id": 3,
+                        "owner": 2,
+                        "response_type": TriggerResponseType.standard,
+                        "is_active": False,
+                    },
+                ]
+            )
+        )
+        await session.execute(
+            trigger_pattern.insert().values(
+                [
+                    {"group_id": 1, "pattern": "cat", "is_regex": False},
+                    {"group_id": 1, "pattern": "kitty", "is_regex": False},
+                    {"group_id": 2, "pattern": r"\bdogs?\b", "is_regex": True},
+                    {"group_id": 3, "pattern": "bird", "is_regex": False},
+                ]
+            )
+        )
+        await session.execute(
+            trigger_response.insert().values(
+                [
+                    {"group_id": 1, "response": "meow"},
+                    {"group_id": 1, "response": "purr"},
+                    {"group_id": 2, "response": "woof"},
+                    {"group_id": 3, "response": "tweet"},
+                ]
+            )
+        )
+
+
 @pytest.fixture
 def mock_bot():
     mock_bot = MagicMock()
@@ -0,0 +1,537 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import discord
+import pendulum
+import pytest
+import pytest_asyncio
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from sqlalchemy import select
+
+from pzsd_bot.cogs.advent_of_code.leaderboard import (
+    AOC_GENESIS,
+    AOCLeaderboards,
+    MemberScore,
+    NewStar,
+    StarCompletion,
+    StarTracker,
+)
+from pzsd_bot.db import Session
+from pzsd_bot.model import aoc_leaderboard
+from pzsd_bot.settings import AOCSettings
+
+LEADERBOARD = {
+    "num_days": 12,
+    "event": "2025",
+    "day1_ts": 0,
+    "owner_id": 1,
+    "members": {
+        "1": {
+            "id": 1,
+            "name": "fisken",
+            "stars": 2,
+            "local_score": 50,
+            "last_star_ts": 0,
+            "completion_day_level": {
+                "1": {
+                    "1": {"get_star_ts": 100, "star_index": 0},
+                    "2": {"get_star_ts": 300, "star_index": 2},
+                },
+            },
+        },
+        "2": {
+            "id": 2,
+            "name": None,
+            "stars": 2,
+            "local_score": 20,
+            "last_star_ts": 0,
+            "completion_day_level": {
+                "1": {"1": {"get_star_ts": 200, "star_index": 1}},
+                "2": {"1": {"get_star_ts": 400, "star_index": 3}},
+            },
+        },
+    },
+}
+MEMBERS = (MemberScore(50, 2, "fisken"), MemberScore(20, 2, "2"))
+ETAG = '"v1"'
+# the current year, since past years are served from the archive
+YEAR = pendulum.today().year
+
+
+@pytest_asyncio.fixture
+async def aoc_server():
+    upstream = SimpleNamespace(
+        requests=[], status=200, leaderboard=LEADERBOARD, etag=ETAG
+    )
+
+    async def handle_leaderboard(request: web.Request) -> web.Response:
+        upstream.requests.append(request)
+        if upstream.status != 200:
+            return web.Response(status=upstream.status)
+        if request.headers.get("If-None-Match") == upstream.etag:
+            return web.Response(status=304)
+        return web.json_response(upstream.leaderboard, headers={"ETag": upstream.etag})
+
+    app = web.Application()
+    app.router.add_get(
+        f"/{{year}}/{AOCSettings.private_leaderboard_path}.json", handle_leaderboard
+    )
+
+    async with TestServer(app) as server:
+        base_url = str(server.make_url("")).rstrip("/")
+        with patch.object(AOCSettings, "base_url", base_url):
+            yield upstream
+
+
+@pytest_asyncio.fixture
+async def aoc_cog(aoc_server: SimpleNamespace, mock_bot: MagicMock):
+    async with ClientSession() as session:
+        mock_bot.client.session = session
+        mock_bot.client.start = AsyncMock()
+        mock_bot.wait_until_ready = AsyncMock()
+        aoc_cog = AOCLeaderboards(mock_bot)
+        yield aoc_cog
+        aoc_cog.cog_unload()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_leaderboard_isnt_downloaded_again(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    first = await aoc_cog.fetch_leaderboard(YEAR)
+    first_fetched = first["last_fetched"]
+    second = await aoc_cog.fetch_leaderboard(YEAR)
+
+    assert second["members"] == MEMBERS
+    assert second["last_fetched"] > first_fetched
+    assert [
+        request.headers.get("If-None-Match") for request in aoc_server.requests
+    ] == [
+        None,
+        ETAG,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stale_leaderboard_is_served_while_refreshing(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    stale_fetched = pendulum.now().subtract(days=1)
+    aoc_cog.cached_leaderboards[YEAR] = {
+        "members": MEMBERS,
+        "last_fetched": stale_fetched,
+        "etag": ETAG,
+        "last_modified": None,
+    }
+    ctx = AsyncMock()
+
+    await aoc_cog.leaderboard.callback(aoc_cog, ctx, YEAR)
+
+    ctx.defer.assert_not_awaited()
+    embed = ctx.respond.await_args.kwargs["embed"]
+    assert embed.timestamp == stale_fetched
+    assert embed.footer.text.startswith("Refreshing")
+
+    await aoc_cog.fetches[YEAR]
+
+    assert aoc_cog.cached_leaderboards[YEAR]["last_fetched"] > stale_fetched
+    assert not aoc_cog.is_stale(YEAR)
+    assert len(aoc_server.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_day_index_is_only_kept_for_enabled_years(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    await aoc_cog.fetch_leaderboard(YEAR)
+    assert YEAR not in aoc_cog.day_indexes
+
+    aoc_cog.enable_day_index(YEAR)
+    await aoc_cog.fetch_leaderboard(YEAR)
+
+    # the cached leaderboard's validators aren't sent since
+    # the index can't be built from a 304 response
+    assert aoc_server.requests[1].headers.get("If-None-Match") is None
+    assert aoc_cog.day_indexes[YEAR] == {
+        1: (
+            StarCompletion(member_id=1, star=1, get_star_ts=100),
+            StarCompletion(member_id=2, star=1, get_star_ts=200),
+            StarCompletion(member_id=1, star=2, get_star_ts=300),
+        ),
+        2: (StarCompletion(member_id=2, star=1, get_star_ts=400),),
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_share_one_request(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    results = await asyncio.gather(
+        *(aoc_cog.fetch_leaderboard(YEAR) for _ in range(10))
+    )
+
+    assert len(aoc_server.requests) == 1
+    assert all(result is results[0] for result in results)
+    assert results[0]["members"] == MEMBERS
+    assert not aoc_cog.fetches
+
+
+@pytest.mark.asyncio
+async def test_background_fetch_errors_are_logged(aoc_cog: AOCLeaderboards):
+    with (
+        patch.object(
+            aoc_cog, "_fetch_leaderboard", AsyncMock(side_effect=RuntimeError)
+        ),
+        patch("pzsd_bot.cogs.advent_of_code.leaderboard.logger") as mock_logger,
+    ):
+        task = aoc_cog.start_fetch(YEAR)
+        await asyncio.wait([task])
+
+    mock_logger.error.assert_called_once()
+    assert mock_logger.error.call_args.kwargs["exc_info"] is task.exception()
+    assert not aoc_cog.fetches
+
+
+@pytest.mark.asyncio
+async def test_concurrent_invocations_share_a_failed_fetch(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    aoc_server.status = 502
+    contexts = [AsyncMock() for _ in range(5)]
+
+    with patch("pzsd_bot.client.sleep", AsyncMock()):
+        await asyncio.gather(
+            *(aoc_cog.leaderboard.callback(aoc_cog, ctx, YEAR) for ctx in contexts)
+        )
+
+    # a single fetch, retried by the client's middleware
+    assert len(aoc_server.requests) == 3
+    for ctx in contexts:
+        ctx.followup.send.assert_awaited_once_with(
+            "Unable to fetch leaderboard, please try again later."
+        )
+
+    aoc_server.status = 200
+    assert await aoc_cog.fetch_leaderboard(YEAR) is not None
+    assert len(aoc_server.requests) == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_fetch_isnt_retried_on_every_invocation(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    aoc_server.status = 502
+
+    with patch("pzsd_bot.client.sleep", AsyncMock()):
+        await aoc_cog.leaderboard.callback(aoc_cog, AsyncMock(), YEAR)
+        ctx = AsyncMock()
+        await aoc_cog.leaderboard.callback(aoc_cog, ctx, YEAR)
+
+    assert len(aoc_server.requests) == 3
+    ctx.defer.assert_not_awaited()
+    ctx.respond.assert_awaited_once_with(
+        "Unable to fetch leaderboard, please try again later."
+    )
+
+
+@pytest.mark.asyncio
+async def test_stale_leaderboard_isnt_refreshed_again_after_failing(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    aoc_server.status = 502
+    aoc_cog.cached_leaderboards[YEAR] = {
+        "members": MEMBERS,
+        "last_fetched": pendulum.now().subtract(days=1),
+        "etag": ETAG,
+        "last_modified": None,
+    }
+
+    with patch("pzsd_bot.client.sleep", AsyncMock()):
+        await aoc_cog.leaderboard.callback(aoc_cog, AsyncMock(), YEAR)
+        await aoc_cog.fetches[YEAR]
+        ctx = AsyncMock()
+        await aoc_cog.leaderboard.callback(aoc_cog, ctx, YEAR)
+
+    # still served from the cache, without requesting it again
+    assert len(aoc_server.requests) == 3
+    assert YEAR not in aoc_cog.fetches
+    embed = ctx.respond.await_args.kwargs["embed"]
+    assert not embed.footer.text.startswith("Refreshing")
+
+    # and refreshed again once the TTL has passed since the failed attempt
+    aoc_server.status = 200
+    aoc_cog.last_attempts[YEAR] = pendulum.now().subtract(days=1)
+    await aoc_cog.leaderboard.callback(aoc_cog, AsyncMock(), YEAR)
+    await aoc_cog.fetches[YEAR]
+    assert len(aoc_server.requests) == 4
+    assert not aoc_cog.is_stale(YEAR)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_fetches_when_stale_during_event(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards, mock_bot: MagicMock
+):
+    mock_bot.get_cog.return_value = MagicMock(event_active=True)
+    year = pendulum.today().year
+
+    with patch.object(aoc_cog, "schedule_prefetch") as mock_schedule_prefetch:
+        await aoc_cog.prefetch_leaderboard()
+        await aoc_cog.prefetch_leaderboard()
+
+    # the second prefetch found the leaderboard fresh
+    assert len(aoc_server.requests) == 1
+    assert aoc_server.requests[0].headers["User-Agent"] == AOCSettings.user_agent
+
+    goes_stale_at = aoc_cog.cached_leaderboards[year]["last_fetched"].add(minutes=15)
+    assert mock_schedule_prefetch.call_args_list == [
+        call(goes_stale_at),
+        call(goes_stale_at),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_stops_once_event_is_inactive(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards, mock_bot: MagicMock
+):
+    mock_bot.get_cog.return_value = MagicMock(event_active=False)
+
+    with patch.object(aoc_cog, "schedule_prefetch") as mock_schedule_prefetch:
+        await aoc_cog.prefetch_leaderboard()
+
+    assert not aoc_server.requests
+    mock_schedule_prefetch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_retries_after_failed_fetch(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards, mock_bot: MagicMock
+):
+    mock_bot.get_cog.return_value = MagicMock(event_active=True)
+    aoc_server.status = 502
+
+    with (
+        patch("pzsd_bot.client.sleep", AsyncMock()),
+        patch.object(aoc_cog, "schedule_prefetch") as mock_schedule_prefetch,
+    ):
+        before = pendulum.now()
+        await aoc_cog.prefetch_leaderboard()
+
+    (run_at,) = mock_schedule_prefetch.call_args.args
+    assert run_at >= before.add(minutes=15)
+
+
+@pytest.mark.asyncio
+async def test_finished_year_is_archived(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards, mock_bot: MagicMock
+):
+    await aoc_cog.fetch_leaderboard(YEAR - 1)
+    await aoc_cog.fetch_leaderboard(YEAR)
+
+    async with Session.begin() as session:
+        result = await session.execute(
+            select(aoc_leaderboard.c.year, aoc_leaderboard.c.leaderboard)
+        )
+        assert result.all() == [(YEAR - 1, LEADERBOARD)]
+
+    # a restarted bot loads it from the archive and never refetches it
+    restarted_cog = AOCLeaderboards(mock_bot)
+    cached = await restarted_cog.fetch_leaderboard(YEAR - 1)
+
+    assert cached["members"] == MEMBERS
+    assert not restarted_cog.is_stale(YEAR - 1)
+    assert len(aoc_server.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_year_cached_while_current_is_archived_once_finished(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    await aoc_cog.fetch_leaderboard(YEAR)
+
+    # the year rolled over
+    with patch.object(aoc_cog, "is_finished", return_value=True):
+        await aoc_cog.fetch_leaderboard(YEAR)
+
+    # the full response is needed to archive it
+    assert [r.headers.get("If-None-Match") for r in aoc_server.requests] == [
+        None,
+        None,
+    ]
+    async with Session.begin() as session:
+        result = await session.execute(select(aoc_leaderboard.c.year))
+        assert result.scalars().all() == [YEAR]
+    assert YEAR in aoc_cog.archived_years
+
+
+@pytest.mark.asyncio
+async def test_backfill_archive_retries_years_that_failed_to_archive(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    with patch.object(aoc_cog, "archive", AsyncMock(side_effect=RuntimeError)):
+        with pytest.raises(RuntimeError):
+            await aoc_cog.fetch_leaderboard(YEAR - 1)
+
+        with patch.object(AOCSettings, "archive_backfill_interval_seconds", 0):
+            archived, failed = await aoc_cog.backfill_archive()
+
+    # fetched, but not archived
+    assert archived == []
+    assert failed == list(range(AOC_GENESIS, YEAR))
+
+    with patch.object(AOCSettings, "archive_backfill_interval_seconds", 0):
+        archived, failed = await aoc_cog.backfill_archive()
+
+    assert archived == list(range(AOC_GENESIS, YEAR))
+    assert not failed
+    assert all(
+        "If-None-Match" not in request.headers for request in aoc_server.requests
+    )
+
+
+@pytest.mark.asyncio
+async def test_backfill_archive_skips_archived_years(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    await aoc_cog.fetch_leaderboard(AOC_GENESIS)
+
+    with patch.object(AOCSettings, "archive_backfill_interval_seconds", 0):
+        archived, failed = await aoc_cog.backfill_archive()
+
+    assert archived == list(range(AOC_GENESIS + 1, YEAR))
+    assert not failed
+    assert len(aoc_server.requests) == YEAR - AOC_GENESIS
+
+    with patch.object(AOCSettings, "archive_backfill_interval_seconds", 0):
+        assert await aoc_cog.backfill_archive() == ([], [])
+
+
+@pytest.mark.asyncio
+async def test_backfill_archive_waits_between_requests(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards
+):
+    with patch(
+        "pzsd_bot.cogs.advent_of_code.leaderboard.asyncio.sleep", AsyncMock()
+    ) as mock_sleep:
+        await aoc_cog.backfill_archive()
+
+    assert mock_sleep.await_count == YEAR - AOC_GENESIS - 1
+    mock_sleep.assert_awaited_with(AOCSettings.archive_backfill_interval_seconds)
+
+
+def earn_star(leaderboard: dict, member_id: str, day: int, star: int, ts: int):
+    member = leaderboard["members"][member_id]
+    member["completion_day_level"].setdefault(str(day), {})[str(star)] = {
+        "get_star_ts": ts,
+        "star_index": 0,
+    }
+    member["stars"] += 1
+
+
+def test_star_tracker_finds_new_stars():
+    tracker = StarTracker()
+    leaderboard = copy.deepcopy(LEADERBOARD)
+
+    assert tracker.update(leaderboard) == []
+
+    earn_star(leaderboard, "2", 2, 2, 600)
+    earn_star(leaderboard, "1", 2, 1, 500)
+    leaderboard["members"]["3"] = {
+        "id": 3,
+        "name": "new",
+        "stars": 1,
+        "local_score": 1,
+        "last_star_ts": 0,
+        "completion_day_level": {"1": {"1": {"get_star_ts": 550, "star_index": 4}}},
+    }
+
+    # stars of members who only just showed up aren't announced
+    assert tracker.update(leaderboard) == [
+        NewStar(name="fisken", day=2, star=1, get_star_ts=500),
+        NewStar(name="2", day=2, star=2, get_star_ts=600),
+    ]
+    assert tracker.update(leaderboard) == []
+
+    earn_star(leaderboard, "3", 1, 2, 700)
+    assert tracker.update(leaderboard) == [
+        NewStar(name="new", day=1, star=2, get_star_ts=700)
+    ]
+
+
+def test_star_tracker_skips_members_with_unchanged_star_counts():
+    tracker = StarTracker()
+    leaderboard = copy.deepcopy(LEADERBOARD)
+    tracker.update(leaderboard)
+
+    # completions aren't looked at when the count is the same
+    leaderboard["members"]["2"]["completion_day_level"] = None
+
+    assert tracker.update(leaderboard) == []
+
+
+@pytest.mark.asyncio
+async def test_new_stars_are_announced_in_one_message(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards, mock_bot: MagicMock
+):
+    mock_bot.get_cog.return_value = MagicMock(event_active=True)
+    aoc_channel = mock_bot.get_channel.return_value
+
+    await aoc_cog.fetch_leaderboard(YEAR)
+    # nothing changed
+    await aoc_cog.fetch_leaderboard(YEAR)
+    await asyncio.gather(*aoc_cog.announcements)
+    aoc_channel.send.assert_not_awaited()
+
+    aoc_server.leaderboard = copy.deepcopy(LEADERBOARD)
+    aoc_server.etag = '"v2"'
+    earn_star(aoc_server.leaderboard, "1", 2, 1, 500)
+    earn_star(aoc_server.leaderboard, "2", 2, 2, 600)
+    await aoc_cog.fetch_leaderboard(YEAR)
+    await asyncio.gather(*aoc_cog.announcements)
+
+    aoc_channel.send.assert_awaited_once_with(
+        "⭐ **fisken** got the silver star for day 2\n"
+        "⭐ **2** got the gold star for day 2"
+    )
+
+
+@pytest.mark.asyncio
+async def test_failed_announcement_doesnt_fail_the_fetch(
+    aoc_server: SimpleNamespace, aoc_cog: AOCLeaderboards, mock_bot: MagicMock
+):
+    mock_bot.get_cog.return_value = MagicMock(event_active=True)
+    aoc_channel = mock_bot.get_channel.return_value
+    aoc_channel.send.side_effect = discord.HTTPException(MagicMock(), "")
+
+    await aoc_cog.fetch_leaderboard(YEAR)
+    aoc_server.leaderboard = copy.deepcopy(LEADERBOARD)
+    aoc_server.etag = '"v2"'
+    earn_star(aoc_server.leaderboard, "1", 2, 1, 500)
+
+    with patch("pzsd_bot.cogs.advent_of_code.leaderboard.logger") as mock_logger:
+        cached = await aoc_cog.fetch_leaderboard(YEAR)
+        await asyncio.gather(*aoc_cog.announcements, return_exceptions=True)
+
+    assert cached["members"][0].stars == 3
+    aoc_channel.send.assert_awaited_once()
+    mock_logger.error.assert_called_once()
+    assert not aoc_cog.announcements
+
+
+def test_announcement_is_truncated():
+    new_stars = [NewStar("fisken", day, 1, day) for day in range(1, 26)]
+
+    lines = AOCLeaderboards.format_new_stars(new_stars).splitlines()
+
+    assert len(lines) == 21
+    assert lines[-1] == "...and 5 more!"
+
+
+def test_cache_ttl_respects_minimum_fetch_interval():
+    with patch.object(AOCSettings, "leaderboard_cache_ttl_minutes", 1):
+        assert AOCLeaderboards.cache_ttl() == pendulum.duration(minutes=15)
+
+    with patch.object(AOCSettings, "leaderboard_cache_ttl_minutes", 30):
+        assert AOCLeaderboards.cache_ttl() == pendulum.duration(minutes=30)
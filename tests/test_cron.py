@@ -0,0 +1,81 @@
+import pendulum
+import pytest
+
+from pzsd_bot.ext.cron import parse_cron
+
+
+@pytest.mark.parametrize(
+    "expression,after,expected",
+    [
+        ("0 16 * * fri", "2026-10-19T12:00", "2026-10-23T16:00"),
+        ("0 16 * * fri", "2026-10-23T16:00", "2026-10-30T16:00"),
+        ("0 16 * * 5", "2026-10-23T15:59:30", "2026-10-23T16:00"),
+        ("*/15 * * * *", "2026-01-01T00:07:30", "2026-01-01T00:15"),
+        ("5/20 * * * *", "2026-01-01T00:26", "2026-01-01T00:45"),
+        ("0 9-17/4 * * mon-fri", "2026-10-23T17:30", "2026-10-26T09:00"),
+        ("0 0 1-12 dec *", "2026-10-19T00:00", "2026-12-01T00:00"),
+        ("0 0 1-12 dec *", "2026-12-12T00:00", "2027-12-01T00:00"),
+        ("0 0 31 * *", "2026-04-01T00:00", "2026-05-31T00:00"),
+        ("0 0 29 2 *", "2026-01-01T00:00", "2028-02-29T00:00"),
+        # either day field matches when both are restricted
+        ("0 0 13 * fri", "2026-10-19T00:00", "2026-10-23T00:00"),
+        ("0 0 * * 7", "2026-10-19T00:00", "2026-10-25T00:00"),
+        ("@daily", "2026-10-19T05:00", "2026-10-20T00:00"),
+    ],
+)
+def test_next_after(expression: str, after: str, expected: str):
+    cron = parse_cron(expression)
+    assert cron.next_after(pendulum.parse(after)) == pendulum.parse(expected)
+
+
+def test_next_after_in_timezone():
+    cron = parse_cron("0 16 * * fri", "America/New_York")
+    run_at = cron.next_after(pendulum.datetime(2026, 10, 19, 12))
+
+    assert run_at == pendulum.datetime(2026, 10, 23, 16, tz="America/New_York")
+    assert run_at.timezone_name == "America/New_York"
+
+
+def test_next_after_across_dst():
+    cron = parse_cron("0 16 * * fri", "America/New_York")
+    run_at = pendulum.datetime(2026, 10, 30, 16, tz="America/New_York")
+
+    # still 4pm local time once DST ends
+    assert cron.next_after(run_at).utcoffset() != run_at.utcoffset()
+    assert cron.next_after(run_at).hour == 16
+
+
+def test_next_after_skipped_time_is_pushed_forward():
+    cron = parse_cron("30 2 * * *", "America/New_York")
+    run_at = cron.next_after(pendulum.datetime(2026, 3, 8, 0, tz="America/New_York"))
+
+    assert run_at == pendulum.datetime(2026, 3, 8, 3, 30, tz="America/New_York")
+
+
+def test_next_after_repeated_time_runs_once():
+    cron = parse_cron("30 1 * * *", "America/New_York")
+    first = cron.next_after(pendulum.datetime(2026, 11, 1, 0, tz="America/New_York"))
+    second = cron.next_after(first)
+
+    assert first.utcoffset() == pendulum.duration(hours=-4)
+    assert second == pendulum.datetime(2026, 11, 2, 1, 30, tz="America/New_York")
+
+
+def test_next_after_never_matches():
+    with pytest.raises(ValueError):
+        parse_cron("0 0 30 2 *").next_after(pendulum.datetime(2026, 1, 1))
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["", "* * * *", "60 * * * *", "* 24 * * *", "0 0 0 * *", "*/0 * * * *",
+     "5-1 * * * *", "0 0 * foo *", "-1 * * * *"],
+)  # fmt: skip
+def test_parse_cron_invalid(expression: str):
+    with pytest.raises(ValueError):
+        parse_cron(expression)
+
+
+def test_parse_cron_invalid_timezone():
+    with pytest.raises(pendulum.tz.exceptions.InvalidTimezone):
+        parse_cron("* * * * *", "Not/A_Timezone")
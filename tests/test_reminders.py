@@ -0,0 +1,453 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+import pendulum
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, insert, select
+
+from pzsd_bot.cogs.reminders.admin import RemindersAdmin
+from pzsd_bot.cogs.reminders.reminders import DeliveryResult, Reminders
+from pzsd_bot.db import Session
+from pzsd_bot.ext.channel_resolver import ChannelResolver
+from pzsd_bot.model import ReminderStatus, reminder
+from pzsd_bot.settings import Emoji, ReminderSettings
+
+
+def make_reminder(
+    reminder_id: int, remind_at: pendulum.DateTime, **kwargs: dict[str, Any]
+) -> dict:
+    return {
+        "id": reminder_id,
+        "owner": 1,
+        "channel_id": 100,
+        "original_message_id": 1000 + reminder_id,
+        "reminder_text": f"reminder {reminder_id}",
+        "remind_at": remind_at,
+        "is_recurring": False,
+        "recurrence_interval": None,
+        "status": ReminderStatus.pending,
+        **kwargs,
+    }
+
+
+@pytest_asyncio.fixture
+async def seed_reminders():
+    now = pendulum.now("UTC")
+    async with Session.begin() as session:
+        await session.execute(
+            insert(reminder).values(
+                [
+                    make_reminder(1, now.add(minutes=10)),
+                    make_reminder(2, now.add(hours=2)),
+                    make_reminder(3, now.add(days=30)),
+                    make_reminder(4, now.subtract(minutes=1)),
+                    make_reminder(5, now.add(minutes=5), status=ReminderStatus.failed),
+                ]
+            )
+        )
+
+
+@pytest_asyncio.fixture
+async def reminders_cog(seed_reminders: None, mock_bot: MagicMock):
+    # loaded explicitly by each test instead
+    with patch.object(Reminders, "load_reminders"):
+        reminders_cog = Reminders(mock_bot)
+    yield reminders_cog
+    reminders_cog.cog_unload()
+
+
+def scheduled_ids(reminders_cog: Reminders) -> set[str]:
+    return set(reminders_cog.scheduler._jobs)
+
+
+@pytest.mark.asyncio
+async def test_load_reminders_within_horizon(reminders_cog: Reminders):
+    with patch.object(reminders_cog, "queue_reminder") as mock_queue_reminder:
+        await reminders_cog.load_reminders()
+        await asyncio.sleep(0)
+
+        assert scheduled_ids(reminders_cog) == {"reminder_1", "reminder_refill"}
+        # overdue reminders are sent right away
+        mock_queue_reminder.assert_awaited_once()
+        assert mock_queue_reminder.await_args.args[0].id == 4
+
+
+@pytest.mark.asyncio
+async def test_refill_reminders_pages_in_next_window(reminders_cog: Reminders):
+    with patch.object(reminders_cog, "queue_reminder"):
+        await reminders_cog.load_reminders()
+        first_horizon_end = reminders_cog.horizon_end
+
+        with patch.object(ReminderSettings, "load_horizon", 3 * 60 * 60):
+            await reminders_cog.refill_reminders()
+
+        assert reminders_cog.horizon_end > first_horizon_end
+        assert "reminder_2" in scheduled_ids(reminders_cog)
+        assert "reminder_3" not in scheduled_ids(reminders_cog)
+
+
+@pytest.mark.asyncio
+async def test_is_within_horizon(reminders_cog: Reminders):
+    assert not reminders_cog.is_within_horizon(
+        SimpleNamespace(remind_at=pendulum.now("UTC"))
+    )
+
+    reminders_cog.horizon_end = pendulum.now("UTC").add(hours=1)
+
+    assert reminders_cog.is_within_horizon(
+        SimpleNamespace(remind_at=pendulum.now("UTC").add(minutes=30))
+    )
+    assert not reminders_cog.is_within_horizon(
+        SimpleNamespace(remind_at=pendulum.now("UTC").add(hours=2))
+    )
+
+
+@pytest.mark.parametrize(
+    "elapsed,expected_next,expected_missed",
+    [
+        (timedelta(hours=-1), timedelta(days=1), 0),
+        (timedelta(0), timedelta(days=1), 0),
+        (timedelta(hours=1), timedelta(days=1), 0),
+        (timedelta(days=1), timedelta(days=2), 1),
+        (timedelta(days=30, hours=5), timedelta(days=31), 30),
+    ],
+)
+def test_next_occurrence(
+    elapsed: timedelta, expected_next: timedelta, expected_missed: int
+):
+    remind_at = pendulum.datetime(2024, 1, 1, 9)
+    next_remind_at, missed = Reminders.next_occurrence(
+        remind_at, 24 * 60 * 60, remind_at + elapsed
+    )
+
+    assert next_remind_at == remind_at + expected_next
+    assert missed == expected_missed
+
+
+@pytest.mark.asyncio
+async def test_send_recurring_reminder_catches_up(
+    reminders_cog: Reminders, mock_bot: MagicMock
+):
+    remind_at = pendulum.now("UTC").subtract(days=10, hours=12)
+    async with Session.begin() as session:
+        result = await session.execute(
+            insert(reminder)
+            .values(
+                make_reminder(
+                    6,
+                    remind_at,
+                    is_recurring=True,
+                    recurrence_interval=24 * 60 * 60,
+                )
+            )
+            .returning(reminder)
+        )
+        reminder_data = result.one()
+
+    mock_channel = mock_bot.get_channel.return_value
+    mock_channel.get_partial_message = MagicMock()
+    mock_reply = mock_channel.get_partial_message.return_value.reply = AsyncMock()
+
+    with patch.object(reminders_cog, "reschedule_reminder") as mock_reschedule:
+        await reminders_cog.send_reminder(reminder_data)
+        await asyncio.sleep(0)
+
+    mock_reply.assert_awaited_once()
+    embed = mock_reply.await_args.kwargs["embed"]
+    assert embed.footer.text.startswith("Missed 10 earlier occurrences")
+
+    # advanced past now in a single step
+    mock_reschedule.assert_awaited_once()
+    rescheduled = mock_reschedule.await_args.args[0]
+    assert rescheduled.remind_at.replace(tzinfo=None) == (
+        remind_at.add(days=11).naive()
+    )
+
+
+@pytest.mark.asyncio
+async def test_due_reminders_are_delivered_in_a_batch(
+    reminders_cog: Reminders, mock_bot: MagicMock
+):
+    remind_at = pendulum.now("UTC").subtract(minutes=1)
+    async with Session.begin() as session:
+        await session.execute(delete(reminder))
+        result = await session.execute(
+            insert(reminder)
+            .values(
+                [
+                    make_reminder(1, remind_at),
+                    make_reminder(2, remind_at, owner=2),
+                    make_reminder(
+                        3, remind_at, is_recurring=True, recurrence_interval=60 * 60
+                    ),
+                    make_reminder(4, remind_at, channel_id=200),
+                ]
+            )
+            .returning(reminder)
+        )
+        due_reminders = result.all()
+
+    mock_channel = MagicMock()
+    mock_channel.send = AsyncMock()
+    mock_bot.get_channel.side_effect = lambda channel_id: (
+        mock_channel if channel_id == 100 else None
+    )
+    mock_bot.fetch_channel = AsyncMock(side_effect=discord.NotFound(MagicMock(), ""))
+
+    with (
+        patch.object(ReminderSettings, "delivery_window", 0),
+        patch.object(reminders_cog, "reschedule_reminder") as mock_reschedule,
+    ):
+        for reminder_data in due_reminders:
+            await reminders_cog.queue_reminder(reminder_data)
+        await reminders_cog.delivery_task
+        await asyncio.sleep(0)
+
+    mock_channel.send.assert_awaited_once()
+    assert mock_channel.send.await_args.args[0] == (
+        "Here are your reminders <@1> <@2>:"
+    )
+    assert len(mock_channel.send.await_args.kwargs["embeds"]) == 3
+
+    async with Session.begin() as session:
+        result = await session.execute(select(reminder).order_by(reminder.c.id))
+        remaining = result.all()
+
+    assert [(r.id, r.status) for r in remaining] == [
+        (3, ReminderStatus.pending),
+        (4, ReminderStatus.failed),
+    ]
+    mock_reschedule.assert_awaited_once()
+    assert mock_reschedule.await_args.args[0].id == 3
+
+
+@pytest.mark.asyncio
+async def test_create_reminder_enforces_max_reminders(
+    reminders_cog: Reminders, mock_bot: MagicMock
+):
+    async with Session.begin() as session:
+        await session.execute(delete(reminder))
+
+    def make_message(message_id: int) -> MagicMock:
+        mock_message = MagicMock(spec=discord.Message)
+        mock_message.id = message_id
+        mock_message.author = MagicMock(id=1)
+        mock_message.channel = MagicMock(id=100)
+        mock_message.content = "remind me in 1 day to water the plants"
+        return mock_message
+
+    messages = [make_message(message_id) for message_id in range(3)]
+    with patch.object(ReminderSettings, "max_reminders", 2):
+        for mock_message in messages:
+            await reminders_cog.on_message(mock_message)
+
+    messages[0].add_reaction.assert_awaited_once_with(Emoji.check_mark)
+    messages[1].add_reaction.assert_awaited_once_with(Emoji.check_mark)
+    messages[2].add_reaction.assert_awaited_once_with(Emoji.nopers)
+
+    async with Session.begin() as session:
+        result = await session.execute(select(reminder))
+        reminders = result.all()
+
+    assert [r.original_message_id for r in reminders] == [0, 1]
+    assert all(r.status is ReminderStatus.pending for r in reminders)
+    assert reminders[0].reminder_text == "water the plants"
+
+
+@pytest.mark.asyncio
+async def test_channel_resolver_caches_hits_and_misses(mock_bot: MagicMock):
+    now = 0
+    mock_channel = MagicMock(id=100)
+    mock_bot.get_channel.return_value = None
+
+    async def fetch_channel(channel_id: int) -> MagicMock:
+        if channel_id != 100:
+            raise discord.Forbidden(MagicMock(), "")
+        return mock_channel
+
+    mock_bot.fetch_channel = AsyncMock(side_effect=fetch_channel)
+    resolver = ChannelResolver(mock_bot, ttl=60, negative_ttl=10, clock=lambda: now)
+
+    assert await resolver.resolve(100) is mock_channel
+    assert await resolver.resolve(100) is mock_channel
+    assert await resolver.resolve(200) is None
+    assert await resolver.resolve(200) is None
+    assert mock_bot.fetch_channel.await_count == 2
+
+    # misses expire sooner than hits
+    now = 30
+    assert await resolver.resolve(100) is mock_channel
+    assert await resolver.resolve(200) is None
+    assert mock_bot.fetch_channel.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_channel_resolver_raises_transient_errors(mock_bot: MagicMock):
+    mock_bot.get_channel.return_value = None
+    mock_bot.fetch_channel = AsyncMock(
+        side_effect=discord.DiscordServerError(MagicMock(status=503), "")
+    )
+    resolver = ChannelResolver(mock_bot, ttl=60, negative_ttl=10)
+
+    with pytest.raises(discord.DiscordServerError):
+        await resolver.resolve(100)
+
+    assert len(resolver) == 0
+
+
+@pytest.mark.asyncio
+async def test_transient_delivery_failures_are_retried(
+    reminders_cog: Reminders, mock_bot: MagicMock
+):
+    remind_at = pendulum.now("UTC").subtract(minutes=1)
+    async with Session.begin() as session:
+        await session.execute(delete(reminder))
+        result = await session.execute(
+            insert(reminder).values(make_reminder(1, remind_at)).returning(reminder)
+        )
+        reminder_data = result.one()
+
+    mock_channel = mock_bot.get_channel.return_value
+    mock_channel.get_partial_message = MagicMock()
+    mock_reply = mock_channel.get_partial_message.return_value.reply = AsyncMock(
+        side_effect=discord.DiscordServerError(MagicMock(status=503), "")
+    )
+
+    with (
+        patch.object(ReminderSettings, "delivery_max_attempts", 3),
+        patch.object(reminders_cog.scheduler, "schedule") as mock_schedule,
+    ):
+        for attempt in range(3):
+            await reminders_cog.send_reminder(reminder_data)
+
+            async with Session.begin() as session:
+                result = await session.execute(select(reminder.c.status))
+                status = result.scalar_one()
+
+            if attempt < 2:
+                assert status is ReminderStatus.pending
+                assert reminders_cog.delivery_attempts[1] == attempt + 1
+            else:
+                assert status is ReminderStatus.failed
+                assert 1 not in reminders_cog.delivery_attempts
+
+    assert mock_reply.await_count == 3
+    assert mock_schedule.call_count == 2
+    first_retry, second_retry = (
+        call.kwargs["run_at"] for call in mock_schedule.call_args_list
+    )
+    # backoff doubles each attempt
+    assert (second_retry - first_retry).in_seconds() >= (
+        ReminderSettings.delivery_retry_delay * 0.9
+    )
+
+
+async def insert_due_reminders(*reminders: dict) -> list:
+    async with Session.begin() as session:
+        await session.execute(delete(reminder))
+        result = await session.execute(
+            insert(reminder).values(list(reminders)).returning(reminder)
+        )
+        return result.all()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_channel_error_only_retries_that_channel(
+    reminders_cog: Reminders,
+):
+    remind_at = pendulum.now("UTC").subtract(minutes=1)
+    due_reminders = await insert_due_reminders(
+        make_reminder(1, remind_at), make_reminder(2, remind_at, channel_id=200)
+    )
+
+    async def deliver_to_channel(
+        channel_id: int, reminders: list, missed: dict[int, int]
+    ) -> dict[int, DeliveryResult]:
+        if channel_id == 200:
+            raise RuntimeError("unexpected")
+        return dict.fromkeys((r.id for r in reminders), DeliveryResult.sent)
+
+    with (
+        patch.object(reminders_cog, "deliver_to_channel", deliver_to_channel),
+        patch.object(reminders_cog, "schedule_retry") as mock_schedule_retry,
+    ):
+        await reminders_cog.send_reminders(due_reminders)
+
+    async with Session.begin() as session:
+        result = await session.execute(select(reminder.c.id))
+        assert result.scalars().all() == [2]
+
+    mock_schedule_retry.assert_called_once_with(due_reminders[1])
+
+
+@pytest.mark.asyncio
+async def test_failed_db_update_retries_batch(reminders_cog: Reminders):
+    remind_at = pendulum.now("UTC").subtract(minutes=1)
+    due_reminders = await insert_due_reminders(
+        make_reminder(1, remind_at), make_reminder(2, remind_at)
+    )
+
+    with (
+        patch.object(ReminderSettings, "delivery_window", 0),
+        patch.object(
+            reminders_cog,
+            "deliver_to_channel",
+            AsyncMock(return_value=dict.fromkeys((1, 2), DeliveryResult.sent)),
+        ),
+        patch.object(
+            reminders_cog, "finish_reminders", AsyncMock(side_effect=RuntimeError)
+        ),
+        patch.object(reminders_cog, "schedule_retry") as mock_schedule_retry,
+    ):
+        for reminder_data in due_reminders:
+            await reminders_cog.queue_reminder(reminder_data)
+        await reminders_cog.delivery_task
+
+    assert [call.args[0] for call in mock_schedule_retry.call_args_list] == (
+        due_reminders
+    )
+
+
+@pytest.mark.asyncio
+async def test_reminder_pages_are_keyset_paginated(mock_bot: MagicMock):
+    now = pendulum.now("UTC")
+    async with Session.begin() as session:
+        await session.execute(
+            insert(reminder).values(
+                [
+                    # several reminders due at the same time
+                    make_reminder(i, now.add(minutes=i // 3), owner=1 + i % 2)
+                    for i in range(1, 26)
+                ]
+            )
+        )
+
+    mock_bot.get_channel.return_value = None
+    reminders_admin = RemindersAdmin(mock_bot)
+    paginator = await reminders_admin.make_reminder_paginator(reminder.c.owner == 1)
+    assert len(paginator.pages) == 12
+
+    with patch.object(
+        reminders_admin, "fetch_reminders", wraps=reminders_admin.fetch_reminders
+    ) as mock_fetch:
+        # jumping straight to the last page has to use an offset
+        await paginator.load_page(11)
+        assert mock_fetch.await_args.kwargs["offset"] == 10
+
+        # but once the page before it is loaded it's found by key
+        paginator.loaded_chunks.discard(1)
+        await paginator.load_page(0)
+        await paginator.load_page(11)
+        assert "offset" not in mock_fetch.await_args.kwargs
+        assert mock_fetch.await_args.kwargs["after"][1] == 20
+
+    listed_ids = [
+        int(page.fields[1].value.split("\n")[0].removeprefix("Reminder ID: "))
+        for page in paginator.pages
+    ]
+    assert listed_ids == [2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24]
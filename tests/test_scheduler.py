@@ -0,0 +1,453 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+import pendulum
+import pytest
+from sqlalchemy import select
+
+from pzsd_bot.db import Session
+from pzsd_bot.ext.cron import parse_cron
+from pzsd_bot.ext.job_store import JobStore
+from pzsd_bot.ext.metrics import Histogram
+from pzsd_bot.ext.scheduler import Scheduler, render_metrics
+from pzsd_bot.model import JobStatus, MisfirePolicy, scheduled_job
+
+
+def in_seconds(seconds: float) -> datetime:
+    return datetime.now() + timedelta(seconds=seconds)
+
+
+async def record(fired: list[str], task_id: str) -> None:
+    fired.append(task_id)
+
+
+# The test database is a single shared sqlite connection, so persisted
+# jobs are spaced out to keep their claims from overlapping.
+def persistent_scheduler(fired: list[str]) -> Scheduler:
+    scheduler = Scheduler("test", store=JobStore())
+    scheduler.register("record", partial(record, fired))
+    return scheduler
+
+
+async def record_occurrence(fired: list[datetime], run_at: datetime) -> None:
+    fired.append(run_at)
+
+
+class FakeClock:
+    """Wall clock that can drift from, or jump relative
+    to, the event loop's monotonic clock."""
+
+    def __init__(self, rate: float = 1.0):
+        self.rate = rate
+        self.offset = 0.0
+        self.wall_start = time.time()
+        self.monotonic_start = time.monotonic()
+
+    def __call__(self) -> float:
+        elapsed = time.monotonic() - self.monotonic_start
+        return self.wall_start + elapsed * self.rate + self.offset
+
+    def jump(self, seconds: float) -> None:
+        self.offset += seconds
+
+
+async def record_time(clock: FakeClock, fired: list[float]) -> None:
+    fired.append(clock())
+
+
+async def job_statuses() -> dict[str, JobStatus]:
+    async with Session.begin() as session:
+        result = await session.execute(
+            select(scheduled_job.c.id, scheduled_job.c.status)
+        )
+        return dict(result.all())
+
+
+@pytest.mark.asyncio
+async def test_jobs_fire_in_order():
+    scheduler = Scheduler("test")
+    fired = []
+
+    scheduler.schedule(in_seconds(0.03), "c", record(fired, "c"))
+    scheduler.schedule(in_seconds(0.01), "a", record(fired, "a"))
+    scheduler.schedule(in_seconds(0.02), "b", partial(record, fired, "b"))
+    scheduler.schedule(in_seconds(-1), "now", record(fired, "now"))
+
+    assert len(scheduler) == 3
+    assert len(scheduler._queue) == 3
+
+    await asyncio.sleep(0.1)
+
+    assert fired == ["now", "a", "b", "c"]
+    assert len(scheduler) == 0
+    assert scheduler.tasks == {}
+    assert scheduler._timer is None
+
+
+@pytest.mark.asyncio
+async def test_cancel_pending_job():
+    scheduler = Scheduler("test")
+    fired = []
+
+    scheduler.schedule(in_seconds(0.01), "a", record(fired, "a"))
+    scheduler.schedule(in_seconds(0.02), "b", record(fired, "b"))
+    scheduler.cancel("a")
+
+    assert "a" not in scheduler
+    assert "b" in scheduler
+
+    await asyncio.sleep(0.05)
+
+    assert fired == ["b"]
+
+
+@pytest.mark.asyncio
+async def test_reschedule_replaces_pending_job():
+    scheduler = Scheduler("test")
+    fired = []
+
+    scheduler.schedule(in_seconds(0.01), "a", record(fired, "first"))
+    scheduler.schedule(in_seconds(0.02), "a", record(fired, "second"))
+
+    assert len(scheduler) == 1
+
+    await asyncio.sleep(0.05)
+
+    assert fired == ["second"]
+
+
+@pytest.mark.asyncio
+async def test_cancel_all():
+    scheduler = Scheduler("test")
+    fired = []
+
+    for i in range(10):
+        scheduler.schedule(in_seconds(0.01), str(i), record(fired, str(i)))
+    scheduler.cancel_all()
+
+    await asyncio.sleep(0.03)
+
+    assert fired == []
+    assert len(scheduler) == 0
+    assert scheduler._timer is None
+
+
+@pytest.mark.asyncio
+async def test_canceled_jobs_are_compacted():
+    scheduler = Scheduler("test")
+
+    for i in range(100):
+        scheduler.schedule(in_seconds(60), str(i), partial(record, [], str(i)))
+    for i in range(1, 100):
+        scheduler.cancel(str(i))
+
+    assert len(scheduler) == 1
+    assert len(scheduler._queue) < 100
+
+    scheduler.cancel_all()
+
+
+@pytest.mark.asyncio
+async def test_persisted_jobs_are_idempotent():
+    scheduler = persistent_scheduler(fired := [])
+
+    for _ in range(3):
+        await scheduler.schedule_persisted(
+            in_seconds(0.05), "a", "record", {"task_id": "a"}
+        )
+    assert not await scheduler.schedule_persisted(
+        in_seconds(0.05), "a", "record", {"task_id": "a"}
+    )
+
+    await asyncio.sleep(0.15)
+
+    assert fired == ["a"]
+    assert await job_statuses() == {"a": JobStatus.done}
+
+
+@pytest.mark.asyncio
+async def test_persisted_job_runs_once_across_schedulers():
+    """A job claimed by one scheduler isn't run again by another."""
+    fired = []
+    scheduler = persistent_scheduler(fired)
+    await scheduler.schedule_persisted(
+        in_seconds(0.05), "a", "record", {"task_id": "a"}
+    )
+
+    # another instance recovered the job before it ran
+    other = persistent_scheduler(fired)
+    assert len(await other.recover()) == 1
+    other.cancel("a")
+
+    await asyncio.sleep(0.15)
+    await other._run_persisted("a", "record", {"task_id": "a"})
+
+    assert fired == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_recover_applies_misfire_policy():
+    store = JobStore()
+    for job_id, run_at, policy in [
+        ("missed_run", in_seconds(-60), MisfirePolicy.run_once),
+        ("missed_skip", in_seconds(-60), MisfirePolicy.skip),
+        ("future_skip", in_seconds(0.05), MisfirePolicy.skip),
+        ("unknown", in_seconds(-60), MisfirePolicy.run_once),
+    ]:
+        handler = "record" if job_id != "unknown" else "missing"
+        await store.add("test", job_id, handler, run_at, {"task_id": job_id}, policy)
+    await store.add("other", "other", "record", in_seconds(-60), {"task_id": "other"})
+
+    scheduler = persistent_scheduler(fired := [])
+    recovered = await scheduler.recover()
+
+    assert [job.id for job in recovered] == ["missed_run", "future_skip"]
+
+    await asyncio.sleep(0.15)
+
+    # both claims go through the one db connection, so the
+    # order the jobs finish in isn't deterministic
+    assert sorted(fired) == ["future_skip", "missed_run"]
+    assert await job_statuses() == {
+        "missed_run": JobStatus.done,
+        "missed_skip": JobStatus.skipped,
+        "future_skip": JobStatus.done,
+        "unknown": JobStatus.pending,
+        "other": JobStatus.pending,
+    }
+
+
+@pytest.mark.asyncio
+async def test_remove_persisted():
+    scheduler = persistent_scheduler(fired := [])
+    for job_id in "abc":
+        await scheduler.schedule_persisted(
+            in_seconds(0.05), job_id, "record", {"task_id": job_id}
+        )
+
+    await scheduler.remove_persisted("a")
+    assert await job_statuses() == {"b": JobStatus.pending, "c": JobStatus.pending}
+
+    await scheduler.remove_persisted()
+    assert await job_statuses() == {}
+
+    await asyncio.sleep(0.1)
+
+    assert fired == []
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_recurring_job_moves_to_next_occurrence():
+    scheduler = Scheduler("test")
+    fired = []
+    run_at = pendulum.now("UTC").add(seconds=0.01)
+
+    scheduler.schedule_recurring(
+        "a", "* * * * *", partial(record_occurrence, fired), run_at=run_at
+    )
+    job = scheduler._jobs["a"]
+
+    await asyncio.sleep(0.05)
+
+    assert fired == [run_at]
+    # the same entry is reused for the next occurrence
+    assert scheduler._jobs["a"] is job
+    assert len(scheduler._queue) == 1
+    assert job.run_at == run_at.add(minutes=1).start_of("minute")
+
+    scheduler.cancel("a")
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_recurring_job_stops_after_run_until():
+    scheduler = Scheduler("test")
+    fired = []
+    run_at = pendulum.now("UTC").add(seconds=0.01)
+
+    scheduler.schedule_recurring(
+        "a",
+        "* * * * *",
+        partial(record_occurrence, fired),
+        run_at=run_at,
+        run_until=run_at.add(seconds=1),
+    )
+
+    await asyncio.sleep(0.05)
+
+    assert fired == [run_at]
+    assert "a" not in scheduler
+    assert scheduler._timer is None
+
+
+@pytest.mark.asyncio
+async def test_persisted_recurring_job_is_claimed_per_occurrence():
+    scheduler = persistent_scheduler([])
+    fired = []
+    scheduler.register("record_occurrence", partial(record_occurrence, fired))
+
+    assert await scheduler.schedule_persisted_recurring(
+        "a", "record_occurrence", "0 0 * * *"
+    )
+    assert not await scheduler.schedule_persisted_recurring(
+        "a", "record_occurrence", "0 0 * * *"
+    )
+
+    run_at = scheduler._jobs["a"].run_at
+    scheduler.cancel("a")
+
+    # another instance running the same occurrence doesn't run it again
+    for _ in range(2):
+        await scheduler._run_persisted_occurrence(
+            "a", "record_occurrence", None, parse_cron("0 0 * * *"), None, run_at
+        )
+
+    assert fired == [run_at]
+    assert await job_statuses() == {"a": JobStatus.pending}
+
+
+@pytest.mark.asyncio
+async def test_recover_recurring_job_applies_misfire_policy():
+    store = JobStore()
+    missed = pendulum.now("UTC").subtract(days=3)
+    for job_id, policy in [
+        ("run_once", MisfirePolicy.run_once),
+        ("skip", MisfirePolicy.skip),
+    ]:
+        await store.add(
+            "test", job_id, "record", missed, None, policy,
+            cron=parse_cron("0 0 * * *"),
+        )  # fmt: skip
+
+    scheduler = Scheduler("test", store=store)
+    fired = []
+    scheduler.register("record", partial(record_occurrence, fired))
+
+    await scheduler.recover()
+    await asyncio.sleep(0.05)
+
+    # missed occurrences run once in total, then both move on
+    assert len(fired) == 1
+    next_run_at = pendulum.now("UTC").add(days=1).start_of("day")
+    assert scheduler._jobs["run_once"].run_at == next_run_at
+    assert scheduler._jobs["skip"].run_at == next_run_at
+
+    scheduler.cancel_all()
+
+
+def test_histogram_quantiles():
+    histogram = Histogram([0.01, 0.1, 1])
+    assert histogram.quantile(0.5) is None
+
+    for value in [0.005] * 90 + [0.05] * 9 + [30]:
+        histogram.observe(value)
+
+    assert histogram.counts == [90, 9, 0, 1]
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.99) == 0.1
+    assert histogram.quantile(1) == 30
+
+
+@pytest.mark.asyncio
+async def test_lateness_and_durations_are_recorded():
+    scheduler = Scheduler("metrics_test")
+
+    async def fail() -> None:
+        raise RuntimeError
+
+    scheduler.schedule(in_seconds(0.01), "a", record([], "a"))
+    scheduler.schedule(in_seconds(0.01), "b", fail)
+    # stall the event loop past when the jobs are due
+    time.sleep(0.1)  # noqa: ASYNC251
+    await asyncio.sleep(0.02)
+
+    assert scheduler.lateness.count == 2
+    assert scheduler.lateness.quantile(0.5) >= 0.05
+    assert scheduler.durations.count == 2
+    assert scheduler.failures == 1
+
+    scheduler.schedule(in_seconds(60), "c", partial(record, [], "c"))
+    metrics = render_metrics()
+
+    assert 'scheduler_pending_jobs{scheduler="metrics_test"} 1' in metrics
+    assert 'scheduler_task_failures_total{scheduler="metrics_test"} 1' in metrics
+    assert (
+        'scheduler_lateness_seconds_bucket{scheduler="metrics_test",le="+Inf"} 2'
+        in metrics
+    )
+
+    scheduler.cancel_all()
+
+
+# how late a job may run with max_sleep=MAX_SLEEP,
+# allowing for the event loop being slow in tests
+MAX_SLEEP = 0.01
+TOLERANCE = MAX_SLEEP + 0.04
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "delay",
+    [60 * 60, 7 * 24 * 60 * 60, 365 * 24 * 60 * 60],
+    ids=["hour", "week", "year"],
+)
+async def test_long_wait_fires_on_time_after_clock_jump(delay: float):
+    """Like the host being suspended, the wall clock moves
+    on while the loop's monotonic clock doesn't."""
+    clock = FakeClock()
+    scheduler = Scheduler("test", clock=clock, max_sleep=MAX_SLEEP)
+    fired = []
+
+    due = clock() + delay
+    scheduler.schedule(
+        datetime.fromtimestamp(due), "a", partial(record_time, clock, fired)
+    )
+    await asyncio.sleep(0.02)
+    clock.jump(delay - 0.05)
+    await asyncio.sleep(0.1)
+
+    assert len(fired) == 1
+    assert 0 <= fired[0] - due <= TOLERANCE
+
+
+@pytest.mark.asyncio
+async def test_fires_on_time_when_wall_clock_drifts():
+    # the wall clock runs twice as fast as the loop's, a single
+    # sleep computed upfront would fire 0.2 seconds late
+    clock = FakeClock(rate=2)
+    scheduler = Scheduler("test", clock=clock, max_sleep=MAX_SLEEP / 2)
+    fired = []
+
+    due = clock() + 0.4
+    scheduler.schedule(
+        datetime.fromtimestamp(due), "a", partial(record_time, clock, fired)
+    )
+    await asyncio.sleep(0.3)
+
+    assert len(fired) == 1
+    assert 0 <= fired[0] - due <= TOLERANCE
+
+
+@pytest.mark.asyncio
+async def test_doesnt_fire_early_when_clock_jumps_back():
+    clock = FakeClock()
+    scheduler = Scheduler("test", clock=clock, max_sleep=MAX_SLEEP)
+    fired = []
+
+    due = clock() + 0.15
+    scheduler.schedule(
+        datetime.fromtimestamp(due), "a", partial(record_time, clock, fired)
+    )
+    clock.jump(-60 * 60)
+    await asyncio.sleep(0.1)
+
+    assert fired == []
+
+    clock.jump(60 * 60)
+    await asyncio.sleep(0.1)
+
+    assert len(fired) == 1
+    assert 0 <= fired[0] - due <= TOLERANCE
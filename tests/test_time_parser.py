@@ -0,0 +1,106 @@
+import json
+import random
+import re
+from pathlib import Path
+
+import pendulum
+import pytest
+
+from pzsd_bot.ext.time_parser import (
+    TimeExpression,
+    parse_datetime,
+    parse_duration,
+    parse_expression,
+)
+
+CORPUS = json.loads((Path(__file__).parent / "data/time_expressions.json").read_text())
+NOW = pendulum.parse(CORPUS["now"])
+
+# The regex relative times used to be parsed with, kept as an oracle
+LEGACY_DURATION_PATTERN = re.compile(
+    r"((?P<years>\d+?) ?(years|year|Y|y) ?)?"
+    r"((?P<months>\d+?) ?(months|month|m) ?)?"
+    r"((?P<weeks>\d+?) ?(weeks|week|W|w) ?)?"
+    r"((?P<days>\d+?) ?(days|day|D|d) ?)?"
+    r"((?P<hours>\d+?) ?(hours|hour|hrs?|H|h) ?)?"
+    r"((?P<minutes>\d+?) ?(minutes|minute|min|M) ?)?"
+    r"((?P<seconds>\d+?) ?(seconds|second|secs?|S|s))?"
+)
+
+
+def legacy_parse_duration(text: str) -> pendulum.Duration | None:
+    if m := LEGACY_DURATION_PATTERN.fullmatch(text):
+        duration = {
+            unit: int(amount) for unit, amount in m.groupdict(default=0).items()
+        }
+        return pendulum.duration(**duration)
+
+
+@pytest.mark.parametrize("text,expected", CORPUS["relative"].items())
+def test_parse_duration_corpus(text: str, expected: dict[str, int] | None):
+    if expected is None:
+        assert parse_duration(text) is None
+    else:
+        assert parse_duration(text) == pendulum.duration(**expected)
+
+
+@pytest.mark.parametrize("text,expected", CORPUS["absolute"].items())
+def test_parse_datetime_corpus(text: str, expected: str | None):
+    result = parse_datetime(text, CORPUS["timezone"], NOW)
+    if expected is None:
+        assert result is None
+    else:
+        assert result == pendulum.parse(expected)
+        assert result.utcoffset() == pendulum.parse(expected).utcoffset()
+
+
+@pytest.mark.parametrize("text", CORPUS["relative"])
+def test_parse_duration_matches_legacy_on_corpus(text: str):
+    assert parse_duration(text) == legacy_parse_duration(text)
+
+
+def test_parse_duration_matches_legacy_fuzz():
+    rng = random.Random(20261019)
+    alphabet = "0123456789  yYmMwWdDhHsSearonthiucd"
+    for _ in range(20_000):
+        text = "".join(rng.choices(alphabet, k=rng.randint(1, 16)))
+        assert parse_duration(text) == legacy_parse_duration(text), text
+
+
+def test_parse_datetime_fuzz():
+    """Random mixes of tokens either parse to a datetime or are rejected."""
+    rng = random.Random(20261019)
+    tokens = [
+        "5", "17", "2025", "05", "-", "/", ":", ",", " ", "pm", "am", "th",
+        "march", "fri", "at", "on", "noon", "t", "z", "+", "x", ".",
+    ]  # fmt: skip
+    for _ in range(20_000):
+        text = "".join(rng.choices(tokens, k=rng.randint(1, 10)))
+        result = parse_datetime(text, CORPUS["timezone"], NOW)
+        assert result is None or isinstance(result, pendulum.DateTime), text
+
+
+def test_parse_expression_is_cached():
+    parse_expression.cache_clear()
+
+    assert parse_expression("march 5 at 5pm") == TimeExpression(
+        month=3, day=5, hour=17, minute=0, second=0
+    )
+    parse_expression("march 5 at 5pm")
+
+    assert parse_expression.cache_info().hits == 1
+
+
+def test_parse_datetime_resolves_against_now():
+    """Cached expressions still resolve relative to the current date."""
+    assert parse_datetime("5pm", "UTC", pendulum.datetime(2026, 1, 1)) == (
+        pendulum.datetime(2026, 1, 1, 17)
+    )
+    assert parse_datetime("5pm", "UTC", pendulum.datetime(2026, 1, 2)) == (
+        pendulum.datetime(2026, 1, 2, 17)
+    )
+
+
+def test_parse_datetime_invalid_timezone():
+    with pytest.raises(pendulum.tz.exceptions.InvalidTimezone):
+        parse_datetime("5pm", "Not/A_Timezone")
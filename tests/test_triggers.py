@@ -0,0 +1,416 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import asyncpg
+import discord
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+
+from pzsd_bot.cogs.triggers.admin import TriggerAdmin, TriggerExport, TriggerFile
+from pzsd_bot.cogs.triggers.triggers import Triggers
+from pzsd_bot.db import Session
+from pzsd_bot.ext.emoji_registry import EmojiRegistry
+from pzsd_bot.ext.notify import INSTANCE_ID, PGListener
+from pzsd_bot.ext.trigger_index import PatternProfile
+from pzsd_bot.ext.word_index import WordIndex
+from pzsd_bot.model import TriggerResponseType, trigger_group, trigger_pattern
+from pzsd_bot.settings import DB
+
+
+@pytest_asyncio.fixture
+async def triggers_cog(seed_triggers: None, mock_bot: MagicMock):
+    triggers_cog = Triggers(mock_bot)
+    await triggers_cog.load_triggers()
+    return triggers_cog
+
+
+@pytest.mark.asyncio
+async def test_load_triggers(triggers_cog: Triggers):
+    assert dict(triggers_cog.indexes[None].normal_triggers) == {
+        (1, "cat", TriggerResponseType.standard): ["meow", "purr"],
+        (1, "kitty", TriggerResponseType.standard): ["meow", "purr"],
+    }
+    assert dict(triggers_cog.indexes[None].regex_triggers) == {
+        (2, r"\bdogs?\b", TriggerResponseType.reply): ["woof"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_trigger_notification_delete(triggers_cog: Triggers):
+    await triggers_cog.on_trigger_notification({"action": "delete", "group_id": 1})
+
+    assert not triggers_cog.indexes[None].normal_triggers
+    assert len(triggers_cog.indexes[None].regex_triggers) == 1
+
+
+@pytest.mark.asyncio
+async def test_trigger_notification_upsert(triggers_cog: Triggers):
+    """Test that a group enabled by another process is loaded from the db."""
+    async with Session.begin() as session:
+        await session.execute(
+            update(trigger_group).where(trigger_group.c.id == 3).values(is_active=True)
+        )
+
+    await triggers_cog.on_trigger_notification({"action": "upsert", "group_id": 3})
+
+    assert triggers_cog.indexes[None].normal_triggers[
+        3, "bird", TriggerResponseType.standard
+    ] == ["tweet"]
+    # other groups are left untouched
+    assert len(triggers_cog.indexes[None].normal_triggers) == 3
+
+
+@pytest.mark.asyncio
+async def test_trigger_notification_upsert_inactive_group(triggers_cog: Triggers):
+    async with Session.begin() as session:
+        await session.execute(
+            update(trigger_group).where(trigger_group.c.id == 1).values(is_active=False)
+        )
+
+    await triggers_cog.on_trigger_notification({"action": "upsert", "group_id": 1})
+
+    assert not triggers_cog.indexes[None].normal_triggers
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("I have a cat", {"cat": (9, 12)}),
+        ("concatenate", {}),
+        ("CAT!", {"cat": (0, 3)}),
+        ("good   Morning, cat", {"good morning": (0, 14), "cat": (16, 19)}),
+        ("good evening", {}),
+        ("", {}),
+    ],
+)
+def test_word_index_search(text: str, expected: dict):
+    word_index = WordIndex()
+    for phrase in ("cat", "good morning", "morning cat dog"):
+        word_index.add(phrase, phrase)
+
+    assert dict(word_index.search(text)) == expected
+
+
+def test_word_index_remove():
+    word_index = WordIndex()
+    word_index.add("cat", 1)
+    word_index.add("cat", 2)
+    word_index.add("big dog", 3)
+
+    word_index.remove("cat", 1)
+    assert dict(word_index.search("cat")) == {2: (0, 3)}
+
+    word_index.remove("cat", 2)
+    word_index.remove("big dog", 3)
+    assert len(word_index) == 0
+    assert not word_index.phrases
+
+
+@pytest.mark.asyncio
+async def test_whole_word_trigger(triggers_cog: Triggers):
+    async with Session.begin() as session:
+        await session.execute(
+            update(trigger_pattern)
+            .where(trigger_pattern.c.group_id == 1)
+            .values(is_whole_word=True)
+        )
+    await triggers_cog.load_triggers()
+
+    assert not triggers_cog.indexes[None].normal_triggers
+    assert len(triggers_cog.indexes[None].word_triggers) == 2
+
+    mock_message = MagicMock(spec=discord.Message)
+    mock_message.channel = AsyncMock()
+    mock_message.content = "let's concatenate these"
+    await triggers_cog.on_message(mock_message)
+    mock_message.channel.send.assert_not_called()
+
+    mock_message.content = "what a cute cat"
+    await triggers_cog.on_message(mock_message)
+    mock_message.channel.send.assert_called_once()
+    assert mock_message.channel.send.call_args.args[0] in ("meow", "purr")
+
+
+@pytest.mark.asyncio
+async def test_scoped_trigger(triggers_cog: Triggers):
+    async with Session.begin() as session:
+        await session.execute(
+            update(trigger_group).where(trigger_group.c.id == 1).values(scope_id=100)
+        )
+    await triggers_cog.on_trigger_notification({"action": "upsert", "group_id": 1})
+
+    assert not triggers_cog.indexes[None].normal_triggers
+    assert len(triggers_cog.indexes[100].normal_triggers) == 2
+
+    mock_message = MagicMock(spec=discord.Message)
+    mock_message.content = "cat"
+
+    mock_message.channel = AsyncMock(id=200, category_id=None, parent_id=None)
+    await triggers_cog.on_message(mock_message)
+    mock_message.channel.send.assert_not_called()
+
+    # scoped to the category the channel is in
+    mock_message.channel = AsyncMock(id=200, category_id=100, parent_id=None)
+    await triggers_cog.on_message(mock_message)
+    mock_message.channel.send.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_enable_scoped_trigger(triggers_cog: Triggers, mock_bot: MagicMock):
+    async with Session.begin() as session:
+        await session.execute(
+            update(trigger_group).where(trigger_group.c.id == 3).values(scope_id=100)
+        )
+    trigger_admin = TriggerAdmin(mock_bot)
+    ctx = AsyncMock(author=MagicMock())
+
+    await trigger_admin.enable.callback(trigger_admin, ctx, 3)
+
+    event, *_ = mock_bot.dispatch.call_args.args
+    kwargs = mock_bot.dispatch.call_args.kwargs
+    assert event == "trigger_added"
+    assert kwargs["scope_id"] == 100
+
+    await triggers_cog.on_trigger_added(**kwargs)
+
+    assert (3, "bird", TriggerResponseType.standard) not in triggers_cog.indexes[
+        None
+    ].normal_triggers
+    assert triggers_cog.indexes[100].normal_triggers[
+        3, "bird", TriggerResponseType.standard
+    ] == ["tweet"]
+
+
+@pytest.mark.asyncio
+async def test_profile_triggers(triggers_cog: Triggers):
+    channel = MagicMock(id=200, category_id=None, parent_id=None)
+
+    profiles = triggers_cog.profile("My Dog likes cats", channel)
+
+    spans = {profile.key[1]: profile.span for profile in profiles}
+    assert spans == {"cat": (13, 16), "kitty": None, r"\bdogs?\b": (3, 6)}
+    assert all(profile.elapsed >= 0 for profile in profiles)
+
+
+def test_profile_embed_flags_slow_patterns(mock_bot: MagicMock):
+    trigger_admin = TriggerAdmin(mock_bot)
+    profiles = [
+        PatternProfile((1, "cat", TriggerResponseType.standard), "normal", 1e-6, None),
+        PatternProfile((2, "dog", TriggerResponseType.standard), "normal", 1e-6, None),
+        PatternProfile(
+            (3, "(a+)+b", TriggerResponseType.standard), "regex", 1e-2, (0, 3)
+        ),
+    ]
+
+    embed = trigger_admin.make_profile_embed("aab", profiles)
+
+    matches, slow_patterns = embed.fields
+    assert "id=3" in matches.value and "`aab`" in matches.value
+    assert "id=1" not in matches.value
+    assert "id=3" in slow_patterns.value
+    assert "id=1" not in slow_patterns.value
+
+
+def test_profile_embed_handles_a_zero_median(mock_bot: MagicMock):
+    trigger_admin = TriggerAdmin(mock_bot)
+    profiles = [
+        PatternProfile((1, "cat", TriggerResponseType.standard), "normal", 0.0, None),
+        PatternProfile((2, "dog", TriggerResponseType.standard), "normal", 0.0, None),
+        PatternProfile(
+            (3, "(a+)+b", TriggerResponseType.standard), "regex", 1e-2, (0, 3)
+        ),
+    ]
+
+    embed = trigger_admin.make_profile_embed("aab", profiles)
+
+    _, slow_patterns = embed.fields
+    assert "id=3" in slow_patterns.value
+    assert "median" not in slow_patterns.value
+
+
+@pytest.mark.asyncio
+async def test_fetch_triggers_one_row_per_group(
+    seed_triggers: None, mock_bot: MagicMock
+):
+    trigger_admin = TriggerAdmin(mock_bot)
+
+    trigger_rows = await trigger_admin.fetch_triggers(sort_col="id")
+
+    assert [row.id for row in trigger_rows] == [1, 2, 3]
+    assert trigger_rows[0].patterns == ["cat", "kitty"]
+    assert trigger_rows[0].responses == ["meow", "purr"]
+    assert trigger_rows[1].is_regex is True
+    assert await trigger_admin.count_triggers() == 3
+
+
+@pytest.mark.asyncio
+async def test_fetch_triggers_paged(seed_triggers: None, mock_bot: MagicMock):
+    trigger_admin = TriggerAdmin(mock_bot)
+
+    trigger_rows = await trigger_admin.fetch_triggers(
+        trigger_group.c.owner == 1, sort_col="pattern", offset=1, limit=1
+    )
+
+    # sorted by first pattern: "\bdogs?\b" < "cat"
+    assert [row.id for row in trigger_rows] == [1]
+    assert await trigger_admin.count_triggers(trigger_group.c.owner == 1) == 2
+
+
+@pytest.mark.asyncio
+async def test_export_import_round_trip(seed_triggers: None, mock_bot: MagicMock):
+    trigger_admin = TriggerAdmin(mock_bot)
+
+    buffer = await trigger_admin.export_triggers()
+    trigger_file = TriggerFile.model_validate_json(buffer.read())
+
+    assert len(trigger_file.triggers) == 3
+    assert trigger_file.triggers[0].patterns == ["cat", "kitty"]
+    assert trigger_file.triggers[2].is_active is False
+
+    assert trigger_admin.validate_import(trigger_file.triggers) == []
+    group_ids = await trigger_admin.import_triggers(trigger_file.triggers)
+
+    assert group_ids == [4, 5, 6]
+    trigger_rows = await trigger_admin.fetch_triggers(
+        trigger_group.c.id.in_(group_ids), sort_col="id"
+    )
+    assert [row.patterns for row in trigger_rows] == [
+        ["cat", "kitty"],
+        [r"\bdogs?\b"],
+        ["bird"],
+    ]
+    assert [row.responses for row in trigger_rows] == [
+        ["meow", "purr"],
+        ["woof"],
+        ["tweet"],
+    ]
+
+
+def test_validate_import(mock_bot: MagicMock):
+    mock_bot.emoji_registry = EmojiRegistry()
+    trigger_admin = TriggerAdmin(mock_bot)
+    triggers = [
+        TriggerExport(owner=1, patterns=["Cat"], responses=["meow"]),
+        TriggerExport(owner=1, is_regex=True, patterns=["(unclosed"], responses=["x"]),
+        TriggerExport(
+            owner=1,
+            response_type=TriggerResponseType.reaction,
+            patterns=["dog"],
+            responses=[":dog:", "<:missing:123>"],
+        ),
+    ]
+
+    errors = trigger_admin.validate_import(triggers)
+
+    assert errors == [
+        "Trigger 1 has invalid regex `(unclosed`",
+        "Trigger 2 has invalid reaction `<:missing:123>`",
+    ]
+    assert triggers[0].patterns == ["cat"]
+    assert triggers[2].responses[0] == "\N{DOG FACE}"
+
+
+def test_emoji_registry():
+    guild = MagicMock(id=1)
+    pog = MagicMock(id=10, guild_id=1)
+    kek = MagicMock(id=11, guild_id=1)
+    other = MagicMock(id=20, guild_id=2)
+
+    emoji_registry = EmojiRegistry()
+    emoji_registry.load([pog, kek, other])
+
+    assert emoji_registry.is_valid("<:pog:10>")
+    assert emoji_registry.is_valid("<a:kek:11>")
+    assert emoji_registry.is_valid("\N{DOG FACE}")
+    assert not emoji_registry.is_valid("<:nope:12>")
+    assert not emoji_registry.is_valid("nope")
+
+    assert emoji_registry.update_guild(guild, [pog]) == {11}
+    assert not emoji_registry.is_valid("<a:kek:11>")
+    assert 20 in emoji_registry
+    assert len(emoji_registry) == 2
+
+
+@pytest.mark.asyncio
+async def test_reaction_with_deleted_emoji_is_skipped(triggers_cog: Triggers):
+    triggers_cog.bot.emoji_registry = EmojiRegistry()
+    triggers_cog.bot.emoji_registry.load([MagicMock(id=10, guild_id=1)])
+    await triggers_cog.on_trigger_added(
+        patterns=["pog"],
+        responses=["<:pog:10>", "<:deleted:11>"],
+        is_regex=False,
+        response_type=TriggerResponseType.reaction,
+        group_id=4,
+    )
+
+    mock_message = MagicMock(spec=discord.Message)
+    mock_message.channel = AsyncMock(id=200, category_id=None, parent_id=None)
+    mock_message.content = "pog"
+    for _ in range(10):
+        await triggers_cog.on_message(mock_message)
+
+    assert {call.args[0] for call in mock_message.add_reaction.call_args_list} == {
+        "<:pog:10>"
+    }
+
+    triggers_cog.bot.emoji_registry.update_guild(MagicMock(id=1), [])
+    mock_message.add_reaction.reset_mock()
+    await triggers_cog.on_message(mock_message)
+
+    mock_message.add_reaction.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_pg_listener_ignores_own_notifications():
+    callback = AsyncMock()
+    listener = PGListener("trigger_changes", callback)
+
+    payload = {"action": "delete", "group_id": 1}
+    await listener._on_notification(
+        None, 0, "trigger_changes", json.dumps({**payload, "origin": INSTANCE_ID})
+    )
+    callback.assert_not_called()
+
+    await listener._on_notification(
+        None, 0, "trigger_changes", json.dumps({**payload, "origin": "other"})
+    )
+    callback.assert_called_once_with({**payload, "origin": "other"})
+
+
+@pytest.mark.asyncio
+async def test_pg_listener_retries_first_connect():
+    connection = MagicMock(add_listener=AsyncMock())
+    listener = PGListener("trigger_changes", AsyncMock(), reconnect_delay=0.01)
+
+    with patch(
+        "pzsd_bot.ext.notify.asyncpg.connect",
+        AsyncMock(side_effect=[OSError("refused"), OSError("refused"), connection]),
+    ) as mock_connect:
+        await listener.start()
+
+    assert mock_connect.await_count == 3
+    connection.add_listener.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_pg_listener_receives_notifications():
+    """Round trip through a real postgres, skipped if one isn't running locally."""
+    try:
+        conn = await asyncpg.connect(DB.dsn, timeout=1)
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+        pytest.skip("postgres isn't available")
+
+    received = asyncio.Queue()
+    listener = PGListener("test_trigger_changes", received.put)
+    await listener.start()
+    try:
+        payload = {"action": "upsert", "group_id": 1, "origin": "other"}
+        await conn.execute(
+            "SELECT pg_notify($1, $2)", "test_trigger_changes", json.dumps(payload)
+        )
+        assert await asyncio.wait_for(received.get(), timeout=1) == payload
+    finally:
+        await listener.close()
+        await conn.close()